@@ -0,0 +1,193 @@
+import argparse
+import json
+import math
+
+import numpy as np
+
+from generate_test_vectors import exp_batch, gelu_batch, gelu_coefficients, sm_coefficients
+from ln_debug import layer_norm_batch, ln_parameters
+from sm_debug import softmax_batch
+
+# absolute error histogram: a zero bin, then log-spaced bins from 1e-12 to 1e6
+ERROR_EDGES = np.concatenate([[0.0], np.logspace(-12, 6, 18 * 16 + 1)])
+
+# input region bins reported per op
+REGION_BINS = 64
+
+
+def erf(x: np.ndarray) -> np.ndarray:
+    """
+    Vectorized erf, Abramowitz & Stegun 7.1.26 (|error| < 1.5e-7), far below the integer approximation errors.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    t = 1.0 / (1.0 + 0.3275911 * np.abs(x))
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return np.sign(x) * (1.0 - poly * np.exp(-x * x))
+
+
+def exp_chunk(rng, size: int, S: np.ndarray, x_range: float, coefficients: dict):
+    """
+    exp over x in [-x_range, 0]: output scale a * S^2 (I-BERT i-exp). Returns (region value, float ref, approx).
+    """
+    qb, qc, qln2, qln2_inv, _ = sm_coefficients(S, **coefficients)
+    qin = np.floor(rng.uniform(-x_range, 0, size=size) / S).astype(np.int64)
+    qout = exp_batch(qin, qb, qc, qln2, qln2_inv)
+    a = coefficients.get("a", 0.3585)
+    x = qin * S
+    return x, np.exp(x), qout * a * S**2
+
+
+def gelu_chunk(rng, size: int, S: np.ndarray, x_range: float, coefficients: dict, shift: int = 14):
+    """
+    GELU over x in [-x_range, x_range]: output scale S * S_erf / 2 with S_erf = a * (S / sqrt(2))^2 * 2^shift (I-BERT i-GELU).
+    """
+    qb, qc, q1 = gelu_coefficients(S, shift, **coefficients)
+    qin = np.floor(rng.uniform(-x_range, x_range, size=size) / S).astype(np.int64)
+    qout = gelu_batch(qin, qb, qc, q1, shift)
+    a = coefficients.get("a", -0.2888)
+    S_out = S * a * (S / math.sqrt(2))**2 * 2.0**shift / 2
+    x = qin * S
+    return x, 0.5 * x * (1.0 + erf(x / math.sqrt(2))), qout * S_out
+
+
+def sm_chunk(rng, rows: int, length: int, S: np.ndarray, x_range: float, coefficients: dict, out_bits: int = 6):
+    """
+    Softmax over rows of x in [-x_range, x_range]: output scale 2^-out_bits. Regions are x - max(x) per element.
+    """
+    S = np.broadcast_to(S, (rows,))
+    qb, qc, qln2, qln2_inv, Sreq = sm_coefficients(S, **coefficients)
+    qin = np.floor(rng.uniform(-x_range, x_range, size=(rows, length)) / S[:, None]).astype(np.int64)
+    qin = np.clip(qin, -2**31, 2**31 - 1).astype(np.int32)
+    qout = softmax_batch(qin, qb, qc, qln2, qln2_inv, Sreq, out_bits=out_bits)["qout"]
+    x = qin * S[:, None]
+    e = np.exp(x - x.max(axis=-1, keepdims=True))
+    return (x - x.max(axis=-1, keepdims=True)).ravel(), (e / e.sum(axis=-1, keepdims=True)).ravel(), \
+        (qout.astype(np.float64) / 2.0**out_bits).ravel()
+
+
+def ln_chunk(rng, rows: int, length: int, qin_bits: int = 16):
+    """
+    Layer norm of int rows without bias, compared in normalized units: (qout - bias) * sqrt(L) / 2^30 against
+    (x - mean) / std. Regions are the normalized reference value.
+    """
+    shift, n_inv = ln_parameters(length, qin_bits)
+    qin = rng.integers(-2**(qin_bits - 1), 2**(qin_bits - 1), size=(rows, length), dtype=np.int64).astype(np.int32)
+    qout = layer_norm_batch(qin, np.zeros_like(qin), shift=shift, n_inv=n_inv)["qout"]
+    x = qin.astype(np.float64)
+    ref = (x - x.mean(axis=-1, keepdims=True)) / x.std(axis=-1, keepdims=True)
+    return ref.ravel(), ref.ravel(), (qout * math.sqrt(length) / 2.0**30).ravel()
+
+
+class ErrorStats:
+    """
+    Streaming absolute/relative error statistics: max, mean, histogram percentiles and per-region max/mean error.
+    """
+    def __init__(self, lo: float, hi: float):
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.max_at = None
+        self.rel_max = 0.0
+        self.hist = np.zeros(len(ERROR_EDGES), dtype=np.int64)
+        self.region_edges = np.linspace(lo, hi, REGION_BINS + 1)
+        self.region_count = np.zeros(REGION_BINS, dtype=np.int64)
+        self.region_sum = np.zeros(REGION_BINS)
+        self.region_max = np.zeros(REGION_BINS)
+
+    def update(self, region: np.ndarray, ref: np.ndarray, approx: np.ndarray):
+        err = np.abs(approx - ref)
+        self.count += err.size
+        self.sum += err.sum()
+        i = int(np.argmax(err))
+        if err[i] > self.max:
+            self.max, self.max_at = float(err[i]), float(region[i])
+        nonzero = np.abs(ref) > 1e-12
+        if nonzero.any():
+            self.rel_max = max(self.rel_max, float((err[nonzero] / np.abs(ref[nonzero])).max()))
+        self.hist += np.bincount(np.searchsorted(ERROR_EDGES, err, side="right") - 1, minlength=len(ERROR_EDGES))[:len(ERROR_EDGES)]
+        bins = np.clip(np.searchsorted(self.region_edges, region, side="right") - 1, 0, REGION_BINS - 1)
+        self.region_count += np.bincount(bins, minlength=REGION_BINS)
+        self.region_sum += np.bincount(bins, weights=err, minlength=REGION_BINS)
+        np.maximum.at(self.region_max, bins, err)
+
+    def percentile(self, p: float) -> float:
+        """
+        Upper edge of the histogram bin holding the p-th percentile (p in [0, 100]).
+        """
+        k = int(np.searchsorted(np.cumsum(self.hist), p / 100 * self.count))
+        return float(ERROR_EDGES[min(k + 1, len(ERROR_EDGES) - 1)]) if k else 0.0
+
+    def report(self, top: int = 5) -> dict:
+        order = np.argsort(self.region_max)[::-1][:top]
+        return {
+            "count": self.count,
+            "max": self.max,
+            "max_at": self.max_at,
+            "mean": self.sum / self.count if self.count else 0.0,
+            "max_relative": self.rel_max,
+            "percentiles": {p: self.percentile(p) for p in (50, 90, 99, 99.9)},
+            "worst_regions": [{"from": float(self.region_edges[b]), "to": float(self.region_edges[b + 1]),
+                               "max": float(self.region_max[b]),
+                               "mean": float(self.region_sum[b] / self.region_count[b]) if self.region_count[b] else 0.0}
+                              for b in order if self.region_count[b]],
+        }
+
+
+def evaluate(op: str, num_samples: int, S: float = None, x_range: float = None, length: int = None,
+             coefficients: dict = None, shift: int = 14, seed: int = 0, chunk_size: int = 1 << 16) -> dict:
+    """
+    Compare an integer approximation with its float64 reference over `num_samples` elements (rows for sm / ln),
+    in chunks of about `chunk_size` elements. Without a fixed scale S, each chunk draws scales in the range of the
+    checked-in vectors, so the statistics cover that whole coefficient range.
+    """
+    rng = np.random.default_rng(seed)
+    coefficients = coefficients or {}
+    x_range = x_range or {"exp": 10.0, "gelu": 6.0, "sm": 8.0, "ln": 4.0}[op]
+    length = length or {"sm": 32, "ln": 768}.get(op, 1)
+    scale_range = {"exp": (0.001, 0.0025), "sm": (0.001, 0.0025), "gelu": (0.00067, 0.00158)}.get(op)
+    stats = ErrorStats(*{"exp": (-x_range, 0.0), "sm": (-2 * x_range, 0.0)}.get(op, (-x_range, x_range)))
+    chunk_rows = max(chunk_size // length, 1)
+    for start in range(0, num_samples, chunk_rows):
+        size = min(chunk_rows, num_samples - start)
+        if scale_range:
+            scale = np.full(size, S) if S else rng.uniform(*scale_range, size=size)
+        if op == "exp":
+            region, ref, approx = exp_chunk(rng, size, scale, x_range, coefficients)
+        elif op == "gelu":
+            region, ref, approx = gelu_chunk(rng, size, scale, x_range, coefficients, shift)
+        elif op == "sm":
+            region, ref, approx = sm_chunk(rng, size, length, scale, x_range, coefficients)
+        else:
+            region, ref, approx = ln_chunk(rng, size, length)
+        stats.update(region, ref, approx)
+    return {"op": op, "length": length, "S": S, "x_range": x_range, "coefficients": coefficients, **stats.report()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="accuracy of the integer approximations against float64 references")
+    parser.add_argument("op", choices=["exp", "gelu", "ln", "sm"])
+    parser.add_argument("-n", "--num-samples", type=int, default=1 << 20, help="elements (rows for ln / sm)")
+    parser.add_argument("--S", type=float, default=None, help="fixed input scale (default: sampled per element / row)")
+    parser.add_argument("--x-range", type=float, default=None, help="input range in float units")
+    parser.add_argument("--length", type=int, default=None, help="row length for ln / sm")
+    parser.add_argument("--a", type=float, default=None, help="polynomial coefficient a")
+    parser.add_argument("--b", type=float, default=None, help="polynomial coefficient b")
+    parser.add_argument("--c", type=float, default=None, help="polynomial coefficient c")
+    parser.add_argument("--shift", type=int, default=14, help="gelu erf shift")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=1 << 16)
+    parser.add_argument("-o", "--output", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    coefficients = {k: v for k, v in (("a", args.a), ("b", args.b), ("c", args.c)) if v is not None}
+    report = evaluate(args.op, args.num_samples, args.S, args.x_range, args.length, coefficients, args.shift,
+                      args.seed, args.chunk_size)
+    print(f"{args.op}: {report['count']} elements, max |err| {report['max']:.4g} at {report['max_at']:.4g}, "
+          f"mean |err| {report['mean']:.4g}, max relative {report['max_relative']:.4g}")
+    print("percentiles (bin upper edge): " + ", ".join(f"p{p} {v:.3g}" for p, v in report["percentiles"].items()))
+    print("worst input regions:")
+    for region in report["worst_regions"]:
+        print(f"  [{region['from']:8.3f}, {region['to']:8.3f}): max {region['max']:.4g}, mean {region['mean']:.4g}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
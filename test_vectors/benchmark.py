@@ -0,0 +1,223 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import subprocess
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+import vector_store
+from generate_test_vectors import exp, requant, exp_batch, requant_batch
+from ln_debug import layer_norm, layer_norm_batch, ln_parameters
+from sm_debug import softmax, softmax_batch
+
+# scalar paths are per-element Python loops, keep them to sizes that finish in a few seconds
+SCALAR_LIMIT = 20000
+
+
+def random_exp(rng, n):
+    return [rng.integers(-2**31, 2**31 - 1, size=n, dtype=np.int64) for _ in range(5)]
+
+
+def random_req(rng, n):
+    return [rng.integers(-2**30, 2**30 - 1, size=n, dtype=np.int64), rng.integers(-2**30, 2**30 - 1, size=n, dtype=np.int64),
+            rng.integers(0, 2**31 - 1, size=n, dtype=np.int64), np.full(n, 30, dtype=np.int64)]
+
+
+def random_sm(rng, rows, length):
+    # coefficients of sm_test_vectors.txt, inputs in the same range as its qin rows
+    qin = rng.integers(-2**12, 2**12, size=(rows, length)).astype(np.int32)
+    coeffs = [np.full(rows, x, dtype=np.int32) for x in (0x4C0, 0x89AE6, -312, -3441481, 0x3B7F7D1)]
+    return qin, coeffs
+
+
+def random_ln(rng, rows, length):
+    return (rng.integers(-2**15, 2**15, size=(rows, length)).astype(np.int32),
+            rng.integers(-2**8, 2**8, size=(rows, length)).astype(np.int32))
+
+
+def bench_exp(mode, n, rng):
+    cols = random_exp(rng, n)
+    start = time.perf_counter()
+    if mode == "batch":
+        exp_batch(*cols)
+    else:
+        for qin, qb, qc, qln2, qln2_inv in zip(*[np.int32(c) for c in cols]):
+            exp(qin, qb, qc, qln2, qln2_inv)
+    return time.perf_counter() - start, n, n * 6 * 4
+
+
+def bench_req(mode, n, rng):
+    qin, bias, m, e = random_req(rng, n)
+    start = time.perf_counter()
+    if mode == "batch":
+        requant_batch(qin, bias, m, e)
+    else:
+        for args in zip(np.int32(qin), np.int32(bias), np.int32(m), np.int8(e)):
+            requant(*args)
+    return time.perf_counter() - start, n, n * (4 * 4 + 1)
+
+
+def bench_sm(mode, rows, length, rng):
+    qin, coeffs = random_sm(rng, rows, length)
+    start = time.perf_counter()
+    if mode == "batch":
+        softmax_batch(qin, *coeffs)
+    else:
+        for i in range(rows):
+            softmax(qin[i], *[c[i] for c in coeffs])
+    return time.perf_counter() - start, rows * length, rows * (length * 5 + 5 * 4)
+
+
+def bench_ln(mode, rows, length, rng):
+    qin, bias = random_ln(rng, rows, length)
+    # the defaults are the L = 768 constants, other lengths would overflow or skew the mean
+    shift, n_inv = ln_parameters(length)
+    start = time.perf_counter()
+    if mode == "batch":
+        layer_norm_batch(qin, bias, shift=shift, n_inv=n_inv)
+    else:
+        for i in range(rows):
+            layer_norm(qin[i], bias[i], shift=shift, n_inv=n_inv)
+    return time.perf_counter() - start, rows * length, rows * length * 3 * 4
+
+
+def bench_format(mode, rows, length, rng):
+    """
+    Load an sm suite of `rows` x `length` from hex text (parse every token) or from a .npy store (memmap and touch).
+    """
+    qin, coeffs = random_sm(rng, rows, length)
+    arrays = {"qin": qin, "qb": coeffs[0], "qc": coeffs[1], "qln2": coeffs[2], "qln2_inv": coeffs[3],
+              "Sreq": coeffs[4], "qout": softmax_batch(qin, *coeffs)["qout"]}
+    with tempfile.TemporaryDirectory() as tmp:
+        if mode == "txt":
+            path = os.path.join(tmp, "sm.txt")
+            with open(path, "w") as f:
+                f.write(vector_store.format_lines("sm", arrays))
+            size = os.path.getsize(path)
+            start = time.perf_counter()
+            with open(path, "r") as f:
+                lines = f.readlines()
+            vector_store.parse_lines("sm", lines, length)
+        else:
+            path = os.path.join(tmp, "sm")
+            vector_store.save("sm", arrays, path)
+            size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+            start = time.perf_counter()
+            store = vector_store.load(path)
+            for name in arrays:
+                np.asarray(store[name]).sum()
+        elapsed = time.perf_counter() - start
+    return elapsed, rows * length, size
+
+
+KERNELS = {"exp": bench_exp, "req": bench_req, "sm": bench_sm, "ln": bench_ln, "format": bench_format}
+
+
+def cases(quick: bool = False) -> list:
+    """
+    Benchmark sweep: (kernel, mode, size args). Element kernels sweep the batch size,
+    row kernels and file formats sweep the row length L at a fixed element budget.
+    """
+    sizes = [10**3, 10**4, 10**5] if quick else [10**3, 10**4, 10**5, 10**6, 10**7]
+    lengths = [32, 256, 4096] if quick else [32, 128, 512, 1024, 4096]
+    budget = 2**16 if quick else 2**20
+    result = []
+    for kernel in ("exp", "req"):
+        for n in sizes:
+            for mode in ("scalar", "batch"):
+                if mode == "batch" or n <= SCALAR_LIMIT:
+                    result.append((kernel, mode, (n,)))
+    for kernel in ("sm", "ln"):
+        for length in lengths:
+            rows = max(budget // length, 1)
+            result.append((kernel, "scalar", (max(min(rows, SCALAR_LIMIT * 4 // length), 1), length)))
+            result.append((kernel, "batch", (rows, length)))
+    for length in (32, 4096):
+        for mode in ("txt", "npy"):
+            result.append(("format", mode, (max(budget // length, 1), length)))
+    return result
+
+
+def run_case(kernel, mode, args, repeats, seed):
+    """
+    Run one case in the current process, best of `repeats`. Meant to run in a fresh worker process
+    so ru_maxrss is the peak of this case alone.
+    """
+    warnings.simplefilter("ignore")
+    best = None
+    for _ in range(repeats):
+        rng = np.random.default_rng(seed)
+        elapsed, items, size = KERNELS[kernel](mode, *args, rng)
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "kernel": kernel,
+        "mode": mode,
+        "args": list(args),
+        "seconds": best,
+        "items": items,
+        "bytes": size,
+        "items_per_second": items / best if best else 0.0,
+        "bytes_per_second": size / best if best else 0.0,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run(quick: bool = False, repeats: int = 3, seed: int = 0) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for kernel, mode, args in cases(quick):
+        with context.Pool(1) as pool:
+            result = pool.apply(run_case, (kernel, mode, args, repeats, seed))
+        print(f"{kernel:7s} {mode:7s} {str(tuple(args)):16s} {result['items_per_second']:14.4g} items/s "
+              f"{result['bytes_per_second']:14.4g} B/s {result['peak_rss_kb'] / 1024:9.1f} MiB")
+        results.append(result)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "numpy": np.__version__, "timestamp": time.time(), "results": results}
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.8) -> list:
+    """
+    Cases whose throughput dropped below `threshold` times the baseline: (kernel, mode, args, ratio).
+    """
+    key = lambda r: (r["kernel"], r["mode"], tuple(r["args"]))
+    previous = {key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get(key(result))
+        if old and old["items_per_second"]:
+            ratio = result["items_per_second"] / old["items_per_second"]
+            if ratio < threshold:
+                regressions.append((*key(result), ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="throughput benchmarks of the golden models and vector formats")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="machine-readable results")
+    parser.add_argument("--quick", action="store_true", help="smaller sweep")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--compare", default=None, help="previous results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.8, help="throughput ratio below which a case regressed")
+    args = parser.parse_args()
+
+    report = run(args.quick, args.repeats, args.seed)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for kernel, mode, size, ratio in regressions:
+            print(f"REGRESSION: {kernel} {mode} {size}: {ratio:.2f}x of baseline")
+        if regressions:
+            raise SystemExit(1)
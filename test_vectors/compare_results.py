@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+from itertools import islice
+
+import numpy as np
+
+import hex_codec
+import vector_store
+
+# ops whose testbench results are one "vector count N:" block of L element lines per row
+ROW_OPS = ("ln", "sm")
+
+# absolute error histogram bins: 0, 1, 2-3, 4-7, ..., [2^31, 2^32]
+ERROR_EDGES = np.array([1 << k for k in range(33)], dtype=np.int64)
+
+
+def to_int32(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.int64).astype(np.uint32).view(np.int32)
+
+
+# fields picked from the result lines, as written by non_lin_ops_tb.sv: the hex qin of every line, the hex
+# got value of FAIL lines, and for ln / sm the decimal row of "vector count N:" and element index lines
+QIN_KEY = {"ln": b"ln_qin=", "sm": b"sm_qin="}
+GOT_KEY = {"ln": b", qout=", "sm": b", qout="}
+# the first bytes of a result line, anything else in a results file is skipped
+RESULT_PREFIXES = ("PASS", "FAIL")
+DECIMAL_VALUES = np.full(256, 255, dtype=np.uint8)
+DECIMAL_VALUES[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+
+
+def _find(buf: np.ndarray, key: bytes) -> np.ndarray:
+    """
+    Start offsets of every occurrence of `key` in the byte array buf.
+    """
+    pos = np.flatnonzero(buf[:max(len(buf) - len(key) + 1, 0)] == key[0])
+    for i, c in enumerate(key[1:], 1):
+        pos = pos[buf[pos + i] == c]
+    return pos
+
+
+def _read_numbers(buf: np.ndarray, starts: np.ndarray, table: np.ndarray, base: int, max_digits: int = 16) -> np.ndarray:
+    """
+    uint64 values of the digit runs (at most `max_digits` long) beginning at `starts`, digits decoded through
+    `table` (255: not a digit). buf must extend at least `max_digits` bytes past the last start.
+    """
+    digits = table[np.lib.stride_tricks.sliding_window_view(buf, max_digits)[starts]]
+    # a run ends at its first non-digit, the window may reach into the next field
+    inside = np.logical_and.accumulate(digits != 255, axis=1)
+    values = np.zeros(len(starts), dtype=np.uint64)
+    for k in range(max_digits):
+        if not inside[:, k].any():
+            break
+        values = np.where(inside[:, k], values * np.uint64(base) + digits[:, k], values)
+    return values
+
+
+def parse_result_lines(op: str, lines: list) -> dict:
+    """
+    Parse testbench result lines into arrays: row, index (element within the row), qin, got and passed.
+    PASS lines only carry qin, so their got value is filled in from the expected column later (marked -1 here).
+    The lines are searched as one byte array: field keys are located with vectorized compares, and the hex /
+    decimal digits after them decoded through the hex_codec digit table.
+    """
+    data = "".join(lines).encode("ascii")
+    # padded with empty lines so a digit window starting on the last line stays inside the buffer
+    buf = np.frombuffer(data + b"\n" * 16, dtype=np.uint8)
+    line_starts = np.append(0, np.flatnonzero(buf[:-1] == ord("\n")) + 1)
+    first = buf[line_starts]
+    results = line_starts[(first == ord("P")) | (first == ord("F"))]
+    passed = buf[results] == ord("P")
+
+    def per_result(key: bytes, table: np.ndarray, base: int, default: int) -> np.ndarray:
+        # value of `key` on each result line, `default` where the line has none
+        pos = _find(buf, key)
+        line = np.searchsorted(results, pos, side="right") - 1
+        keep = (line >= 0) & (pos < np.append(results[1:], len(buf))[np.maximum(line, 0)])
+        values = np.full(len(results), default, dtype=np.int64)
+        values[line[keep]] = _read_numbers(buf, pos[keep] + len(key), table, base).astype(np.int64)
+        return values
+
+    qin = per_result(QIN_KEY.get(op, b": qin="), hex_codec.DIGIT_VALUES, 16, 0)
+    got = per_result(GOT_KEY.get(op, b" got_qout="), hex_codec.DIGIT_VALUES, 16, -1)
+    if op in ROW_OPS:
+        index = per_result(b" at index ", DECIMAL_VALUES, 10, 0)
+        counts = line_starts[first == ord("v")]
+        count_values = _read_numbers(buf, counts + len(b"vector count "), DECIMAL_VALUES, 10).astype(np.int64)
+        # every element line belongs to the last "vector count" line before it, -1 (the appended row) before the first
+        rows = np.append(count_values, -1)[np.searchsorted(counts, results) - 1]
+    else:
+        index = np.zeros(len(results), dtype=np.int64)
+        rows = np.zeros(0, dtype=np.int64)
+    return {
+        "row": rows.astype(np.int64),
+        "index": index,
+        "qin": to_int32(qin),
+        "got": np.where(passed, -1, to_int32(got)).astype(np.int32),
+        "passed": passed,
+    }
+
+
+def iter_vector_chunks(op: str, vector_path: str, chunk_rows: int):
+    """
+    Yield (first row, arrays) chunks of a hex text vector file or .npy vector store.
+    """
+    if os.path.isdir(vector_path):
+        store = vector_store.load(vector_path)
+        store.pop("op")
+        num_rows = len(store["qin"])
+        for start in range(0, num_rows, chunk_rows):
+            yield start, {name: np.asarray(array[start:start + chunk_rows]) for name, array in store.items()}
+        return
+    start = 0
+    with open(vector_path, "r") as infile:
+        lines = (line for line in infile if line.strip())
+        while True:
+            chunk = list(islice(lines, chunk_rows))
+            if not chunk:
+                break
+            yield start, vector_store.parse_lines(op, chunk, vector_store.row_length(op, chunk[0]))
+            start += len(chunk)
+
+
+def compare_chunks(op: str, vector_path: str, results_path: str, chunk_rows: int = 4096):
+    """
+    Line up a testbench results file with its vector file and yield one dict per chunk of vector rows:
+    start (first row), num_rows, length, pos (flat row * length + index of each parsed result), failed and
+    error (absolute got - expected) per result, and the misaligned / missing / extra result counts.
+    Lines that are not results (blank lines, testbench chatter) are skipped, so they do not shift the scalar
+    results onto the wrong vector rows. Result lines left over after the last vector row are counted as extra
+    in a final empty chunk.
+    """
+    prefixes = RESULT_PREFIXES + ("vector count",) if op in ROW_OPS else RESULT_PREFIXES
+    with open(results_path, "r") as infile:
+        results = (line for line in infile if line.startswith(prefixes))
+        for start, vectors in iter_vector_chunks(op, vector_path, chunk_rows):
+            num_rows = len(vectors["qin"])
+            if op in ROW_OPS:
+                length = vectors["qin"].shape[1]
+                # one "vector count" line before every element line
+                lines = list(islice(results, num_rows * 2 * length))
+                expected = to_int32(np.asarray(vectors["qout"], dtype=np.int64).reshape(-1))
+                qin = to_int32(vectors["qin"].reshape(-1))
+            else:
+                length = 1
+                lines = list(islice(results, num_rows))
+                expected = to_int32(vectors["qout"])
+                qin = to_int32(vectors["qin"])
+            parsed = parse_result_lines(op, lines)
+            extra = 0
+            if op in ROW_OPS:
+                pos = (parsed["row"] - start) * length + parsed["index"]
+                keep = (pos >= 0) & (pos < num_rows * length)
+                extra = int(np.count_nonzero(~keep))
+                pos = pos[keep]
+                parsed = {key: value[keep] for key, value in parsed.items()}
+            else:
+                pos = np.arange(len(parsed["qin"]))
+
+            got = np.where(parsed["passed"], expected[pos], parsed["got"]).astype(np.int64)
+            error = np.abs(got - expected[pos].astype(np.int64))
+            yield {
+                "start": start,
+                "num_rows": num_rows,
+                "length": length,
+                "pos": pos,
+                "failed": (~parsed["passed"]) | (error != 0),
+                "error": error,
+                "misaligned": int(np.count_nonzero(parsed["qin"] != qin[pos])),
+                "missing": num_rows * length - len(pos),
+                "extra": extra,
+            }
+
+        # result lines beyond the last vector row (e.g. the testbench reading a trailing empty line)
+        extra = sum(1 for line in results if not line.startswith("vector count"))
+        empty = np.zeros(0, dtype=np.int64)
+        yield {"start": 0, "num_rows": 0, "length": 1, "pos": empty, "failed": empty.astype(bool), "error": empty,
+               "misaligned": 0, "missing": 0, "extra": extra}
+
+
+def failing_rows(op: str, vector_path: str, results_path: str, chunk_rows: int = 4096) -> np.ndarray:
+    """
+    Sorted indices of the vector rows with at least one failing result.
+    """
+    rows = [chunk["start"] + chunk["pos"][chunk["failed"]] // chunk["length"]
+            for chunk in compare_chunks(op, vector_path, results_path, chunk_rows)]
+    return np.unique(np.concatenate(rows))
+
+
+def compare(op: str, vector_path: str, results_path: str, first_n: int = 10, chunk_rows: int = 4096) -> dict:
+    """
+    Compare a testbench results file with the expected column of its vector file, chunk by chunk.
+    Reports mismatch counts, the first `first_n` failing (row, index) pairs, results whose qin does not match
+    the vector row (misaligned), an absolute-error histogram, and for ln/sm per-element mismatch counts
+    and maximum absolute error over the L positions of a row.
+    """
+    report = {"op": op, "rows": 0, "elements": 0, "mismatches": 0, "misaligned": 0, "missing": 0, "extra": 0,
+              "first_failures": [], "error_histogram": [0] * (len(ERROR_EDGES) + 1)}
+    per_element_mismatches = None
+    per_element_max_error = None
+
+    for chunk in compare_chunks(op, vector_path, results_path, chunk_rows):
+        start, length, pos, failed, error = (chunk[key] for key in ("start", "length", "pos", "failed", "error"))
+        for key in ("misaligned", "missing", "extra"):
+            report[key] += chunk[key]
+        report["mismatches"] += int(np.count_nonzero(failed))
+        report["rows"] += chunk["num_rows"]
+        report["elements"] += len(pos)
+        hist = np.bincount(np.searchsorted(ERROR_EDGES, error, side="right"), minlength=len(ERROR_EDGES) + 1)
+        report["error_histogram"] = [a + int(b) for a, b in zip(report["error_histogram"], hist)]
+
+        need = first_n - len(report["first_failures"])
+        if need > 0:
+            for p in pos[failed][:need]:
+                report["first_failures"].append([int(start + p // length), int(p % length)])
+
+        if op in ROW_OPS and chunk["num_rows"]:
+            if per_element_mismatches is None:
+                per_element_mismatches = np.zeros(length, dtype=np.int64)
+                per_element_max_error = np.zeros(length, dtype=np.int64)
+            element = pos % length
+            np.add.at(per_element_mismatches, element[failed], 1)
+            np.maximum.at(per_element_max_error, element, error)
+
+    if per_element_mismatches is not None:
+        report["per_element_mismatches"] = per_element_mismatches.tolist()
+        report["per_element_max_error"] = per_element_max_error.tolist()
+    return report
+
+
+def format_histogram(histogram: list) -> str:
+    labels = ["0"] + [f"[{1 << k}, {(1 << (k + 1)) - 1}]" for k in range(len(histogram) - 1)]
+    return "\n".join(f"  |err| {label}: {count}" for label, count in zip(labels, histogram) if count)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="compare testbench results with the expected column of a vector file")
+    parser.add_argument("op", choices=["exp", "gelu", "ln", "req", "sm"])
+    parser.add_argument("vector_file", nargs="?", default=None, help="vector file or store (default: <op>_test_vectors.txt)")
+    parser.add_argument("results_file", nargs="?", default=None, help="testbench results (default: <op>_test_results.txt)")
+    parser.add_argument("--first", type=int, default=10, help="failing indices to report")
+    parser.add_argument("--chunk-rows", type=int, default=4096)
+    parser.add_argument("--json", default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    vector_file = args.vector_file or f"{args.op}_test_vectors.txt"
+    results_file = args.results_file or f"{args.op}_test_results.txt"
+    report = compare(args.op, vector_file, results_file, args.first, args.chunk_rows)
+
+    print(f"{results_file}: {report['elements'] - report['mismatches']}/{report['elements']} elements match "
+          f"({report['rows']} rows, {report['misaligned']} misaligned, {report['missing']} missing, {report['extra']} extra)")
+    if report["first_failures"]:
+        print(f"first failures (row, index): {report['first_failures']}")
+    print("absolute error histogram:")
+    print(format_histogram(report["error_histogram"]))
+    if "per_element_mismatches" in report:
+        print(f"per-element mismatches: {report['per_element_mismatches']}")
+        print(f"per-element max |err|: {report['per_element_max_error']}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
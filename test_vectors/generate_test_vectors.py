@@ -1,5 +1,15 @@
 import numpy as np
 import argparse
+import math
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import vector_store
+from ln_debug import layer_norm_batch, ln_parameters
+from rounding import round_shift
+from sm_debug import softmax_batch
 
 def exp(qin: np.int32, qb: np.int32, qc: np.int32, qln2: np.int32, qln2_inv: np.int32, fp_bits: int = 30) -> np.int32:
     fp_mul = np.int64(qin) * qln2_inv   # mul
@@ -26,9 +36,88 @@ def requant(qin: np.int32, bias: np.int32, m: np.int32, e: np.int8, out_bits: in
     qout = np.int32(qout)
     return qout
 
-def gen_exp(num_samples: int = 10000, output_file: str = "exp_test_vectors.txt"):
+def exp_batch(qin: np.ndarray, qb: np.ndarray, qc: np.ndarray, qln2: np.ndarray, qln2_inv: np.ndarray, fp_bits: int = 30,
+              intermediate_results: dict = None) -> np.ndarray:
+    '''
+        Whole-array version of `exp`, bit-exact with the scalar model.
+        qin, qb, qc, qln2, qln2_inv - int64 arrays (or scalars) holding int32 values, broadcastable
+        intermediate_results - if given, filled with the intermediate arrays
+        qout - int32 array
+    '''
+    qin = np.asarray(qin, dtype=np.int64)
+    fp_mul = qin * np.asarray(qln2_inv, dtype=np.int64)    # mul
+    z = fp_mul >> fp_bits
+    qp = qin - z * np.asarray(qln2, dtype=np.int64)         # mul, sub
+    ql = (qp + np.asarray(qb, dtype=np.int64)) * qp + np.asarray(qc, dtype=np.int64)  # poly
+    qout = (ql >> z).astype(np.int32)                       # shift
+    if intermediate_results is not None:
+        intermediate_results.update(fp_mul=fp_mul, z=z, qp=qp, ql=ql, qout=qout)
+    return qout
+
+def requant_batch(qin: np.ndarray, bias: np.ndarray, m: np.ndarray, e: np.ndarray, out_bits: int = 8, clip: bool = True,
+                  rounding: str = "half_even", intermediate_results: dict = None) -> np.ndarray:
+    '''
+        Whole-array version of `requant`, bit-exact with the scalar model.
+        The shift and round is integer-only (see rounding.round_shift), so it stays exact where qm exceeds 2^53.
+        A negative e shifts left saturating at the int64 range, so the clip sees the value the float model does.
+        qin, bias, m - int64 arrays (or scalars) holding int32 values, broadcastable
+        e - int64 array (or scalar) holding int8 values
+        rounding - half_even (np.round, the scalar model), half_up or floor
+        intermediate_results - if given, filled with the intermediate arrays
+        qout - int32 array
+    '''
+    n = 2 ** (out_bits - 1) - 1
+    qbias = (np.asarray(qin, dtype=np.int64) + np.asarray(bias, dtype=np.int64)).astype(np.int32)  # int32
+    qm = qbias.astype(np.int64) * np.asarray(m, dtype=np.int64).astype(np.int32)                    # int64
+    qout_raw = round_shift(qm, np.asarray(e, dtype=np.int64).astype(np.int8), rounding, saturate=True)  # shift and round
+    qout = np.clip(qout_raw, -n-1, n) if clip else qout_raw
+    qout = qout.astype(np.int32)
+    if intermediate_results is not None:
+        intermediate_results.update(qbias=qbias, qm=qm, qout_raw=qout_raw, qout=qout)
+    return qout
+
+def gelu(qin: np.int32, qb: np.int32, qc: np.int32, q1: np.int32, shift: int = 14) -> np.int32:
+    '''
+        I-BERT integer GELU as evaluated by the non_lin_ops gelu states, int64 internally.
+        qin - int32, input
+        qb, qc - int32, erf polynomial coefficients, (q_clip + 2*qb) * q_clip + qc
+        q1 - int32, erf offset
+        shift - int, shift of the erf output
+        qout - int32, output
+    '''
+    qin = np.int64(qin)
+    q_sgn = np.int64(-1 if qin < 0 else 1)              # sign, 1 for qin = 0
+    q_abs = -qin if qin < 0 else qin                    # mul, abs
+    q_clip = min(q_abs, -np.int64(qb))                  # mul, sub, min
+    ql = (q_clip + 2 * np.int64(qb)) * q_clip + qc      # mul, add, mul, add
+    q_erf = (ql * q_sgn) >> shift                       # mul, shift
+    qout = np.int32((q_erf + q1) * qin)                 # add, mul
+    return qout
+
+def gelu_batch(qin: np.ndarray, qb: np.ndarray, qc: np.ndarray, q1: np.ndarray, shift: int = 14,
+               intermediate_results: dict = None) -> np.ndarray:
+    '''
+        Whole-array version of `gelu`, bit-exact with the scalar model.
+        qin, qb, qc, q1 - int64 arrays (or scalars) holding int32 values, broadcastable
+        intermediate_results - if given, filled with the intermediate arrays
+        qout - int32 array
+    '''
+    qin = np.asarray(qin, dtype=np.int64)
+    qb = np.asarray(qb, dtype=np.int64)
+    q_sgn = np.where(qin < 0, -1, 1)                                    # sign, 1 for qin = 0
+    q_clip = np.minimum(np.abs(qin), -qb)                               # mul, abs, sub, min
+    ql = (q_clip + 2 * qb) * q_clip + np.asarray(qc, dtype=np.int64)    # mul, add, mul, add
+    q_erf = (ql * q_sgn) >> shift                                       # mul, shift
+    qout_64 = (q_erf + np.asarray(q1, dtype=np.int64)) * qin            # add, mul
+    qout = qout_64.astype(np.int32)
+    if intermediate_results is not None:
+        intermediate_results.update(q_clip=q_clip, ql=ql, q_erf=q_erf, qout_64=qout_64, qout=qout)
+    return qout
+
+def gen_exp(num_samples: int = 10000, output_file: str = "exp_test_vectors.txt", chunk_size: int = 1 << 12):
     """
     Generate random inputs, compute outputs using `exp`, and save them in a text file.
+    Rows are written `chunk_size` at a time, so memory stays bounded.
     """
     # Set ranges for random values
     qin_range = (-2**31, 2**31 - 1)
@@ -37,8 +126,7 @@ def gen_exp(num_samples: int = 10000, output_file: str = "exp_test_vectors.txt")
     qln2_range = (-2**31, 2**31 - 1)
     qln2_inv_range = (-2**31, 2**31 - 1)
     
-    # Open file for writing
-    with open(output_file, "w") as f:
+    def rows():
         for _ in range(num_samples):
             # Generate random inputs
             qin = np.int32(np.random.randint(*qin_range))
@@ -46,30 +134,18 @@ def gen_exp(num_samples: int = 10000, output_file: str = "exp_test_vectors.txt")
             qc = np.int32(np.random.randint(*qc_range))
             qln2 = np.int32(np.random.randint(*qln2_range))
             qln2_inv = np.int32(np.random.randint(*qln2_inv_range))
-            
+
             # Compute output
             qout = exp(qin=qin, qb=qb, qc=qc, qln2=qln2, qln2_inv=qln2_inv)
-            
-            # Format inputs and outputs as hexadecimal
-            qin_hex = f"{qin & 0xFFFFFFFF:08X}"
-            qb_hex = f"{qb & 0xFFFFFFFF:08X}"
-            qc_hex = f"{qc & 0xFFFFFFFF:08X}"
-            qln2_hex = f"{qln2 & 0xFFFFFFFF:08X}"
-            qln2_inv_hex = f"{qln2_inv & 0xFFFFFFFF:08X}"
-            qout_hex = f"{qout & 0xFFFFFFFF:08X}"
-            
-            # Write to file
-            f.write(f"{qin_hex} {qb_hex} {qc_hex} {qln2_hex} {qln2_inv_hex} {qout_hex}\n")
+            yield (qin, qb, qc, qln2, qln2_inv, qout)
 
-def format_as_twos_complement(value, bits=32):
-    """
-    Format an integer value as a two's complement hexadecimal string with the specified number of bits.
-    """
-    return f"{value & (2**bits - 1):0{bits // 4}X}"
+    # Write inputs and outputs as hexadecimal, a chunk of rows at a time
+    write_vectors("exp", _row_chunks("exp", rows(), chunk_size), output_file)
 
-def gen_req(num_samples: int = 10000, output_file: str = "req_test_vectors.txt"):
+def gen_req(num_samples: int = 10000, output_file: str = "req_test_vectors.txt", chunk_size: int = 1 << 12):
     """
     Generate random inputs, compute outputs using `requant`, and save them in a text file.
+    Rows are written `chunk_size` at a time, so memory stays bounded.
     """
     # Set ranges for random values
     qin_range = (-2**30, 2**30 - 1)
@@ -77,8 +153,7 @@ def gen_req(num_samples: int = 10000, output_file: str = "req_test_vectors.txt")
     m_range = (0, 2**31 - 1)
     # e_range = (0, 64)
     
-    # Open file for writing
-    with open(output_file, "w") as f:
+    def rows():
         for _ in range(num_samples):
             # Generate random inputs
             qin = np.random.randint(*qin_range, dtype=np.int32)
@@ -86,25 +161,337 @@ def gen_req(num_samples: int = 10000, output_file: str = "req_test_vectors.txt")
             m = np.random.randint(*m_range, dtype=np.int32)
             # e = np.random.randint(*e_range, dtype=np.int8)
             e = np.int8(30)
-            
+
             # Compute output
             qout = requant(qin, bias, m, e)
-            
-            # Format inputs and outputs as hexadecimal
-            qin_hex = format_as_twos_complement(qin)
-            bias_hex = format_as_twos_complement(bias)
-            m_hex = format_as_twos_complement(m)
-            e_hex = format_as_twos_complement(e, bits=8)
-            qout_hex = format_as_twos_complement(qout)
-            
-            # Write to file
-            f.write(f"{qin_hex} {bias_hex} {m_hex} {e_hex} {qout_hex}\n")
+            yield (qin, bias, m, e, qout)
+
+    # Write inputs and outputs as hexadecimal, a chunk of rows at a time
+    write_vectors("req", _row_chunks("req", rows(), chunk_size), output_file)
+
+def exp_vectors(num_samples: int, seed: int = 0, chunk_size: int = 1 << 16):
+    """
+    Yield `exp` test vectors as dicts of int64 column arrays, `chunk_size` rows at a time.
+    Draws the same ranges as `gen_exp` from a seeded generator, so a (seed, chunk_size) pair always
+    produces the same vectors.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, num_samples, chunk_size):
+        size = min(chunk_size, num_samples - start)
+        qin, qb, qc, qln2, qln2_inv = rng.integers(-2**31, 2**31 - 1, size=(5, size), dtype=np.int64)
+        qout = exp_batch(qin, qb, qc, qln2, qln2_inv)
+        yield {"qin": qin, "qb": qb, "qc": qc, "qln2": qln2, "qln2_inv": qln2_inv, "qout": qout}
+
+def req_vectors(num_samples: int, seed: int = 0, chunk_size: int = 1 << 16):
+    """
+    Yield `requant` test vectors as dicts of int64 column arrays, `chunk_size` rows at a time.
+    Draws the same ranges as `gen_req` from a seeded generator.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, num_samples, chunk_size):
+        size = min(chunk_size, num_samples - start)
+        qin = rng.integers(-2**30, 2**30 - 1, size=size, dtype=np.int64)
+        bias = rng.integers(-2**30, 2**30 - 1, size=size, dtype=np.int64)
+        m = rng.integers(0, 2**31 - 1, size=size, dtype=np.int64)
+        e = np.full(size, 30, dtype=np.int64)
+        qout = requant_batch(qin, bias, m, e)
+        yield {"qin": qin, "bias": bias, "m": m, "e": e, "qout": qout}
+
+def _split_qbias(rng, qbias: np.ndarray) -> tuple:
+    """
+    Random qin + bias = qbias with both in int32 and no int32 wraparound in the sum.
+    """
+    lo = np.maximum(-2**31, qbias - (2**31 - 1))
+    hi = np.minimum(2**31 - 1, qbias + 2**31)
+    qin = rng.integers(lo, hi, endpoint=True, dtype=np.int64)
+    return qin, qbias - qin
+
+def _req_scaled(e: np.ndarray, out_bits: int, targets: np.ndarray, offsets: np.ndarray) -> tuple:
+    """
+    (qbias, m) with (qbias * m) / 2^e exactly targets + offsets / 2^c: m = 2^b and qbias = targets * 2^c + offsets,
+    c = e - b as large as the int32 qbias allows. offsets are in units of 2^(c-1) (so +-1 is a .5 tie, 0 exact),
+    plus a raw remainder column for off-by-one values next to the ties. Also returns the mask of rows that fit.
+    """
+    c = np.maximum(np.minimum(e, 30 - out_bits), e - 30)
+    b = e - c
+    half = np.where(c > 0, np.int64(1) << np.maximum(c - 1, 0), 0)
+    qbias = targets * (np.int64(1) << c) + offsets[0] * half + offsets[1]
+    ok = (b <= 30) & (qbias >= -2**31) & (qbias < 2**31) & ((c > 0) | (offsets[0] == 0))
+    return qbias, np.int64(1) << np.minimum(b, 30), ok
+
+def req_corner_cases(out_bits: int, e_values, seed: int = 0) -> dict:
+    """
+    Directed `requant` vectors for every e in `e_values` at `out_bits`: outputs on both sides of the clip
+    boundaries -2^(out_bits-1) and 2^(out_bits-1) - 1, exactly on and one LSB off the .5 ties there and at 0,
+    and extreme m (0, 1, 2^30, 2^31 - 1) against extreme and small qbias. Vectors that cannot reach a case at
+    a given e (a large e leaves no int32 qbias * m near the clip boundary) are dropped.
+    """
+    rng = np.random.default_rng(seed)
+    n = 2 ** (out_bits - 1) - 1
+    e = np.asarray(e_values, dtype=np.int64)
+
+    # clip boundaries and zero x (below a tie, on it, exact, on the upper tie, above it)
+    targets = np.array([-n - 2, -n - 1, -n, -1, 0, 1, n - 1, n, n + 1], dtype=np.int64)
+    offsets = np.array([[-1, 0], [-1, 1], [0, 0], [1, -1], [1, 0], [0, -1], [0, 1]], dtype=np.int64)
+    E, T, O = np.meshgrid(e, targets, np.arange(len(offsets)), indexing="ij")
+    qbias, m, ok = _req_scaled(E.ravel(), out_bits, T.ravel(), offsets[O.ravel()].T)
+    e_clip, qbias, m = E.ravel()[ok], qbias[ok], m[ok]
+
+    # extreme m x extreme qbias
+    extreme_m = np.array([0, 1, 2**30, 2**31 - 1], dtype=np.int64)
+    extreme_qbias = np.array([-2**31, -2**31 + 1, -2**15, -1, 0, 1, 2**15, 2**31 - 1], dtype=np.int64)
+    E, M, Q = (x.ravel() for x in np.meshgrid(e, extreme_m, extreme_qbias, indexing="ij"))
+
+    e = np.concatenate([e_clip, E])
+    qin, bias = _split_qbias(rng, np.concatenate([qbias, Q]))
+    m = np.concatenate([m, M])
+    return {"qin": qin, "bias": bias, "m": m, "e": e, "qout": requant_batch(qin, bias, m, e, out_bits=out_bits)}
+
+def req_sweep_vectors(num_samples: int, seed: int = 0, chunk_size: int = 1 << 16, out_bits: int = 8,
+                      e_values=range(64)):
+    """
+    Yield a `requant` sweep at `out_bits` as dicts of int64 column arrays, `chunk_size` rows at a time:
+    first the directed `req_corner_cases` for every e, then random vectors cycling through `e_values`,
+    a quarter exact .5 ties anywhere in the output range, half with qbias * m / 2^e spread over 1.5x the
+    output range, a quarter drawn like `gen_req` (most of those clip or round to 0 away from e = 30).
+    `num_samples` is a lower bound, the corner cases are always included.
+    """
+    rng = np.random.default_rng(seed)
+    corners = req_corner_cases(out_bits, e_values, seed)
+    for start in range(0, len(corners["qin"]), chunk_size):
+        yield {name: column[start:start + chunk_size] for name, column in corners.items()}
+    e_values = np.asarray(e_values, dtype=np.int64)
+    n = 2 ** (out_bits - 1) - 1
+    for start in range(len(corners["qin"]), num_samples, chunk_size):
+        size = min(chunk_size, num_samples - start)
+        index = np.arange(start, start + size)
+        e = e_values[index % len(e_values)]
+        kind = (index // len(e_values)) % 4
+
+        # .5 ties: target +- 1/2
+        tie_qbias, tie_m, tie_ok = _req_scaled(e, out_bits, rng.integers(-n - 1, n, endpoint=True, size=size),
+                                               np.stack([rng.choice([-1, 1], size=size), np.zeros(size, dtype=np.int64)]))
+        # spread over the output range with a random m
+        m = rng.integers(1, 2**31 - 1, size=size, endpoint=True, dtype=np.int64)
+        x = rng.uniform(-1.5, 1.5, size=size) * (n + 1)
+        spread_qbias = np.clip(np.floor(x * np.exp2(e) / m), -2**31, 2**31 - 1).astype(np.int64)
+        # gen_req ranges
+        plain_qbias = rng.integers(-2**30, 2**30 - 1, size=(2, size), dtype=np.int64).sum(axis=0)
+
+        use_tie = (kind == 0) & tie_ok
+        qbias = np.where(use_tie, tie_qbias, np.where(kind == 3, plain_qbias, spread_qbias))
+        m = np.where(use_tie, tie_m, m)
+        qin, bias = _split_qbias(rng, qbias)
+        qout = requant_batch(qin, bias, m, e, out_bits=out_bits)
+        yield {"qin": qin, "bias": bias, "m": m, "e": e, "qout": qout}
+
+def sm_coefficients(S: np.ndarray, a: float = 0.3585, b: float = 1.353, c: float = 0.344) -> tuple:
+    """
+    Integer exp coefficients for input scale(s) S, following the I-BERT i-exp polynomial
+    a * (p + b)^2 + c expanded to the (qp + qb) * qp + qc form the datapath evaluates.
+    Sreq requantizes the exp output to 2^15 fixed point, capped so exp(0) = qc stays within the int16 qreq.
+    Returns int64 arrays (qb, qc, qln2, qln2_inv, Sreq).
+    """
+    S = np.asarray(S, dtype=np.float64)
+    qb = np.floor(2 * b / S)
+    qc = np.floor((b * b + c / a) / S**2)
+    qln2 = np.floor(-math.log(2) / S)
+    qln2_inv = np.floor(2.0**30 / qln2)
+    Sreq = np.minimum(np.floor(a * S**2 * 2.0**45), np.floor((2**15 - 1) * 2.0**30 / qc))
+    return tuple(x.astype(np.int64) for x in (qb, qc, qln2, qln2_inv, Sreq))
+
+def sm_vectors(num_samples: int, seed: int = 0, chunk_size: int = 1 << 16, length: int = 32):
+    """
+    Yield softmax test vectors (`num_samples` rows of `length` elements) as dicts of arrays, in chunks of
+    about `chunk_size` elements. Each row draws its input scale in the range of sm_test_vectors.txt
+    and int16-range inputs.
+    """
+    rng = np.random.default_rng(seed)
+    chunk_rows = max(chunk_size // length, 1)
+    for start in range(0, num_samples, chunk_rows):
+        size = min(chunk_rows, num_samples - start)
+        S = rng.uniform(0.001, 0.0025, size=size)
+        qin = rng.integers(-2**15, 2**15, size=(size, length), dtype=np.int64).astype(np.int32)
+        qb, qc, qln2, qln2_inv, Sreq = sm_coefficients(S)
+        qout = softmax_batch(qin, qb, qc, qln2, qln2_inv, Sreq)["qout"]
+        yield {"qin": qin, "qb": qb, "qc": qc, "qln2": qln2, "qln2_inv": qln2_inv, "Sreq": Sreq, "qout": qout}
+
+def gelu_coefficients(S: np.ndarray, shift: int = 14, a: float = -0.2888, b: float = -1.769, c: float = 1.0) -> tuple:
+    """
+    Integer GELU coefficients for input scale(s) S, following I-BERT's i-GELU: the erf polynomial
+    a * (clip(|x|, -b) + b)^2 + c at scale S / sqrt(2), expanded to the (q_clip + 2*qb) * q_clip + qc
+    form the datapath evaluates, and the erf offset q1 at the erf output scale after the shift.
+    Reproduces the coefficients of gelu_test_vectors.h for shift = 14.
+    Returns int64 arrays (qb, qc, q1).
+    """
+    S_erf = np.asarray(S, dtype=np.float64) / math.sqrt(2)
+    qb = np.floor(b / S_erf)
+    qc = np.floor(c / (a * S_erf**2)) + qb * qb
+    q1 = np.floor(1 / (a * S_erf**2 * 2.0**shift))
+    return tuple(x.astype(np.int64) for x in (qb, qc, q1))
+
+def gelu_vectors(num_samples: int, seed: int = 0, chunk_size: int = 1 << 16, qin_bits: int = 16, shift: int = 14):
+    """
+    Yield `gelu` test vectors as dicts of int64 column arrays, `chunk_size` rows at a time.
+    Each vector draws its input scale in the range of gelu_test_vectors.h and a `qin_bits`-bit input
+    (16 covers the header's inputs and the clipped region, 32 the full int32 range).
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, num_samples, chunk_size):
+        size = min(chunk_size, num_samples - start)
+        S = rng.uniform(0.00067, 0.00158, size=size)
+        qin = rng.integers(-2**(qin_bits - 1), 2**(qin_bits - 1), size=size, dtype=np.int64)
+        qb, qc, q1 = gelu_coefficients(S, shift)
+        qout = gelu_batch(qin, qb, qc, q1, shift)
+        yield {"qin": qin, "qb": qb, "qc": qc, "q1": q1, "qout": qout}
+
+def ln_vectors(num_samples: int, seed: int = 0, chunk_size: int = 1 << 16, length: int = 768, qin_bits: int = 16):
+    """
+    Yield layer_norm test vectors (`num_samples` rows of `length` elements) as dicts of arrays, in chunks of
+    about `chunk_size` elements. Inputs and biases are `qin_bits`-bit signed, shift and n_inv follow
+    from the row length (`ln_parameters`).
+    """
+    rng = np.random.default_rng(seed)
+    shift, n_inv = ln_parameters(length, qin_bits)
+    chunk_rows = max(chunk_size // length, 1)
+    for start in range(0, num_samples, chunk_rows):
+        size = min(chunk_rows, num_samples - start)
+        qin = rng.integers(-2**(qin_bits - 1), 2**(qin_bits - 1), size=(size, length), dtype=np.int64).astype(np.int32)
+        bias = rng.integers(-2**(qin_bits - 1), 2**(qin_bits - 1), size=(size, length), dtype=np.int64).astype(np.int32)
+        qout = layer_norm_batch(qin, bias, shift=shift, n_inv=n_inv)["qout"]
+        yield {"qin": qin, "bias": bias, "qout": qout}
+
+def _row_chunks(op: str, rows, chunk_size: int):
+    """
+    Yield rows of scalars in the field order of `vector_store.FIELDS[op]` as dicts of int64 column arrays,
+    `chunk_size` rows at a time.
+    """
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        columns = np.array(chunk, dtype=np.int64).T
+        yield {name: column for (name, _, _, _), column in zip(vector_store.FIELDS[op], columns)}
+
+GENERATORS = {"exp": exp_vectors, "gelu": gelu_vectors, "ln": ln_vectors, "req": req_vectors, "sm": sm_vectors}
+
+def write_vectors(op: str, chunks, output: str, fmt: str = "txt"):
+    """
+    Write chunks of column arrays to a hex text vector file or a .npy vector store, one chunk at a time.
+    """
+    if fmt == "txt":
+        with open(output, "w") as f:
+            for chunk in chunks:
+                f.write(vector_store.format_lines(op, chunk))
+    else:
+        with vector_store.StoreWriter(op, output) as writer:
+            for chunk in chunks:
+                writer.append(chunk)
+
+def gen_exp_batched(num_samples: int = 10000, output_file: str = "exp_test_vectors.txt",
+                    seed: int = 0, chunk_size: int = 1 << 16):
+    """
+    Vectorized `gen_exp`: generate `num_samples` vectors in fixed-size chunks with a seeded generator.
+    """
+    write_vectors("exp", exp_vectors(num_samples, seed, chunk_size), output_file)
+
+def gen_req_batched(num_samples: int = 10000, output_file: str = "req_test_vectors.txt",
+                    seed: int = 0, chunk_size: int = 1 << 16):
+    """
+    Vectorized `gen_req`: generate `num_samples` vectors in fixed-size chunks with a seeded generator.
+    """
+    write_vectors("req", req_vectors(num_samples, seed, chunk_size), output_file)
+
+def gen_req_sweep(num_samples: int = 1 << 20, output_file: str = "req_test_vectors.txt", seed: int = 0,
+                  chunk_size: int = 1 << 16, out_bits_values=range(2, 17), e_values=range(64), fmt: str = "txt") -> list:
+    """
+    Write a `req_sweep_vectors` file of at least `num_samples` vectors for each out_bits. The vector format has
+    no out_bits column (the testbench sets it, 8), so each out_bits gets its own file, named
+    <output>_out<bits><ext>. Returns the file names.
+    """
+    root, ext = os.path.splitext(output_file)
+    outputs = []
+    for out_bits in out_bits_values:
+        output = f"{root}_out{out_bits}{ext}"
+        write_vectors("req", req_sweep_vectors(num_samples, seed, chunk_size, out_bits, e_values), output, fmt)
+        outputs.append(output)
+    return outputs
+
+def gen_sm_batched(num_samples: int = 4608, output_file: str = "sm_test_vectors.txt",
+                   seed: int = 0, chunk_size: int = 1 << 16):
+    """
+    Generate `num_samples` softmax rows in fixed-size chunks with a seeded generator.
+    """
+    write_vectors("sm", sm_vectors(num_samples, seed, chunk_size), output_file)
+
+def _gen_shard(op: str, num_samples: int, seed: np.random.SeedSequence, output: str, chunk_size: int, fmt: str,
+               options: dict) -> int:
+    write_vectors(op, GENERATORS[op](num_samples, seed, chunk_size, **options), output, fmt)
+    return num_samples
+
+def gen_sharded(op: str, num_samples: int, output: str, seed: int = 0, workers: int = None,
+                shard_size: int = 1 << 20, chunk_size: int = 1 << 16, fmt: str = "txt", options: dict = None):
+    """
+    Generate `num_samples` vectors as fixed-size shards on a process pool. Shard 0 draws from SeedSequence(seed),
+    the stream of the unsharded generators, and shard k > 0 from child k of it. Each worker writes its own part
+    file and the parts are merged in shard order, so the output for a given (seed, shard_size, chunk_size) is
+    byte-identical for any worker count, and equal to the unsharded output when it fits one shard.
+    `options` are passed on to the op's generator (e.g. qin_bits for gelu).
+    """
+    num_shards = -(-num_samples // shard_size)
+    root = np.random.SeedSequence(seed)
+    seeds = [root] + root.spawn(num_shards)[1:]
+    sizes = [min(shard_size, num_samples - k * shard_size) for k in range(num_shards)]
+    parts = [f"{output}.part{k}" for k in range(num_shards)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        list(pool.map(_gen_shard, [op] * num_shards, sizes, seeds, parts,
+                      [chunk_size] * num_shards, [fmt] * num_shards, [options or {}] * num_shards))
+    if fmt == "txt":
+        with open(output, "w") as outfile:
+            for part in parts:
+                with open(part, "r") as infile:
+                    shutil.copyfileobj(infile, outfile)
+                os.remove(part)
+    else:
+        vector_store.concat_stores(parts, output)
+        for part in parts:
+            shutil.rmtree(part)
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="generate test vectors for exp and requant")
-    parser.add_argument("function", help="exp / req")
+    parser = argparse.ArgumentParser(description="generate test vectors for exp, gelu, layer_norm, requant and softmax")
+    parser.add_argument("function", help="exp / gelu / ln / req / sm")
+    parser.add_argument("--batched", action="store_true", help="vectorized, chunked generation")
+    parser.add_argument("-n", "--num-samples", type=int, default=None, help="vectors (rows for ln / sm)")
+    parser.add_argument("-o", "--output", default=None, help="output file (default: <function>_test_vectors.txt)")
+    parser.add_argument("--seed", type=int, default=0, help="generator seed for --batched / --workers")
+    parser.add_argument("--chunk-size", type=int, default=1 << 16, help="rows (elements for ln / sm) per chunk")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="generate in seeded shards on a process pool; past the first shard the vectors "
+                             "differ from the unsharded stream of the same --seed")
+    parser.add_argument("--shard-size", type=int, default=1 << 20, help="vectors per shard with --workers")
+    parser.add_argument("--format", choices=["txt", "npy"], default="txt", help="hex text file or .npy vector store")
+    parser.add_argument("--qin-bits", type=int, default=16, help="gelu / ln input width, 32 for the full int32 range")
+    parser.add_argument("--length", type=int, default=None, help="row length L for ln (default 768) / sm (default 32)")
+    parser.add_argument("--sweep", action="store_true",
+                        help="req: e 0..63 x corner cases and random vectors, one file per --out-bits")
+    parser.add_argument("--out-bits", type=int, nargs="+", default=list(range(2, 17)), help="req --sweep output widths")
     args = parser.parse_args()
-    if (args.function == "exp"):
-        gen_exp()
-    if (args.function == "req"):
-        gen_req()
\ No newline at end of file
+    options = {"qin_bits": args.qin_bits} if args.function in ("gelu", "ln") else {}
+    if args.length and args.function in ("ln", "sm"):
+        options["length"] = args.length
+    num_samples = args.num_samples or {"ln": 256, "sm": 4608}.get(args.function, 10000)
+    output_file = args.output or f"{args.function}_test_vectors" + (".txt" if args.format == "txt" else "")
+    if args.sweep and args.function == "req":
+        for output in gen_req_sweep(num_samples, output_file, args.seed, args.chunk_size, args.out_bits, fmt=args.format):
+            print(output)
+    elif args.workers:
+        gen_sharded(args.function, num_samples, output_file, args.seed, args.workers,
+                    args.shard_size, args.chunk_size, args.format, options)
+    elif args.batched or args.format == "npy" or args.function in ("gelu", "ln", "sm"):
+        write_vectors(args.function, GENERATORS[args.function](num_samples, args.seed, args.chunk_size, **options),
+                      output_file, args.format)
+    elif (args.function == "exp"):
+        gen_exp(num_samples, output_file)
+    elif (args.function == "req"):
+        gen_req(num_samples, output_file)
@@ -0,0 +1,367 @@
+import argparse
+import time
+
+import numpy as np
+
+HEX_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
+# byte -> its two hex digits as one little-endian uint16 (first digit in the low byte)
+HEX_PAIRS = HEX_DIGITS[np.arange(256) >> 4].astype(np.uint16) | (HEX_DIGITS[np.arange(256) & 15].astype(np.uint16) << 8)
+
+# ASCII byte -> hex digit value, 255 for every other byte
+DIGIT_VALUES = np.full(256, 255, dtype=np.uint8)
+DIGIT_VALUES[np.frombuffer(b"0123456789", dtype=np.uint8)] = np.arange(10)
+DIGIT_VALUES[np.frombuffer(b"ABCDEF", dtype=np.uint8)] = np.arange(10, 16)
+DIGIT_VALUES[np.frombuffer(b"abcdef", dtype=np.uint8)] = np.arange(10, 16)
+
+# two ASCII bytes read as a little-endian uint16 -> the byte they spell, 0xFFFF unless both are hex digits
+_valid = np.flatnonzero(DIGIT_VALUES != 255)
+PAIR_VALUES = np.full(1 << 16, 0xFFFF, dtype=np.uint16)
+PAIR_VALUES[_valid[:, None] | (_valid[None, :] << 8)] = DIGIT_VALUES[_valid][:, None] * 16 + DIGIT_VALUES[_valid][None, :]
+# the same with every other byte read as a 0 digit, for windows that start before their token
+_digits = np.where(DIGIT_VALUES == 255, 0, DIGIT_VALUES).astype(np.uint8)
+_PAIR_DIGITS = (_digits[np.arange(1 << 16) & 255] * 16 + _digits[np.arange(1 << 16) >> 8]).astype(np.uint8)
+
+
+def hex_digits(values, bits: int = 32) -> np.ndarray:
+    """
+    ASCII digits (..., bits // 4) of the `bits`-wide two's complement of integer values, bits in 8 / 16 / 32 / 64.
+    """
+    values = np.asarray(values)
+    big_endian = values.astype(np.int64).astype(f">u{bits // 8}")
+    pairs = HEX_PAIRS[big_endian.view(np.uint8).reshape(values.shape + (bits // 8,))]
+    return pairs.view(np.uint8).reshape(values.shape + (bits // 4,))
+
+
+def _columns(columns: list) -> list:
+    """
+    Normalize format_rows entries: text stays as is, fields become (values (N, k), bits, width).
+    """
+    normalized = []
+    for column in columns:
+        if isinstance(column, str):
+            normalized.append(column)
+            continue
+        values = np.asarray(column[0])
+        bits = column[1]
+        width = column[2] if len(column) > 2 else bits // 4
+        normalized.append((values.reshape(len(values), int(np.prod(values.shape[1:]))), bits, width))
+    return normalized
+
+
+def _tails(columns: list, sep: str, end: str) -> list:
+    """
+    Text written after each entry: `sep` between entries, `end` after the last.
+    """
+    return [end if i == len(columns) - 1 else sep for i in range(len(columns))]
+
+
+def format_rows(columns: list, sep: str = " ", prefix: str = "", end: str = "\n") -> str:
+    """
+    Format N rows of hex tokens in one pass over whole arrays.
+    columns - (values, bits) or (values, bits, width) per field, or text written as is on every row.
+              values is (N,) for one token per row or (N, k) for k space-separated tokens. width is the
+              minimum digit count, bits // 4 by default (fixed width); wider values use as many digits as
+              they need, like f"{x:0{width}X}".
+    sep - between entries, e.g. " " (plain), " | " or "" when text entries carry the separators
+    prefix - before every token, e.g. "0x"
+    end - after every row
+    """
+    columns = _columns(columns)
+    fields = [column for column in columns if not isinstance(column, str)]
+    if not fields or not len(fields[0][0]):
+        return ""
+    num_rows = len(fields[0][0])
+    for values, bits, width in fields:
+        if width < bits // 4 and np.any(_unsigned(values, bits) >> (4 * width)):
+            return _format_variable(columns, sep, prefix, end)
+    digits = [hex_digits(values, bits) for values, bits, _ in fields]
+
+    # every row has the same layout: copy the digits into one (N, row length) byte matrix
+    layout, offsets = "", []
+    for column, tail in zip(columns, _tails(columns, sep, end)):
+        if isinstance(column, str):
+            layout += column + tail
+            continue
+        values, bits, width = column
+        offsets.append(len(layout) + len(prefix))
+        layout += " ".join([prefix + "0" * width] * values.shape[1]) + tail
+    out = np.empty((num_rows, len(layout)), dtype=np.uint8)
+    out[:] = np.frombuffer(layout.encode("ascii"), dtype=np.uint8)
+    for (values, bits, width), chars, offset in zip(fields, digits, offsets):
+        step = len(prefix) + width + 1
+        tokens = np.lib.stride_tricks.as_strided(out[:, offset:], shape=(num_rows, values.shape[1], width),
+                                                 strides=(out.strides[0], step, 1))
+        n = min(width, bits // 4)
+        tokens[:, :, width - n:] = chars[:, :, bits // 4 - n:]
+    return out.tobytes().decode("ascii")
+
+
+def _unsigned(values: np.ndarray, bits: int) -> np.ndarray:
+    """
+    The `bits`-wide two's complement of integer values, as the unsigned type of that width.
+    """
+    return np.asarray(values).astype(f"u{bits // 8}")
+
+
+def _format_variable(columns: list, sep: str, prefix: str, end: str) -> str:
+    """
+    format_rows for fields where some values need more digits than their width: rows differ in length.
+    Piece lengths give every token's offset in the output. Each token is written left-aligned in a window of
+    the widest field's digits, in one scatter in output order, onto a buffer of "0"s: the zeros after a
+    token's digits are overwritten by the tokens after it, and the separators, prefixes and text go in last.
+    """
+    fields = [column for column in columns if not isinstance(column, str)]
+    num_rows = len(fields[0][0])
+    size = max(bits for _, bits, _ in fields) // 4
+    window = np.dtype(f">u{size // 2}")
+    lengths, texts, tokens = [], [], []
+    for column, tail in zip(columns, _tails(columns, sep, end)):
+        # index of the column's first piece
+        col = sum(length.shape[1] for length in lengths)
+        if isinstance(column, str):
+            texts.append((col, column + tail))
+            lengths.append(np.full((num_rows, 1), len(column + tail)))
+            continue
+        values, bits, width = column
+        u = _unsigned(values, bits)
+        # digits the value needs, at least width
+        num_digits = np.full(u.shape, max(width, 1), dtype=np.int8)
+        for i in range(max(width, 1), bits // 4):
+            num_digits += u >= u.dtype.type(16 ** i)
+        # the digits shifted to the top of the window; the leading digits of a token wider than the window stay "0"s
+        u = u.astype(window.newbyteorder("="))
+        u <<= (4 * np.maximum(size - num_digits, 0)).astype(u.dtype)
+        num_digits = num_digits.astype(np.int64)
+        after = np.ones(values.shape[1], dtype=np.int64)
+        after[-1] = len(tail)
+        tokens.append((col, u, num_digits, tail))
+        lengths.append(len(prefix) + num_digits + after)
+    lengths = np.concatenate(lengths, axis=1) if len(lengths) > 1 else lengths[0]
+    ends = np.cumsum(lengths, axis=None).reshape(lengths.shape)
+    starts = ends - lengths
+    out = np.full(int(ends[-1, -1]) + size, ord("0"), dtype=np.uint8)
+
+    # token windows in output order: (N, tokens) in row-major order
+    if texts:
+        items = np.concatenate([u for _, u, _, _ in tokens], axis=1)
+        offsets = np.concatenate([starts[:, col:col + u.shape[1]] + len(prefix) + np.maximum(num_digits - size, 0)
+                                  for col, u, num_digits, _ in tokens], axis=1)
+    else:
+        items = tokens[0][1] if len(tokens) == 1 else np.concatenate([u for _, u, _, _ in tokens], axis=1)
+        offsets = starts + len(prefix)
+        if size < max(width for _, _, width in fields):
+            offsets += np.maximum(np.concatenate([num_digits for _, _, num_digits, _ in tokens], axis=1) - size, 0)
+    windows = np.ndarray(len(out) - size + 1, dtype=f"V{size}", buffer=out, strides=(1,))
+    pairs = np.take(HEX_PAIRS, items.astype(window).view(np.uint8))
+    windows[offsets.reshape(-1)] = pairs.reshape(-1).view(f"V{size}")
+
+    def put(positions, text):
+        chars = np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        if len(chars):
+            out[np.asarray(positions).reshape(-1, 1) + np.arange(len(chars))] = chars
+
+    for col, u, num_digits, tail in tokens:
+        k = u.shape[1]
+        put(starts[:, col:col + k], prefix)
+        after = starts[:, col:col + k] + len(prefix) + num_digits
+        put(after[:, :-1], " ")
+        put(after[:, -1], tail)
+    for col, text in texts:
+        put(starts[:, col], text)
+    return out[:len(out) - size].tobytes().decode("ascii")
+
+
+def format_values(values, bits: int = 32, width: int = None, prefix: str = "") -> str:
+    """
+    Space-separated two's complement hex of a scalar or 1-D array, without a line end.
+    """
+    values = np.atleast_1d(np.asarray(values)).reshape(1, -1)
+    return format_rows([(values, bits) if width is None else (values, bits, width)], prefix=prefix, end="")
+
+
+def _digit_mask(buf: np.ndarray, prefixed: bool = True) -> np.ndarray:
+    """
+    True for the bytes of buf that are token digits: hex digits, except the 0 of a 0x prefix.
+    Without `prefixed` (buf holds no x / X) the prefix search is skipped.
+    """
+    lower = buf | np.uint8(32)
+    is_digit = (buf - np.uint8(48) < 10) | (lower - np.uint8(97) < 6)
+    if prefixed:
+        x = np.flatnonzero(lower == ord("x"))
+        is_digit[x[x > 0] - 1] = False
+    return is_digit
+
+
+def _parse_fixed(data: bytes) -> np.ndarray:
+    """
+    parse_rows for buffers of equal-length lines with the token layout of the first line and token widths of
+    2 / 4 / 8 / 16 digits, or None. Runs of evenly spaced, equally wide tokens are read as strided uint16 views
+    of all lines at once and decoded two digits at a time.
+    """
+    line_length = data.find(b"\n") + 1
+    if not line_length or len(data) % line_length:
+        return None
+    lines = np.frombuffer(data, dtype=np.uint8).reshape(-1, line_length)
+    first = _digit_mask(lines[0])
+    pos = np.flatnonzero(first)
+    if not len(pos):
+        return None
+    starts = np.flatnonzero(np.diff(pos, prepend=-2) != 1)
+    widths = np.diff(np.append(starts, len(pos)))
+    if not np.all(np.isin(widths, (2, 4, 8, 16))):
+        return None
+    # every line must repeat the separators (and line end) of the first, the digits are checked while decoding
+    separators = np.flatnonzero(~first)
+    if np.any(lines[:, separators] != lines[0, separators]):
+        return None
+
+    token_starts = pos[starts]
+    values = np.empty((len(lines), len(token_starts)), dtype=np.uint64)
+    i = 0
+    while i < len(token_starts):
+        width = int(widths[i])
+        j = i + 1
+        step = int(token_starts[j] - token_starts[i]) if j < len(token_starts) else 1
+        while j < len(token_starts) and widths[j] == width and token_starts[j] - token_starts[j - 1] == step:
+            j += 1
+        digits = np.ndarray((len(lines), j - i, width // 2), dtype=np.uint16, buffer=data,
+                            offset=int(token_starts[i]), strides=(line_length, step, 2))
+        # in blocks of about 64k lookups, the gather's index temporaries then stay in cache
+        block = max(1, (1 << 16) // digits[0].size)
+        for row in range(0, len(lines), block):
+            pairs = np.take(PAIR_VALUES, digits[row:row + block])
+            if pairs.max() > 255:
+                return None
+            values[row:row + block, i:j] = pairs.astype(np.uint8).view(f">u{width // 2}")[..., 0]
+        i = j
+    return values
+
+
+def _parse_lines(padded: np.ndarray, begin: int, end: int, prefixed: bool = True) -> tuple:
+    """
+    Token values and per-line token counts (lines without tokens left out) of the whole lines padded[begin:end],
+    with begin >= 16. Token boundaries come from a digit mask, then every token is read right-aligned in a
+    window of the widest token's even width, decoded two digits at a time like the fixed layout, and cut to
+    its own digits.
+    """
+    buf = padded[begin:end]
+    is_digit = np.zeros(len(buf) + 2, dtype=bool)
+    is_digit[1:-1] = _digit_mask(buf, prefixed)
+    # token starts and ends alternate among the mask's edges
+    edges = np.flatnonzero(is_digit[1:] != is_digit[:-1])
+    starts, ends = edges[0::2], edges[1::2]
+    if not len(starts):
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64)
+    lengths = ends - starts
+    longest = int(lengths.max())
+    if longest > 16:
+        raise ValueError(f"hex token of {longest} digits, at most 16 are supported")
+    width = max(2, 1 << (longest - 1).bit_length())
+    # windows as one overlapping, unaligned `width`-byte item per byte offset, gathered in one pass; the bytes
+    # before a token in its window (separators, the previous token or line) are masked off by its length
+    items = np.ndarray(len(padded) - width + 1, dtype=f"V{width}", buffer=padded, strides=(1,))
+    windows = items[ends + (begin - width)].view(np.uint16).reshape(len(ends), width // 2)
+    pairs = np.take(_PAIR_DIGITS, windows)
+    values = pairs.view(f">u{width // 2}")[:, 0].astype(np.uint64)
+    values &= np.uint64(2**64 - 1) >> (np.uint64(64) - np.uint64(4) * lengths.astype(np.uint64))
+
+    # tokens per line, from where each line end falls among the token starts
+    line_ends = np.append(np.flatnonzero(buf == ord("\n")), len(buf))
+    counts = np.diff(np.searchsorted(starts, line_ends), prepend=0)
+    return values, counts[counts > 0]
+
+
+def _parse_variable(data: bytes, block: int = 1 << 18) -> np.ndarray:
+    """
+    parse_rows for any layout, `_parse_lines` over blocks of about `block` bytes cut at line ends, so the
+    byte passes over each block run in cache. The buffer is padded once in front, so every token has a
+    full window before it.
+    """
+    padded = np.frombuffer(b" " * 16 + data, dtype=np.uint8)
+    prefixed = b"x" in data or b"X" in data
+    values, counts = [], []
+    begin = 0
+    while begin < len(data):
+        end = data.rfind(b"\n", begin, begin + block) + 1 if begin + block < len(data) else len(data)
+        if end <= begin:
+            # a line longer than the block
+            end = data.find(b"\n", begin + block) + 1 or len(data)
+        block_values, block_counts = _parse_lines(padded, 16 + begin, 16 + end, prefixed)
+        values.append(block_values)
+        counts.append(block_counts)
+        begin = end
+    counts = np.concatenate(counts) if counts else np.zeros(0, dtype=np.int64)
+    if not len(counts):
+        return np.zeros((0, 0), dtype=np.uint64)
+    if np.any(counts != counts[0]):
+        raise ValueError(f"lines hold between {counts.min()} and {counts.max()} tokens")
+    return np.concatenate(values).reshape(len(counts), counts[0])
+
+
+def parse_rows(text) -> np.ndarray:
+    """
+    Parse every hex token of a str / bytes buffer into an (N, T) uint64 array, one row per non-empty line.
+    Tokens may be fixed or variable width (up to 16 digits) and "0x"-prefixed; spaces and "|" separate them.
+    Every non-empty line must hold the same number of tokens T.
+    """
+    data = text.encode("ascii") if isinstance(text, str) else bytes(text)
+    values = _parse_fixed(data)
+    return values if values is not None else _parse_variable(data)
+
+
+def to_signed(raw: np.ndarray, bits: int) -> np.ndarray:
+    """
+    Sign-extend `bits`-wide two's complement values held in unsigned integers to int64.
+    """
+    mask = np.uint64((1 << bits) - 1) if bits < 64 else np.uint64(2**64 - 1)
+    u = np.asarray(raw, dtype=np.uint64) & mask
+    if bits == 64:
+        return u.view(np.int64)
+    sign = np.uint64(1 << (bits - 1))
+    return (u ^ sign).astype(np.int64) - np.int64(1 << (bits - 1))
+
+
+def _best(fn, repeats: int) -> tuple:
+    """
+    (best wall time, result) of `repeats` calls.
+    """
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="bulk hex codec throughput against the per-element path")
+    parser.add_argument("-n", "--num-values", type=int, default=1 << 20)
+    parser.add_argument("--bits", type=int, default=32, choices=[8, 16, 32, 64])
+    parser.add_argument("--row-length", type=int, default=32, help="tokens per line")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--variable", action="store_true", help="tokens without leading zeros (variable width)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shape = (args.num_values // args.row_length, args.row_length)
+    values = rng.integers(-2**(args.bits - 1), 2**(args.bits - 1), size=shape, dtype=np.int64)
+    mask = (1 << args.bits) - 1
+    fmt = "{:X}" if args.variable else f"{{:0{args.bits // 4}X}}"
+    column = (values, args.bits, 1) if args.variable else (values, args.bits)
+
+    # per-element: the f-string / int(x, 16) loops the scripts used, including the array conversion
+    element_format, text = _best(lambda: "".join(" ".join(fmt.format(x & mask) for x in row) + "\n"
+                                                 for row in values.tolist()), args.repeats)
+    bulk_format, bulk = _best(lambda: format_rows([column]), args.repeats)
+    assert bulk == text
+    element_parse, parsed = _best(lambda: np.array([[int(x, 16) for x in line.split()] for line in text.splitlines()],
+                                                   dtype=np.uint64), args.repeats)
+    bulk_parse, raw = _best(lambda: parse_rows(text), args.repeats)
+    assert np.array_equal(raw, parsed) and np.array_equal(to_signed(raw, args.bits), values)
+
+    print(f"{values.size} values, {args.bits} bits{', variable width' if args.variable else ''}, "
+          f"{len(text) / 2**20:.1f} MiB of text")
+    print(f"format: per-element {element_format:.3f} s, bulk {bulk_format:.3f} s ({element_format / bulk_format:.1f}x)")
+    print(f"parse:  per-element {element_parse:.3f} s, bulk {bulk_parse:.3f} s ({element_parse / bulk_parse:.1f}x)")
@@ -0,0 +1,134 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+import perf_model
+from generate_test_vectors import gelu_batch, gelu_coefficients, requant_batch, sm_coefficients
+from ln_debug import layer_norm_batch, ln_parameters
+from sm_debug import softmax_batch
+
+
+def layer_workload(heads: int, seq_len: int, hidden: int, batch: int = 1, intermediate: int = None) -> list:
+    """
+    Non-linear work of one BERT/ViT-style encoder layer as (label, op, rows, length) entries:
+    softmax over heads x seq x seq, GELU over seq x intermediate, two layer_norms over seq x hidden
+    and a requant of every matmul output.
+    """
+    intermediate = intermediate or 4 * hidden
+    tokens = batch * seq_len
+    return [
+        ("attention softmax", "sm", batch * heads * seq_len, seq_len),
+        ("ffn gelu", "gelu", tokens * intermediate, 1),
+        ("attention layer_norm", "ln", tokens, hidden),
+        ("ffn layer_norm", "ln", tokens, hidden),
+        ("qkv requant", "req", 3 * tokens * hidden, 1),
+        ("scores requant", "req", batch * heads * seq_len * seq_len, 1),
+        ("context requant", "req", tokens * hidden, 1),
+        ("attention out requant", "req", tokens * hidden, 1),
+        ("ffn1 requant", "req", tokens * intermediate, 1),
+        ("ffn2 requant", "req", tokens * hidden, 1),
+    ]
+
+
+def layer_macs(heads: int, seq_len: int, hidden: int, batch: int = 1, intermediate: int = None) -> int:
+    """
+    Multiply-accumulates of the layer's matmuls: QKV and output projections, scores, context and the FFN.
+    """
+    intermediate = intermediate or 4 * hidden
+    tokens = batch * seq_len
+    return tokens * (4 * hidden * hidden + 2 * seq_len * hidden + 2 * hidden * intermediate)
+
+
+def replay(op: str, rows: int, length: int, rng, chunk_size: int = 1 << 16, max_elements: int = None) -> dict:
+    """
+    Stream `rows` x `length` synthetic inputs of `op` through its batched golden model in chunks of about
+    `chunk_size` elements. Only kernel time is counted. With `max_elements` the replay stops early and
+    the throughput is measured on that prefix.
+    """
+    if op == "ln":
+        shift, n_inv = ln_parameters(length)
+    total = rows if max_elements is None else min(rows, max(max_elements // length, 1))
+    chunk_rows = max(chunk_size // length, 1)
+    seconds = 0.0
+    for start in range(0, total, chunk_rows):
+        size = min(chunk_rows, total - start)
+        if op == "sm":
+            qin = rng.integers(-2**15, 2**15, size=(size, length), dtype=np.int64).astype(np.int32)
+            coeffs = sm_coefficients(rng.uniform(0.001, 0.0025, size=size))
+            begin = time.perf_counter()
+            softmax_batch(qin, *coeffs)
+        elif op == "ln":
+            qin, bias = rng.integers(-2**15, 2**15, size=(2, size, length), dtype=np.int64).astype(np.int32)
+            begin = time.perf_counter()
+            layer_norm_batch(qin, bias, shift=shift, n_inv=n_inv)
+        elif op == "gelu":
+            qin = rng.integers(-2**15, 2**15, size=size, dtype=np.int64)
+            qb, qc, q1 = gelu_coefficients(rng.uniform(0.00067, 0.00158))
+            begin = time.perf_counter()
+            gelu_batch(qin, qb, qc, q1)
+        else:
+            qin, bias = rng.integers(-2**30, 2**30 - 1, size=(2, size), dtype=np.int64)
+            m = rng.integers(0, 2**31 - 1, size=size, dtype=np.int64)
+            begin = time.perf_counter()
+            requant_batch(qin, bias, m, 30)
+        seconds += time.perf_counter() - begin
+    return {"replayed": total * length, "golden_seconds": seconds,
+            "golden_elements_per_second": total * length / seconds if seconds else 0.0}
+
+
+def run(heads: int, seq_len: int, hidden: int, batch: int = 1, intermediate: int = None, clock_mhz: float = 100.0,
+        macs_per_cycle: int = 1024, chunk_size: int = 1 << 16, max_elements: int = None, seed: int = 0) -> dict:
+    """
+    Replay one layer through the golden models and estimate its FPGA cycle budget per op (perf_model),
+    next to the matmul array's cycles for the same layer.
+    """
+    rng = np.random.default_rng(seed)
+    entries = []
+    for label, op, rows, length in layer_workload(heads, seq_len, hidden, batch, intermediate):
+        estimate = perf_model.estimate(op, rows, length, clock_mhz)
+        result = replay(op, rows, length, rng, chunk_size, max_elements)
+        entries.append({"label": label, "op": op, "rows": rows, "length": length, "elements": rows * length,
+                        "fpga_cycles": estimate["total_cycles"], "fpga_seconds": estimate["seconds"], **result})
+    matmul_cycles = -(-layer_macs(heads, seq_len, hidden, batch, intermediate) // macs_per_cycle)
+    return {"config": {"heads": heads, "seq_len": seq_len, "hidden": hidden, "batch": batch,
+                       "intermediate": intermediate or 4 * hidden, "clock_mhz": clock_mhz,
+                       "macs_per_cycle": macs_per_cycle},
+            "ops": entries,
+            "nonlinear_cycles": sum(e["fpga_cycles"] for e in entries),
+            "matmul_cycles": matmul_cycles}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="replay the non-linear work of a transformer encoder layer")
+    parser.add_argument("--heads", type=int, default=12)
+    parser.add_argument("--seq-len", type=int, default=128)
+    parser.add_argument("--hidden", type=int, default=768)
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--intermediate", type=int, default=None, help="FFN width (default 4 * hidden)")
+    parser.add_argument("--clock-mhz", type=float, default=100.0)
+    parser.add_argument("--macs-per-cycle", type=int, default=1024, help="matmul array throughput")
+    parser.add_argument("--chunk-size", type=int, default=1 << 16, help="elements per golden-model chunk")
+    parser.add_argument("--max-elements", type=int, default=None, help="replay at most this many elements per entry")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.heads, args.seq_len, args.hidden, args.batch, args.intermediate, args.clock_mhz,
+                 args.macs_per_cycle, args.chunk_size, args.max_elements, args.seed)
+    total = report["nonlinear_cycles"]
+    print(f"{'entry':22s} {'elements':>12s} {'golden elem/s':>14s} {'FPGA cycles':>14s} {'FPGA ms':>10s} {'share':>7s}")
+    for e in report["ops"]:
+        print(f"{e['label']:22s} {e['elements']:12d} {e['golden_elements_per_second']:14.4g} "
+              f"{e['fpga_cycles']:14d} {e['fpga_seconds'] * 1e3:10.3f} {e['fpga_cycles'] / total:7.1%}")
+    by_op = {}
+    for e in report["ops"]:
+        by_op[e["op"]] = by_op.get(e["op"], 0) + e["fpga_cycles"]
+    print("per op: " + ", ".join(f"{op} {cycles / total:.1%}" for op, cycles in sorted(by_op.items(), key=lambda x: -x[1])))
+    clock = args.clock_mhz * 1e6
+    print(f"non-linear: {total} cycles ({total / clock * 1e3:.3f} ms), matmul array: {report['matmul_cycles']} cycles "
+          f"({report['matmul_cycles'] / clock * 1e3:.3f} ms), ratio {total / report['matmul_cycles']:.1f}x")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
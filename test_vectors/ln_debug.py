@@ -1,4 +1,19 @@
 import numpy as np
+import argparse
+import math
+
+import hex_codec
+
+def ln_parameters(length: int, qin_bits: int = 16, max_bits: int = 31, fp_bits: int = 30) -> tuple:
+    '''
+    Row-length dependent layer_norm constants (shift, n_inv) for rows of `length` elements with |qin| < 2^qin_bits.
+    shift keeps the sum of squares length * (2^qin_bits >> shift)^2 within max_bits (6 for the testbench's L = 768),
+    n_inv = floor(2^fp_bits / length) turns the row sum into the mean (1398101 for L = 768).
+    '''
+    shift = max(0, math.ceil((2 * qin_bits + math.ceil(math.log2(length)) - max_bits) / 2))
+    n_inv = (1 << fp_bits) // length
+    return shift, n_inv
+
 
 def layer_norm(qin: np.int32, bias: np.int32, shift: int = 6,
                n_inv: int = 1398101, max_bits: int = 31, fp_bits: int = 30) -> list:
@@ -60,15 +75,54 @@ def layer_norm(qin: np.int32, bias: np.int32, shift: int = 6,
     return intermediate_results
 
 
+def layer_norm_batch(qin: np.ndarray, bias: np.ndarray, shift: int = 6,
+                     n_inv: int = 1398101, max_bits: int = 31, fp_bits: int = 30) -> dict:
+    '''
+    Perform layer normalization on every row of an (N, L) int32 matrix in one vectorized pass.
+    The qsum / qsum_sq / qmean reductions run per row, so the result is bit-exact with `layer_norm`
+    applied row by row. Returns a dictionary of all intermediate results, each with a leading row axis.
+    '''
+    qin = np.atleast_2d(np.asarray(qin, dtype=np.int32))
+    bias = np.atleast_2d(np.asarray(bias, dtype=np.int32))
+    return layer_norm(qin, bias, shift=shift, n_inv=n_inv, max_bits=max_bits, fp_bits=fp_bits)
+
+
+def read_vectors(input_file):
+    """
+    Read a whole layer_norm vector file into (N, L) int32 arrays qin, bias and the expected qout.
+    """
+    with open(input_file, "rb") as infile:
+        raw = hex_codec.parse_rows(infile.read()).astype(np.uint32).view(np.int32)
+    qin, bias, qout = np.split(raw, 3, axis=1)
+    return {'qin': qin, 'bias': bias, 'qout': qout}
+
+
+def check_vectors(input_file, chunk_rows: int = 1024, **kwargs):
+    """
+    Recompute every row of a layer_norm vector file with `layer_norm_batch` and compare against its qout column.
+    shift and n_inv default to `ln_parameters` of the file's row length.
+    Returns the number of rows and the indices of mismatching rows.
+    """
+    vectors = read_vectors(input_file)
+    num_rows = len(vectors['qin'])
+    if num_rows:
+        shift, n_inv = ln_parameters(vectors['qin'].shape[1])
+        kwargs = {'shift': shift, 'n_inv': n_inv, **kwargs}
+    mismatches = []
+    for start in range(0, num_rows, chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        results = layer_norm_batch(vectors['qin'][rows], vectors['bias'][rows], **kwargs)
+        bad = np.any(results['qout'] != vectors['qout'][rows], axis=-1)
+        mismatches.extend((np.nonzero(bad)[0] + start).tolist())
+    return num_rows, mismatches
+
+
 def format_as_twos_complement(value, bits=32):
     """
     Format an integer as a two's complement hexadecimal string.
     Handles both scalars and numpy arrays.
     """
-    if isinstance(value, np.ndarray):
-        return " ".join(f"0x{(x & (2**bits - 1)):08X}" for x in value)
-    else:
-        return f"0x{(value & (2**bits - 1)):08X}"
+    return hex_codec.format_values(value, bits, width=8, prefix="0x")
     
 
 def read_vectors_and_compute_with_logging(input_file, output_file):
@@ -84,12 +138,8 @@ def read_vectors_and_compute_with_logging(input_file, output_file):
               count = count + 1
               continue
 
-            # Split the line into components
-            qin_hex, bias_hex, _ = line.strip().split(" | ")
-
-            # Convert hexadecimal strings to numpy arrays of int32
-            qin = np.array([int(x, 16) for x in qin_hex.split()], dtype=np.int32)
-            bias = np.array([int(x, 16) for x in bias_hex.split()], dtype=np.int32)
+            # Convert the hexadecimal fields to numpy arrays of int32
+            qin, bias, _ = np.split(hex_codec.parse_rows(line)[0].astype(np.uint32).view(np.int32), 3)
 
             # Perform layer normalization and get intermediate results
             results = layer_norm(qin, bias)
@@ -106,10 +156,20 @@ def read_vectors_and_compute_with_logging(input_file, output_file):
             break
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="layer_norm golden model debug")
+    parser.add_argument("--check", action="store_true", help="check every row of the vector file with the batched model")
+    args = parser.parse_args()
+
     # Define input and output files
     input_file = "ln_test_vectors.txt"
     output_file = "ln_debug.txt"
-    
-    # Run the computation with logging
-    read_vectors_and_compute_with_logging(input_file, output_file)
-    print(f"Intermediate results written to {output_file}")
+
+    if args.check:
+        num_rows, mismatches = check_vectors(input_file)
+        print(f"{num_rows - len(mismatches)}/{num_rows} rows match {input_file}")
+        if mismatches:
+            print(f"first mismatching rows: {mismatches[:10]}")
+    else:
+        # Run the computation with logging
+        read_vectors_and_compute_with_logging(input_file, output_file)
+        print(f"Intermediate results written to {output_file}")
@@ -0,0 +1,400 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from compare_results import iter_vector_chunks
+from generate_test_vectors import GENERATORS
+from ln_debug import ln_parameters
+from rounding import round_shift
+
+# kernel inputs in datapath order and their widths (int32, e is int8)
+INPUTS = {
+    "exp": ("qin", "qb", "qc", "qln2", "qln2_inv"),
+    "gelu": ("qin", "qb", "qc", "q1"),
+    "req": ("qin", "bias", "m", "e"),
+    "ln": ("qin", "bias"),
+    "sm": ("qin", "qb", "qc", "qln2", "qln2_inv", "Sreq"),
+}
+INPUT_BITS = {"e": 8}
+
+# inputs holding a whole row per vector
+ROW_INPUTS = {"ln": ("qin", "bias"), "sm": ("qin",)}
+
+INT64_MIN = np.iinfo(np.int64).min
+
+
+def _exceeds(x, bits: int, signed: bool = True) -> np.ndarray:
+    """
+    Mask of the values of x outside the `bits`-wide signed (or unsigned) range.
+    """
+    if bits >= 64 and signed:
+        return np.zeros(np.shape(x), dtype=bool)
+    lo, hi = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if signed else (0, (1 << bits) - 1)
+    return (x < lo) | (x > hi)
+
+
+def _wrap(x, bits: int, signed: bool = True) -> np.ndarray:
+    """
+    x truncated to `bits` as the models' casts do, back in int64.
+    """
+    if bits >= 64:
+        return x
+    return np.asarray(x).astype(f"{'' if signed else 'u'}int{bits}").astype(np.int64)
+
+
+def _add(a, b) -> tuple:
+    """
+    Wrapping int64 a + b and its overflow mask.
+    """
+    r = a + b
+    return r, ((a ^ r) & (b ^ r)) < 0
+
+
+def _sub(a, b) -> tuple:
+    """
+    Wrapping int64 a - b and its overflow mask.
+    """
+    r = a - b
+    return r, ((a ^ b) & (a ^ r)) < 0
+
+
+def _mul(a, b) -> tuple:
+    """
+    Wrapping int64 a * b and its overflow mask. A float64 product settles all but the products within a
+    factor of two of 2^63, which are checked exactly by dividing back.
+    """
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64))
+    r = a * b
+    p = np.abs(a.astype(np.float64) * b)
+    overflow = p >= 2.0**64
+    near = np.flatnonzero((p >= 2.0**62) & (p < 2.0**64))
+    if len(near):
+        an, bn, rn = a.flat[near], b.flat[near], r.flat[near]
+        with np.errstate(all="ignore"):
+            exact = (rn // an == bn) & ~((an == -1) & (bn == INT64_MIN))
+        overflow.flat[near] = ~exact
+    return r, overflow
+
+
+class StepChecks:
+    """
+    Overflow mask of every datapath step of one chunk, in datapath order, one flag per vector (row for ln / sm).
+    Each step has the width of its register and what the golden model does past it:
+        wraps  - the model truncates to the same width, so it matches a width-true RTL but the value is wrong
+        keeps  - the model carries the wider value on, so it disagrees with an RTL register of that width
+        domain - the step's operand is outside the range it is defined for (divisor, sqrt)
+    """
+    def __init__(self, rows: int):
+        self.rows = rows
+        self.steps = []
+
+    def flag(self, name: str, mask, width: int = None, model: str = "domain"):
+        mask = np.asarray(mask)
+        mask = np.broadcast_to(mask, (self.rows,)) if mask.ndim == 0 else mask.reshape(self.rows, -1).any(axis=1)
+        self.steps.append((name, width, model, mask))
+
+    def check(self, name: str, value, overflow, width: int, model: str = "wraps", signed: bool = True):
+        """
+        Record the overflow of `value` (and of its int64 arithmetic, if `overflow` is given) at `width` bits.
+        Returns the value the model passes on.
+        """
+        mask = _exceeds(value, width, signed)
+        self.flag(name, mask if overflow is None else mask | overflow, width, model)
+        return _wrap(value, width, signed) if model == "wraps" else value
+
+
+def exp_steps(checks: StepChecks, qin, qb, qc, qln2, qln2_inv, fp_bits: int = 30, out_name: str = "qout"):
+    """
+    generate_test_vectors.exp_batch with a check on every step.
+    """
+    fp_mul = checks.check("fp_mul", *_mul(qin, qln2_inv), 64)                # mul
+    z = fp_mul >> fp_bits
+    z_qln2 = checks.check("z * qln2", *_mul(z, qln2), 64)                    # mul
+    qp = checks.check("qp", *_sub(qin, z_qln2), 64)                          # sub
+    qp_qb = checks.check("qp + qb", *_add(qp, qb), 64)                       # poly
+    ql_mul = checks.check("(qp + qb) * qp", *_mul(qp_qb, qp), 64)
+    ql = checks.check("ql", *_add(ql_mul, qc), 64)
+    return checks.check(out_name, ql >> z, None, 32)                         # shift, 0 / -1 past 63 as in varshift
+
+
+def sm_steps(checks: StepChecks, qin, qb, qc, qln2, qln2_inv, Sreq, fp_bits: int = 30, max_bits: int = 30,
+             out_bits: int = 6, rounding: str = "half_even"):
+    """
+    sm_debug.softmax_batch with a check on every step.
+    """
+    qb, qc, qln2, qln2_inv, Sreq = (np.asarray(x, dtype=np.int64).reshape(-1, 1) for x in (qb, qc, qln2, qln2_inv, Sreq))
+    qmax = qin.max(axis=-1, keepdims=True)                                   # max
+    qhat = checks.check("qhat", qin - qmax, None, 32)                        # sub, int32
+    qexp_32 = exp_steps(checks, qhat, qb, qc, qln2, qln2_inv, fp_bits, out_name="qexp_32")
+    qexp_64 = checks.check("qexp_64", *_mul(qexp_32, Sreq), 64)              # mul, int64
+    qreq = checks.check("qreq", round_shift(qexp_64, fp_bits, rounding), None, 16)  # shift and round, int16
+    qsum = checks.check("qsum", qreq.sum(axis=-1, keepdims=True), None, 32)  # acc, int32
+    checks.flag("2^max_bits / qsum", qsum <= 0)                              # div
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = checks.check("factor", np.floor((1 << max_bits) / qsum), None, 32)
+    qout = checks.check("qreq * factor", *_mul(qreq, factor), 32)            # mul, int32
+    return checks.check("qout", qout >> (max_bits - out_bits), None, 8)      # shift, int8
+
+
+def gelu_steps(checks: StepChecks, qin, qb, qc, q1, shift: int = 14):
+    """
+    generate_test_vectors.gelu_batch with a check on every step.
+    """
+    q_sgn = np.where(qin < 0, -1, 1)                                         # sign
+    q_clip = np.minimum(np.abs(qin), -qb)                                    # abs, min
+    q_clip_qb = checks.check("q_clip + 2*qb", *_add(q_clip, 2 * qb), 64)     # add
+    ql_mul = checks.check("(q_clip + 2*qb) * q_clip", *_mul(q_clip_qb, q_clip), 64)  # mul
+    ql = checks.check("ql", *_add(ql_mul, qc), 64)                           # add
+    ql_sgn = checks.check("ql * q_sgn", *_mul(ql, q_sgn), 64)                # mul
+    q_erf = ql_sgn >> shift                                                  # shift
+    q_erf_q1 = checks.check("q_erf + q1", *_add(q_erf, q1), 64)              # add
+    qout_64 = checks.check("qout_64", *_mul(q_erf_q1, qin), 64)              # mul
+    return checks.check("qout", qout_64, None, 32)
+
+
+def req_steps(checks: StepChecks, qin, bias, m, e, out_bits: int = 8, clip: bool = True, rounding: str = "half_even"):
+    """
+    generate_test_vectors.requant_batch with a check on every step.
+    """
+    n = 2 ** (out_bits - 1) - 1
+    qbias = checks.check("qbias", qin + bias, None, 32)                      # add, int32
+    qm = checks.check("qm", *_mul(qbias, _wrap(m, 32)), 64)                  # mul, int64
+    e = _wrap(e, 8)
+    left = np.clip(-e, 0, 63)
+    checks.flag("qm << -e", (e < 0) & (((qm << left) >> left) != qm), 64, "wraps")  # varshift, negative e
+    qout = round_shift(qm, e, rounding)                                      # shift and round
+    if clip:
+        qout = np.clip(qout, -n - 1, n)
+    return checks.check("qout", qout, None, 32)
+
+
+def ln_steps(checks: StepChecks, qin, bias, shift: int = None, n_inv: int = None, max_bits: int = 31,
+             fp_bits: int = 30):
+    """
+    ln_debug.layer_norm with a check on every step. The steps the model computes in int64 but annotates
+    as int32 registers are checked at 32 bits. shift and n_inv default to `ln_parameters` of the row length.
+    """
+    if shift is None or n_inv is None:
+        shift, n_inv = ln_parameters(qin.shape[-1])
+    qsum = qin.sum(axis=-1, keepdims=True)                                   # int64, acc
+    q_sq = checks.check("q_sq", (qin >> shift) * (qin >> shift), None, 32)   # int32, shift, mac
+    qsum_sq = q_sq.sum(axis=-1, keepdims=True)                               # int64, mac
+    qmul = checks.check("qmul", *_mul(qsum, n_inv), 64)                      # int64, mul
+    qmean = checks.check("qmean", qmul >> fp_bits, None, 32, "keeps")        # int32, shift
+    r = checks.check("r", *_sub(qin, qmean), 32, "keeps")                    # int32, sub
+    qmean_mul = checks.check("qmean_mul", *_mul(qmean, qsum), 64)            # int64, mul
+    qmean_sq = checks.check("qmean_sq", qmean_mul >> (2 * shift), None, 32, "keeps")  # int32, shift
+    var = checks.check("var", *_sub(qsum_sq, qmean_sq), 32, "keeps")         # int32, sub
+    with np.errstate(invalid="ignore"):
+        var_sqrt = checks.check("var_sqrt", np.floor(np.sqrt(var)), var < 0, 16, signed=False)  # uint16, sqrt
+    std = checks.check("std", _wrap(var_sqrt, 32) << shift, None, 32)        # int32, shift
+    checks.flag("2^max_bits / std", std <= 0)                                # div
+    with np.errstate(divide="ignore", invalid="ignore"):
+        factor = checks.check("factor", np.floor((1 << max_bits) / std.astype(np.float64)), None, 32)
+    qout_mul = checks.check("qout_mul", *_mul(r, factor), 32)                # int32, mul
+    return checks.check("qout", (qout_mul >> 1) + bias, None, 32)            # int32, shift, add
+
+
+KERNELS = {"exp": exp_steps, "gelu": gelu_steps, "req": req_steps, "ln": ln_steps, "sm": sm_steps}
+
+
+def check_chunk(op: str, vectors: dict, options: dict = None) -> StepChecks:
+    """
+    Run one chunk of vectors through the op's checked kernel.
+    """
+    inputs = [np.asarray(vectors[name], dtype=np.int64) for name in INPUTS[op]]
+    if op not in ROW_INPUTS:
+        inputs = np.broadcast_arrays(*inputs)
+    checks = StepChecks(len(inputs[0]))
+    KERNELS[op](checks, *inputs, **(options or {}))
+    return checks
+
+
+class OverflowReport:
+    """
+    Per-step overflow counts merged chunk by chunk: vectors overflowing at the step, vectors whose first overflow
+    is the step, and the smallest such vector (smallest max |qin|, then smallest max |other inputs|).
+    """
+    def __init__(self, op: str):
+        self.op = op
+        self.vectors = 0
+        self.overflowing = 0
+        self.steps = {}
+
+    def update(self, vectors: dict, checks: StepChecks):
+        masks = np.stack([mask for *_, mask in checks.steps])
+        hit = masks.any(axis=0)
+        first = np.where(hit, masks.argmax(axis=0), -1)
+        self.vectors += checks.rows
+        self.overflowing += int(hit.sum())
+        magnitude = {name: np.abs(np.asarray(vectors[name], dtype=np.int64)).reshape(checks.rows, -1).max(axis=1)
+                     for name in INPUTS[self.op]}
+        others = np.max([magnitude[name] for name in INPUTS[self.op] if name != "qin"], axis=0)
+        for i, (name, width, model, mask) in enumerate(checks.steps):
+            step = self.steps.setdefault(name, {"width": width, "model": model, "count": 0, "first": 0, "example": None})
+            step["count"] += int(mask.sum())
+            rows = np.flatnonzero(first == i)
+            step["first"] += len(rows)
+            if not len(rows):
+                continue
+            row = rows[np.lexsort((others[rows], magnitude["qin"][rows]))[0]]
+            key = [int(magnitude["qin"][row]), int(others[row])]
+            if step["example"] is None or key < step["example"]["key"]:
+                step["example"] = {"key": key, "inputs": {name: np.asarray(vectors[name])[row].tolist()
+                                                          for name in INPUTS[self.op]}}
+
+    def merge(self, other: "OverflowReport"):
+        self.vectors += other.vectors
+        self.overflowing += other.overflowing
+        for name, theirs in other.steps.items():
+            step = self.steps.setdefault(name, {**theirs, "count": 0, "first": 0, "example": None})
+            step["count"] += theirs["count"]
+            step["first"] += theirs["first"]
+            if theirs["example"] and (step["example"] is None or theirs["example"]["key"] < step["example"]["key"]):
+                step["example"] = theirs["example"]
+
+    def report(self) -> dict:
+        return {"op": self.op, "vectors": self.vectors, "overflowing": self.overflowing,
+                "steps": [{"name": name, **{k: v for k, v in step.items() if k != "example"},
+                           "example": step["example"] and step["example"]["inputs"]}
+                          for name, step in self.steps.items()]}
+
+
+def _chunks(op: str, start: int, num_samples: int, seed: np.random.SeedSequence, chunk_size: int, overrides: dict, gen_options: dict):
+    """
+    Generated vectors [start, start + num_samples) of a scan with some inputs replaced: ("fix", value),
+    ("range", lo, hi) drawn uniformly, or ("sweep", lo, hi) stepping through lo + vector index.
+    """
+    gen_seed, draw_seed = seed.spawn(2)
+    rng = np.random.default_rng(draw_seed)
+    offset = start
+    for vectors in GENERATORS[op](num_samples, gen_seed, chunk_size, **gen_options):
+        vectors.pop("qout")
+        for name, (kind, *values) in overrides.items():
+            shape = np.shape(vectors[name])
+            if kind == "fix":
+                vectors[name] = np.full(shape, values[0], dtype=np.int64)
+            elif kind == "range":
+                vectors[name] = rng.integers(values[0], values[1], size=shape, endpoint=True, dtype=np.int64)
+            else:
+                vectors[name] = values[0] + offset + np.arange(shape[0], dtype=np.int64)
+        offset += len(vectors["qin"])
+        yield vectors
+
+
+def _scan_shard(op: str, start: int, num_samples: int, seed, chunk_size: int, overrides: dict, gen_options: dict,
+                options: dict) -> OverflowReport:
+    report = OverflowReport(op)
+    with np.errstate(all="ignore"):  # the generators' golden models warn on the inputs being scanned
+        for vectors in _chunks(op, start, num_samples, seed, chunk_size, overrides, gen_options):
+            report.update(vectors, check_chunk(op, vectors, options))
+    return report
+
+
+def scan(op: str, num_samples: int = None, vector_path: str = None, seed: int = 0, chunk_size: int = 1 << 16,
+         overrides: dict = None, gen_options: dict = None, options: dict = None, workers: int = None,
+         shard_size: int = 1 << 22) -> dict:
+    """
+    Overflow report of `op` over a vector file / store, or over `num_samples` generated vectors (rows for ln / sm)
+    with `overrides` applied. A sweep override scans every value of its range once and sets the vector count.
+    With `workers`, generated vectors are scanned as shards of `shard_size` on a process pool; shard k draws from
+    child k of SeedSequence(seed), so a report depends on the shard size but not on the worker count.
+    """
+    overrides = overrides or {}
+    report = OverflowReport(op)
+    if vector_path:
+        for _, vectors in iter_vector_chunks(op, vector_path, max(chunk_size // {"ln": 768, "sm": 32}.get(op, 1), 1)):
+            report.update(vectors, check_chunk(op, vectors, options))
+        return report.report()
+    sweeps = [values for kind, *values in overrides.values() if kind == "sweep"]
+    if len(sweeps) > 1:
+        raise ValueError("only one input can be swept")
+    if sweeps:
+        num_samples = sweeps[0][1] - sweeps[0][0] + 1
+    num_shards = -(-num_samples // shard_size)
+    seeds = np.random.SeedSequence(seed).spawn(num_shards)
+    starts = [k * shard_size for k in range(num_shards)]
+    sizes = [min(shard_size, num_samples - start) for start in starts]
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = pool.map(_scan_shard, [op] * num_shards, starts, sizes, seeds, [chunk_size] * num_shards,
+                             [overrides] * num_shards, [gen_options or {}] * num_shards, [options or {}] * num_shards)
+            for part in parts:
+                report.merge(part)
+    else:
+        for start, size, shard_seed in zip(starts, sizes, seeds):
+            report.merge(_scan_shard(op, start, size, shard_seed, chunk_size, overrides, gen_options or {}, options))
+    return report.report()
+
+
+def parse_override(op: str, text: str, kind: str) -> tuple:
+    """
+    NAME=VALUE for --fix, NAME=LO:HI for --range / --sweep, as (name, (kind, values...)). Values may be hex (0x...).
+    """
+    name, _, value = text.partition("=")
+    if name not in INPUTS[op]:
+        raise ValueError(f"{op} has no input {name!r}, expected one of {INPUTS[op]}")
+    values = [int(v, 0) for v in value.split(":")]
+    if len(values) != (1 if kind == "fix" else 2) or (kind != "fix" and values[0] > values[1]):
+        raise ValueError(f"bad --{kind} {text!r}")
+    bits = INPUT_BITS.get(name, 32)
+    if any(v < -(1 << (bits - 1)) or v >= 1 << (bits - 1) for v in values):
+        raise ValueError(f"--{kind} {text!r} is outside the int{bits} range of {name}")
+    if kind == "sweep" and name in ROW_INPUTS.get(op, ()):
+        raise ValueError(f"{name} is a row input of {op}, it can be fixed or ranged but not swept")
+    return name, (kind, *values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="overflow and wraparound scan of every datapath step")
+    parser.add_argument("op", choices=sorted(KERNELS), help="exp / gelu / ln / req / sm")
+    parser.add_argument("-n", "--num-samples", type=int, default=1 << 24, help="vectors (rows for ln / sm)")
+    parser.add_argument("--vectors", default=None, help="scan a vector file or .npy store instead")
+    parser.add_argument("--fix", action="append", default=[], metavar="NAME=VALUE", help="hold an input constant")
+    parser.add_argument("--range", action="append", default=[], metavar="NAME=LO:HI",
+                        help="draw an input uniformly from [LO, HI]")
+    parser.add_argument("--sweep", default=None, metavar="NAME=LO:HI",
+                        help="scan every value of [LO, HI] for one per-vector input, one vector each")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=1 << 16, help="vectors (elements for ln / sm) per chunk")
+    parser.add_argument("--workers", type=int, default=None, help="scan in seeded shards on a process pool")
+    parser.add_argument("--shard-size", type=int, default=1 << 22, help="vectors per shard")
+    parser.add_argument("--qin-bits", type=int, default=16, help="gelu / ln generated input width")
+    parser.add_argument("--length", type=int, default=None, help="row length L for ln / sm")
+    parser.add_argument("--json", default=None, help="also write the report, with full example rows, as JSON")
+    args = parser.parse_args()
+
+    try:
+        overrides = dict(parse_override(args.op, text, "fix") for text in args.fix)
+        overrides.update(parse_override(args.op, text, "range") for text in args.range)
+        if args.sweep:
+            overrides.update([parse_override(args.op, args.sweep, "sweep")])
+    except ValueError as error:
+        parser.error(str(error))
+    gen_options = {"qin_bits": args.qin_bits} if args.op in ("gelu", "ln") else {}
+    if args.length and args.op in ("ln", "sm"):
+        gen_options["length"] = args.length
+    options = {}
+    if args.op == "ln" and not args.vectors:
+        options = dict(zip(("shift", "n_inv"), ln_parameters(args.length or 768, args.qin_bits)))
+    report = scan(args.op, args.num_samples, args.vectors, args.seed, args.chunk_size, overrides, gen_options, options,
+                  args.workers, args.shard_size)
+
+    vectors = report["vectors"]
+    print(f"{args.op}: {vectors} vectors, {report['overflowing']} overflow "
+          f"({report['overflowing'] / max(vectors, 1):.4%})")
+    print(f"{'step':26s} {'width':>5s} {'model':>6s} {'overflows':>12s} {'first':>12s}  minimal example")
+    for step in report["steps"]:
+        width = "-" if step["width"] is None else str(step["width"])
+        example = ""
+        if step["example"]:
+            example = " ".join(f"{name}=max|{np.abs(value).max()}|" if isinstance(value, list) else f"{name}={value}"
+                               for name, value in step["example"].items())
+        print(f"{step['name']:26s} {width:>5s} {step['model']:>6s} {step['count']:12d} {step['first']:12d}  {example}")
+    if not report["overflowing"]:
+        print(f"no overflow at any step in {vectors} vectors")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
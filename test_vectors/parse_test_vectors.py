@@ -1,110 +1,215 @@
 import re
+import os
+import shutil
 import argparse
-
-def parse_gelu_vectors():
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import vector_store
+
+# `{`, `}` and the digits of every `(intN_t)0x...` literal
+TOKEN_PATTERN = re.compile(r"[{}]|0x([0-9A-Fa-f]+)")
+# records are the elements of `const struct ... vectors[] = { ... };`, i.e. brace depth 2
+RECORD_DEPTH = 2
+
+
+class RecordTokenizer:
+  """
+  Incremental tokenizer for C test-vector initializers. Text can be fed in arbitrary chunks; a record
+  is returned once its closing brace has been seen, so records may cross chunk boundaries.
+  Each record is a list of items: a hex digit string for a scalar field, or a list of them for an array field.
+  """
+  def __init__(self, depth: int = 0):
+    self.depth = depth
+    self.record = None
+    self.group = None
+
+  def feed(self, text: str) -> list:
+    records = []
+    for match in TOKEN_PATTERN.finditer(text):
+      token = match.group(0)
+      if token == "{":
+        self.depth += 1
+        if self.depth == RECORD_DEPTH:
+          self.record = []
+        elif self.depth == RECORD_DEPTH + 1:
+          self.group = []
+      elif token == "}":
+        if self.depth == RECORD_DEPTH + 1 and self.record is not None:
+          self.record.append(self.group)
+          self.group = None
+        elif self.depth == RECORD_DEPTH and self.record is not None:
+          records.append(self.record)
+          self.record = None
+        self.depth -= 1
+      elif self.depth == RECORD_DEPTH + 1 and self.group is not None:
+        self.group.append(match.group(1))
+      elif self.depth == RECORD_DEPTH and self.record is not None:
+        self.record.append(match.group(1))
+    return records
+
+
+def iter_records(input_file: str, start: int = 0, end: int = None, chunk_size: int = 1 << 20):
+  """
+  Yield lists of records from the byte range [start, end) of a C header, reading `chunk_size` bytes at a time.
+  `start` must be 0 or a record start (see `shard_offsets`). Memory is bounded by the chunk size.
+  """
+  tokenizer = RecordTokenizer(depth=0 if start == 0 else RECORD_DEPTH - 1)
+  with open(input_file, "rb") as infile:
+    infile.seek(start)
+    remaining = (end - start) if end is not None else None
+    tail = ""
+    while remaining is None or remaining > 0:
+      chunk = infile.read(chunk_size if remaining is None else min(chunk_size, remaining))
+      if not chunk:
+        break
+      if remaining is not None:
+        remaining -= len(chunk)
+      text = tail + chunk.decode("ascii")
+      # only tokenize up to the last delimiter, a hex literal may continue in the next chunk
+      cut = max(text.rfind(c) for c in ",{}\n") + 1
+      tail = text[cut:]
+      records = tokenizer.feed(text[:cut])
+      if records:
+        yield records
+    records = tokenizer.feed(tail)
+    if records:
+      yield records
+
+
+def shard_offsets(input_file: str, num_shards: int, chunk_size: int = 1 << 24) -> list:
+  """
+  Split a C header into at most `num_shards` byte ranges that each start on a record boundary.
+  Uses a vectorized brace-depth scan, so only the boundaries are kept in memory.
+  """
+  size = os.path.getsize(input_file)
+  targets = [size * k // num_shards for k in range(1, num_shards)]
+  offsets = [0]
+  depth = 0
+  pos = 0
+  with open(input_file, "rb") as infile:
+    while targets:
+      chunk = infile.read(chunk_size)
+      if not chunk:
+        break
+      b = np.frombuffer(chunk, dtype=np.uint8)
+      opens = b == ord("{")
+      d = depth + np.cumsum(opens.astype(np.int64) - (b == ord("}")), dtype=np.int64)
+      starts = np.nonzero(opens & (d == RECORD_DEPTH))[0] + pos
+      while targets and len(starts):
+        i = np.searchsorted(starts, targets[0])
+        if i == len(starts):
+          break
+        if starts[i] > offsets[-1]:
+          offsets.append(int(starts[i]))
+        targets.pop(0)
+      depth = int(d[-1]) if len(d) else depth
+      pos += len(chunk)
+  return list(zip(offsets, offsets[1:] + [size]))
+
+
+def format_record(record: list) -> str:
+  """
+  Format a record as a vector file line: array fields space-separated and all fields joined
+  by " | " when the record has any array field, plain space-separated otherwise.
+  """
+  if any(isinstance(item, list) for item in record):
+    return " | ".join(" ".join(item) if isinstance(item, list) else item for item in record)
+  return " ".join(record)
+
+
+def convert_range(op: str, input_file: str, output: str, fmt: str = "txt", start: int = 0, end: int = None,
+                  chunk_size: int = 1 << 20) -> int:
+  """
+  Stream the records of byte range [start, end) of a C header to a text vector file or a .npy vector store.
+  Returns the number of records written.
+  """
+  count = 0
+  if fmt == "txt":
+    with open(output, "w") as outfile:
+      for records in iter_records(input_file, start, end, chunk_size):
+        outfile.write("".join(format_record(record) + "\n" for record in records))
+        count += len(records)
+  else:
+    with vector_store.StoreWriter(op, output) as writer:
+      for records in iter_records(input_file, start, end, chunk_size):
+        lines = [format_record(record) for record in records]
+        length = vector_store.row_length(op, lines[0])
+        writer.append(vector_store.parse_lines(op, lines, length))
+        count += len(records)
+  return count
+
+
+def convert_header(op: str, input_file: str, output: str, fmt: str = "txt", workers: int = 1,
+                   chunk_size: int = 1 << 20) -> int:
+  """
+  Convert a C header to a text vector file or .npy vector store. With `workers` > 1 the header is split into
+  record-aligned byte ranges that are parsed in a process pool, each to its own part, then merged in order.
+  """
+  if workers <= 1:
+    return convert_range(op, input_file, output, fmt, chunk_size=chunk_size)
+
+  shards = shard_offsets(input_file, workers)
+  parts = [f"{output}.part{k}" for k in range(len(shards))]
+  with ProcessPoolExecutor(max_workers=workers) as pool:
+    counts = list(pool.map(convert_range, [op] * len(shards), [input_file] * len(shards), parts,
+                           [fmt] * len(shards), [s for s, _ in shards], [e for _, e in shards],
+                           [chunk_size] * len(shards)))
+  if fmt == "txt":
+    with open(output, "w") as outfile:
+      for part in parts:
+        with open(part, "r") as infile:
+          shutil.copyfileobj(infile, outfile)
+        os.remove(part)
+  else:
+    vector_store.concat_stores(parts, output)
+    for part in parts:
+      shutil.rmtree(part)
+  return sum(counts)
+
+
+def parse_gelu_vectors(fmt: str = "txt", workers: int = 1):
   # Input and output file paths
   input_file = "gelu_test_vectors.h"
-  output_file = "gelu_test_vectors.txt"
-
-  # Open the .h file and read its content
-  with open(input_file, "r") as infile:
-    content = infile.read()
-
-  # Regex to extract test vectors
-  pattern = r'\{\s*\(int32_t\)0x([A-Fa-f0-9]+),\s*\(int32_t\)0x([A-Fa-f0-9]+),\s*\(int32_t\)0x([A-Fa-f0-9]+),\s*\(int32_t\)0x([A-Fa-f0-9]+),\s*\(int32_t\)0x([A-Fa-f0-9]+)\s*\}'
-  matches = re.findall(pattern, content)
+  output_file = "gelu_test_vectors.txt" if fmt == "txt" else "gelu_test_vectors"
 
-  # Write the extracted values to a text file
-  with open(output_file, "w") as outfile:
-    for match in matches:
-      outfile.write(" ".join(match) + "\n")
+  # Stream the records of the .h file to the output
+  convert_header("gelu", input_file, output_file, fmt, workers)
 
   print(f"Converted {input_file} to {output_file}.")
 
 
 
-def parse_ln_vectors():
+def parse_ln_vectors(fmt: str = "txt", workers: int = 1):
   # Input and output file paths
   input_file = "ln_test_vectors.h"
-  output_file = "ln_test_vectors.txt"
-
-  # Open the .h file and read its content
-  with open(input_file, "r") as infile:
-    content = infile.read()
-
-  # Define a regular expression to match the structure of the C-style test vectors
-  vector_pattern = re.compile(
-    r"\{\s*\{([^}]*)\},\s*"  # Match qin array
-    r"\{([^}]*)\},\s*"       # Match bias array
-    r"\{([^}]*)\}\s*"        # Match qout array
-    r"\},"
-  )
-
-  # Find all matches of the test vectors in the content
-  matches = vector_pattern.findall(content)
-
-  # Process each match
-  with open(output_file, "w") as outfile:
-    for match in matches:
-      # Clean up and keep the values in hexadecimal format
-      qin = [re.sub(r"(\{)*\(int32_t\)(0x)", "", x.strip()) for x in match[0].split(",")]
-      bias = [re.sub(r"\(int32_t\)(0x)", "", x.strip()) for x in match[1].split(",")]
-      qout = [re.sub(r"\(int32_t\)(0x)", "", x.strip()) for x in match[2].split(",")]
-
-      # Write the processed arrays to the output file
-      outfile.write(f"{' '.join(qin)} | {' '.join(bias)} | {' '.join(qout)}\n")
+  output_file = "ln_test_vectors.txt" if fmt == "txt" else "ln_test_vectors"
+
+  # Stream the records of the .h file to the output
+  convert_header("ln", input_file, output_file, fmt, workers)
 
   print(f"Converted {input_file} to {output_file}.")
 
-def parse_sm_vectors():
+def parse_sm_vectors(fmt: str = "txt", workers: int = 1):
     # Input and output file paths
     input_file = "sm_test_vectors.h"
-    output_file = "sm_test_vectors.txt"
-
-    with open(input_file, 'r') as infile, open(output_file, 'w') as outfile:
-        content = infile.read()
-        
-        # Match individual test vectors
-        vector_pattern = re.compile(
-            r'\{\s*'
-            r'\{(.*?)\},\s*'  # qin array
-            r'\(int32_t\)0x([0-9A-Fa-f]+),\s*'  # qb
-            r'\(int32_t\)0x([0-9A-Fa-f]+),\s*'  # qc
-            r'\(int32_t\)0x([0-9A-Fa-f]+),\s*'  # qln2
-            r'\(int32_t\)0x([0-9A-Fa-f]+),\s*'  # qln2_inv
-            r'\(int32_t\)0x([0-9A-Fa-f]+),\s*'  # Sreq
-            r'\{(.*?)\}\s*'  # qout array
-            r'\}'
-        )
-        
-        matches = vector_pattern.findall(content)
-        
-        for match in matches:
-            qin = match[0]
-            qb = match[1]
-            qc = match[2]
-            qln2 = match[3]
-            qln2_inv = match[4]
-            Sreq = match[5]
-            qout = match[6]
-
-            # Convert qin array
-            qin_values = [re.sub(r"(\{)*\(int32_t\)(0x)", "", x.strip()) for x in qin.split(",")]
-
-            # Convert qout array
-            qout_values = [re.sub(r"\(int8_t\)(0x)", "", x.strip()) for x in qout.split(",")]
-
-            # Write the processed arrays to the output file
-            outfile.write(f"{' '.join(qin_values)} | {qb} | {qc} | {qln2} | {qln2_inv} | {Sreq} | {' '.join(qout_values)}\n")
+    output_file = "sm_test_vectors.txt" if fmt == "txt" else "sm_test_vectors"
+
+    # Stream the records of the .h file to the output
+    convert_header("sm", input_file, output_file, fmt, workers)
+
     print(f"Converted {input_file} to {output_file}.")
     
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Convert test vectors to Verilog readable format")
     parser.add_argument("function", help="gelu / ln / sm")
+    parser.add_argument("--format", choices=["txt", "npy"], default="txt", help="hex text file or .npy vector store")
+    parser.add_argument("--workers", type=int, default=1, help="parse record-aligned byte ranges in parallel")
     args = parser.parse_args()
     if (args.function == "gelu"):
-        parse_gelu_vectors()
+        parse_gelu_vectors(args.format, args.workers)
     if (args.function == "ln"):
-        parse_ln_vectors()
+        parse_ln_vectors(args.format, args.workers)
     if (args.function == "sm"):
-        parse_sm_vectors()
\ No newline at end of file
+        parse_sm_vectors(args.format, args.workers)
\ No newline at end of file
@@ -0,0 +1,209 @@
+import argparse
+import math
+import os
+
+import vector_store
+
+# Per-op state tables of the `next` logic in non_lin_ops.sv, indexed by state (state 0 is the rst state).
+#   step - next = state + 1
+#   mult / sqrt / div - wait state: hold until that unit's out_valid, the unit was started in the previous state
+#   sum / max - next = sum_r (max_r) ? (in_valid ? 1 : 0) : state + 1, in_ready is high while sum_r (max_r)
+#   out - output state: next = out_ready ? (in_valid ? 1 : 0) : state, in_ready = out_ready
+STATES = {
+    "exp": ["rst",
+            "step", "mult", "step", "step", "mult", "step", "step", "step", "mult", "step", "step", "out"],
+    "gelu": ["rst",
+             "step", "mult", "step", "mult", "step", "step", "mult", "step", "step", "mult", "step", "step",
+             "mult", "step", "step", "step", "mult", "out"],
+    "ln": ["rst",
+           "step", "step", "step", "mult", "sum", "mult", "step", "mult", "step", "mult", "step", "step",
+           "step", "sqrt", "step", "step", "div", "step", "mult", "step", "step", "out"],
+    "req": ["rst",
+            "step", "step", "mult", "step", "step", "step", "step", "step", "step", "step", "step", "step",
+            "mult", "step", "step", "mult", "step", "step", "step", "out"],
+    "sm": ["rst",
+           "step", "step", "max", "step", "step", "mult", "step", "step", "mult", "step", "step", "step",
+           "mult", "step", "step", "step", "mult", "step", "step", "step", "step", "step", "step", "step",
+           "step", "sum", "step", "step", "div", "step", "mult", "step", "out"],
+}
+
+# Input passes per row, as driven by non_lin_ops_tb.sv: (sum, max) flags of each pass over the L elements.
+# Only the last pass produces outputs.
+PASSES = {
+    "exp": [(0, 0)],
+    "gelu": [(0, 0)],
+    "ln": [(1, 0), (0, 0)],
+    "req": [(0, 0)],
+    "sm": [(0, 1), (1, 0), (0, 0)],
+}
+
+# mult.sv: two pipeline registers, out_valid two cycles after the first in_valid.
+# div_hls / sqrt_hls are not in the repo, their latencies are placeholders to be overridden with measured values.
+LATENCIES = {"mult": 2, "div": 34, "sqrt": 17}
+
+
+def simulate_row(op: str, length: int = 1, latencies: dict = None, in_gap: int = 0, out_stall: int = 0,
+                 passes: list = None) -> dict:
+    """
+    Cycle-by-cycle simulation of the non_lin_ops FSM and its in_valid/in_ready/out_valid/out_ready handshake
+    for one row of `length` elements (one element for exp/gelu/req).
+    The source offers its next input `in_gap` cycles after the previous one was accepted, the sink raises
+    out_ready `out_stall` cycles after out_valid rises.
+    `passes` replaces the op's PASSES entry, e.g. to model a variant that skips a pass.
+    Returns the total cycles, the cycle of the first output and per-state occupancy.
+    """
+    latencies = {**LATENCIES, **(latencies or {})}
+    table = STATES[op]
+    inputs = [flags for flags in (passes or PASSES[op]) for _ in range(length)]
+    num_outputs = length
+
+    state = 0
+    sum_r = max_r = 0
+    issued = 0            # cycle the unit of the upcoming wait state was started
+    gap = 0               # cycles until the source offers its next input
+    stall = out_stall     # cycles until the sink raises out_ready
+    consumed = produced = 0
+    first_output = None
+    occupancy = [0] * len(table)
+    cycle = 0
+    while produced < num_outputs:
+        kind = table[state]
+        in_valid = consumed < len(inputs) and gap == 0
+        out_ready = kind == "out" and stall == 0
+
+        # next state and in_ready, as in the op's `next` and output logic
+        if kind == "rst":
+            in_ready = True
+            next_state = 1 if in_valid else 0
+        elif kind == "out":
+            in_ready = out_ready
+            next_state = (1 if in_valid else 0) if out_ready else state
+        elif kind in ("sum", "max"):
+            flag = sum_r if kind == "sum" else max_r
+            in_ready = bool(flag)
+            next_state = (1 if in_valid else 0) if flag else state + 1
+        elif kind in latencies:
+            in_ready = False
+            next_state = state + 1 if cycle - issued >= latencies[kind] else state
+        else:
+            in_ready = False
+            next_state = state + 1
+
+        occupancy[state] += 1
+        if kind == "out":
+            if out_ready:
+                produced += 1
+                if first_output is None:
+                    first_output = cycle
+                stall = out_stall
+            else:
+                stall -= 1
+        if in_valid and in_ready:
+            sum_r, max_r = inputs[consumed]
+            consumed += 1
+            gap = in_gap
+        elif gap:
+            gap -= 1
+
+        if next_state != state and next_state + 1 < len(table) and table[next_state + 1] in latencies:
+            issued = cycle + 1
+        state = next_state
+        cycle += 1
+
+    return {"cycles": cycle, "first_output": first_output, "occupancy": occupancy}
+
+
+def estimate(op: str, rows: int, length: int = 1, clock_mhz: float = 100.0, reset_cycles: int = 1, **kwargs) -> dict:
+    """
+    Latency and throughput of `rows` rows of `length` elements. The FSM timing does not depend on the data,
+    so simulated rows are scaled to the whole workload. ln/sm rows are independent: the testbench applies a
+    `reset_cycles` reset between them to clear the max/sum registers. exp/gelu/req elements stream back to back,
+    so their per-element cost is the steady-state difference between one and two simulated elements.
+    """
+    if len(PASSES[op]) > 1:
+        row = simulate_row(op, length, **kwargs)
+        row_cycles = row["cycles"] + reset_cycles
+        total_cycles = row_cycles * rows
+    else:
+        row = simulate_row(op, 1, **kwargs)
+        row_cycles = simulate_row(op, 2, **kwargs)["cycles"] - row["cycles"]
+        length = 1
+        total_cycles = row["cycles"] + row_cycles * (rows - 1) if rows else 0
+    elements = rows * length
+    seconds = total_cycles / (clock_mhz * 1e6)
+    return {
+        "op": op,
+        "rows": rows,
+        "length": length,
+        "cycles_per_row": row_cycles,
+        "cycles_per_element": row_cycles / length,
+        "first_output_latency": row["first_output"] + 1,
+        "total_cycles": total_cycles,
+        "seconds": seconds,
+        "elements_per_second": elements / seconds if seconds else 0.0,
+        "rows_per_second": rows / seconds if seconds else 0.0,
+    }
+
+
+def softmax_tiling(length: int, tile: int, rescales: float, latencies: dict = None) -> dict:
+    """
+    Cycles and input buffer of one softmax row, buffered (three passes over the L buffered elements, as
+    non_lin_ops_tb.sv drives it) against online (sm_debug.softmax_online): the max pass runs per tile
+    ahead of the exp/sum pass over the same tile, so only one tile is buffered, and each of the
+    `rescales` running-max raises costs one more exp/requant/mult sequence.
+    The rescale is costed as one element of the sum pass, the hardware would add a sum-register mult to it.
+    The output pass re-reads the row from the source in both cases.
+    """
+    buffered = simulate_row("sm", length, latencies)["cycles"]
+    sum_pass = simulate_row("sm", length + 1, latencies, passes=[(1, 0), (0, 0)])["cycles"] - \
+        simulate_row("sm", length, latencies, passes=[(1, 0), (0, 0)])["cycles"] - \
+        (simulate_row("sm", length + 1, latencies, passes=[(0, 0)])["cycles"] -
+         simulate_row("sm", length, latencies, passes=[(0, 0)])["cycles"])
+    online = buffered + math.ceil(rescales * sum_pass)
+    return {"length": length, "tile": tile, "rescales": rescales,
+            "buffered_cycles": buffered, "online_cycles": online, "rescale_cycles": sum_pass,
+            "buffered_bytes": 4 * length, "online_bytes": 4 * tile + 8}  # int32 qin, plus running max and sum
+
+
+def workload_shape(op: str, vector_file: str) -> tuple:
+    """
+    (rows, length) of a hex text vector file or .npy vector store.
+    """
+    if os.path.isdir(vector_file):
+        store = vector_store.load(vector_file)
+        qin = store["qin"]
+        return qin.shape[0], (qin.shape[1] if qin.ndim > 1 else 1)
+    rows = 0
+    length = 1
+    with open(vector_file, "r") as infile:
+        for line in infile:
+            if not line.strip():
+                continue
+            if rows == 0:
+                length = vector_store.row_length(op, line)
+            rows += 1
+    return rows, length
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="cycle model of the time-multiplexed non_lin_ops FSM")
+    parser.add_argument("op", choices=sorted(STATES), help="exp / gelu / ln / req / sm")
+    parser.add_argument("vector_file", nargs="?", default=None, help="vector file or store to size the workload from")
+    parser.add_argument("--rows", type=int, default=1, help="rows when no vector file is given")
+    parser.add_argument("--length", type=int, default=1, help="elements per row when no vector file is given")
+    parser.add_argument("--clock-mhz", type=float, default=100.0)
+    parser.add_argument("--div-latency", type=int, default=LATENCIES["div"])
+    parser.add_argument("--sqrt-latency", type=int, default=LATENCIES["sqrt"])
+    parser.add_argument("--in-gap", type=int, default=0, help="idle cycles between accepted inputs")
+    parser.add_argument("--out-stall", type=int, default=0, help="cycles of backpressure before each output")
+    args = parser.parse_args()
+
+    if args.vector_file:
+        rows, length = workload_shape(args.op, args.vector_file)
+    else:
+        rows, length = args.rows, args.length
+    report = estimate(args.op, rows, length, args.clock_mhz,
+                      latencies={"div": args.div_latency, "sqrt": args.sqrt_latency},
+                      in_gap=args.in_gap, out_stall=args.out_stall)
+    for key, value in report.items():
+        print(f"{key}: {value:.6g}" if isinstance(value, float) else f"{key}: {value}")
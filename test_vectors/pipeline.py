@@ -0,0 +1,349 @@
+import argparse
+import json
+import queue
+import threading
+import time
+
+import numpy as np
+
+from generate_test_vectors import exp_batch, gelu_batch, gelu_coefficients, requant_batch, sm_coefficients
+from ln_debug import layer_norm_batch, ln_parameters
+from sm_debug import softmax_batch
+
+# end of stream marker passed down the queues (a failing stage passes its exception instead)
+_DONE = object()
+
+
+class Stage:
+    """
+    One golden-model op applied to (rows, L) int chunks, with its throughput counters and taps.
+    `fn(chunk)` returns (output chunk, intermediates dict). Taps are called in the stage's thread
+    as fn(chunk index, array) with the stage output or one of its intermediates.
+    in_bits / out_bits are the signed input / output widths where known (None otherwise); a Pipeline fills in a
+    stage's missing in_bits from the out_bits of the stage before it.
+    """
+    def __init__(self, name: str, fn, in_bits: int = None, out_bits: int = None):
+        self.name = name
+        self.fn = fn
+        self.in_bits = in_bits
+        self.out_bits = out_bits
+        self.taps = []
+        self.chunks = 0
+        self.elements = 0
+        self.seconds = 0.0
+
+    def tap(self, fn, intermediate: str = None):
+        self.taps.append((intermediate, fn))
+
+    def intermediates(self, sample: np.ndarray) -> list:
+        """
+        Names of the intermediates `fn` returns, from one untimed run on a sample chunk.
+        """
+        return sorted(self.fn(sample)[1])
+
+    def process(self, chunks):
+        """
+        Generator stage: yield the output of every chunk of `chunks`.
+        """
+        for chunk in chunks:
+            begin = time.perf_counter()
+            out, intermediates = self.fn(chunk)
+            self.seconds += time.perf_counter() - begin
+            for intermediate, fn in self.taps:
+                fn(self.chunks, out if intermediate is None else intermediates[intermediate])
+            self.chunks += 1
+            self.elements += chunk.size
+            yield out
+
+    def stats(self) -> dict:
+        return {"stage": self.name, "chunks": self.chunks, "elements": self.elements, "seconds": self.seconds,
+                "elements_per_second": self.elements / self.seconds if self.seconds else 0.0}
+
+
+def requant_stage(bias=0, m=1 << 30, e=30, out_bits: int = 8, name: str = "requant") -> Stage:
+    """
+    requant_batch; bias, m and e are scalars or broadcast against a chunk (e.g. a per-column bias of length L).
+    """
+    def fn(chunk):
+        intermediates = {}
+        return requant_batch(chunk, bias, m, e, out_bits=out_bits, intermediate_results=intermediates), intermediates
+    return Stage(name, fn, out_bits=out_bits)
+
+
+def layer_norm_stage(bias=0, shift: int = None, n_inv: int = None, qin_bits: int = None, name: str = "layer_norm") -> Stage:
+    """
+    layer_norm_batch over each row; shift and n_inv default to `ln_parameters` of the chunk's row length and input
+    width. qin_bits defaults to the out_bits of the stage before it in a Pipeline (e.g. 8 after an 8-bit requant),
+    or the source width of a Pipeline starting with layer_norm; without either the stage raises ValueError.
+    """
+    def fn(chunk):
+        if stage.in_bits is None:
+            raise ValueError(f"{stage.name}: unknown input width, pass qin_bits")
+        row_shift, row_n_inv = ln_parameters(chunk.shape[-1], stage.in_bits)
+        qin = np.atleast_2d(chunk)
+        intermediates = layer_norm_batch(qin, np.broadcast_to(np.asarray(bias, dtype=np.int32), qin.shape),
+                                         shift=row_shift if shift is None else shift,
+                                         n_inv=row_n_inv if n_inv is None else n_inv)
+        return intermediates["qout"], intermediates
+    stage = Stage(name, fn, in_bits=qin_bits)
+    return stage
+
+
+def gelu_stage(qb=None, qc=None, q1=None, shift: int = 14, S: float = 0.001, name: str = "gelu") -> Stage:
+    """
+    gelu_batch; the coefficients default to `gelu_coefficients` of input scale S.
+    """
+    default = gelu_coefficients(S, shift)
+    qb, qc, q1 = (d if x is None else x for x, d in zip((qb, qc, q1), default))
+
+    def fn(chunk):
+        intermediates = {}
+        return gelu_batch(chunk, qb, qc, q1, shift, intermediate_results=intermediates), intermediates
+    return Stage(name, fn)
+
+
+def exp_stage(qb=None, qc=None, qln2=None, qln2_inv=None, S: float = 0.0016, name: str = "exp") -> Stage:
+    """
+    exp_batch; the coefficients default to `sm_coefficients` of input scale S.
+    """
+    default = sm_coefficients(S)
+    qb, qc, qln2, qln2_inv = (d if x is None else x for x, d in zip((qb, qc, qln2, qln2_inv), default))
+
+    def fn(chunk):
+        intermediates = {}
+        return exp_batch(chunk, qb, qc, qln2, qln2_inv, intermediate_results=intermediates), intermediates
+    return Stage(name, fn)
+
+
+def softmax_stage(qb=None, qc=None, qln2=None, qln2_inv=None, Sreq=None, out_bits: int = 6, S: float = 0.0016,
+                  name: str = "softmax") -> Stage:
+    """
+    softmax_batch over each row; the coefficients default to `sm_coefficients` of input scale S.
+    """
+    default = sm_coefficients(S)
+    qb, qc, qln2, qln2_inv, Sreq = (d if x is None else x for x, d in zip((qb, qc, qln2, qln2_inv, Sreq), default))
+
+    def fn(chunk):
+        intermediates = softmax_batch(np.atleast_2d(chunk).astype(np.int32), qb, qc, qln2, qln2_inv, Sreq,
+                                      out_bits=out_bits)
+        return intermediates["qout"], intermediates
+    return Stage(name, fn, out_bits=out_bits)
+
+
+STAGES = {"requant": requant_stage, "layer_norm": layer_norm_stage, "gelu": gelu_stage, "exp": exp_stage,
+          "softmax": softmax_stage}
+
+
+def array_source(array: np.ndarray, chunk_rows: int = 256):
+    """
+    Chunks of `chunk_rows` rows of an in-memory (rows, L) activation tensor.
+    """
+    for start in range(0, len(array), chunk_rows):
+        yield array[start:start + chunk_rows]
+
+
+def random_source(rows: int, length: int, bits: int = 16, chunk_rows: int = 256, seed: int = 0):
+    """
+    `rows` x `length` random `bits`-bit signed activations (e.g. matmul accumulators), generated chunk by chunk.
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - start)
+        yield rng.integers(-2**(bits - 1), 2**(bits - 1), size=(size, length), dtype=np.int64).astype(np.int32)
+
+
+def _pump(chunks, out: queue.Queue, stop: threading.Event):
+    """
+    Thread body: put every chunk of `chunks` on `out` (blocking while it is full), then _DONE, or the exception.
+    """
+    try:
+        for chunk in chunks:
+            while not stop.is_set():
+                try:
+                    out.put(chunk, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+            if stop.is_set():
+                return
+        item = _DONE
+    except BaseException as error:
+        item = error
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            pass
+
+
+def _drain(inbox: queue.Queue, stop: threading.Event = None):
+    """
+    Generator over the chunks arriving on `inbox`, re-raising an upstream exception. Ends early once `stop` is set.
+    """
+    while True:
+        try:
+            item = inbox.get(timeout=0.1)
+        except queue.Empty:
+            if stop is not None and stop.is_set():
+                return
+            continue
+        if item is _DONE:
+            return
+        if isinstance(item, BaseException):
+            raise item
+        yield item
+
+
+class Pipeline:
+    """
+    A chain of stages fed from a chunk source. Chunks pass between stages as in-memory arrays. Threaded, every
+    stage runs in its own thread behind a queue of at most `queue_size` chunks, so at most about
+    (stages + 1) * (queue_size + 1) chunks are alive and the chain runs at the pace of its slowest stage
+    (numpy releases the GIL in the kernels). Unthreaded, the stages are plain chained generators.
+    in_bits is the source activation width; it and every stage's out_bits are passed on as the in_bits of the
+    next stage that does not set its own.
+    """
+    def __init__(self, stages: list, queue_size: int = 2, threaded: bool = True, in_bits: int = None):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.threaded = threaded
+        self.seconds = 0.0
+        bits = in_bits
+        for stage in stages:
+            if stage.in_bits is None:
+                stage.in_bits = bits
+            bits = stage.out_bits
+
+    def stage(self, name: str) -> Stage:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        raise KeyError(f"no stage {name!r} in {[stage.name for stage in self.stages]}")
+
+    def tap(self, name: str, fn, intermediate: str = None):
+        """
+        Call fn(chunk index, array) with every output chunk of stage `name`, or with one of its intermediates.
+        """
+        self.stage(name).tap(fn, intermediate)
+
+    def run(self, source):
+        """
+        Yield the output chunks of the last stage.
+        """
+        begin = time.perf_counter()
+        if not self.threaded:
+            chunks = source
+            for stage in self.stages:
+                chunks = stage.process(chunks)
+            yield from chunks
+            self.seconds += time.perf_counter() - begin
+            return
+
+        stop = threading.Event()
+        links = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        feeds = [source] + [stage.process(_drain(inbox, stop)) for stage, inbox in zip(self.stages, links)]
+        threads = [threading.Thread(target=_pump, args=(feed, outbox, stop), daemon=True)
+                   for feed, outbox in zip(feeds, links)]
+        for thread in threads:
+            thread.start()
+        try:
+            yield from _drain(links[-1])
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+            self.seconds += time.perf_counter() - begin
+
+    def drain(self, source) -> dict:
+        """
+        Run the whole source through the chain, keeping nothing but the counters, and return the report.
+        """
+        for _ in self.run(source):
+            pass
+        return self.report()
+
+    def report(self) -> dict:
+        stats = [stage.stats() for stage in self.stages]
+        elements = stats[0]["elements"] if stats else 0
+        return {"stages": stats, "seconds": self.seconds,
+                "elements_per_second": elements / self.seconds if self.seconds else 0.0,
+                "slowest": min(stats, key=lambda s: s["elements_per_second"])["stage"] if stats else None}
+
+
+def parse_stage(text: str) -> Stage:
+    """
+    NAME[:KEY=VALUE...] as a stage, e.g. requant:out_bits=16:e=34 or gelu:S=0.0012. Values are ints (0x... hex
+    allowed) or floats.
+    """
+    name, *params = text.split(":")
+    if name not in STAGES:
+        raise ValueError(f"unknown stage {name!r}, expected one of {sorted(STAGES)}")
+    kwargs = {}
+    for param in params:
+        key, _, value = param.partition("=")
+        try:
+            kwargs[key] = int(value, 0)
+        except ValueError:
+            kwargs[key] = float(value)
+    return STAGES[name](**kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="stream activations through a chain of golden-model ops in memory")
+    parser.add_argument("chain", nargs="+",
+                        help="stages in order, NAME[:KEY=VALUE...], NAME in exp / gelu / layer_norm / requant / softmax")
+    parser.add_argument("--rows", type=int, default=1 << 14)
+    parser.add_argument("--length", type=int, default=768, help="row length L")
+    parser.add_argument("--bits", type=int, default=24, help="source activation width")
+    parser.add_argument("--chunk-rows", type=int, default=256)
+    parser.add_argument("--queue-size", type=int, default=2, help="chunks buffered between two stages")
+    parser.add_argument("--serial", action="store_true", help="chain the stages as plain generators, no threads")
+    parser.add_argument("--range-tap", action="append", default=[], metavar="STAGE[.INTERMEDIATE]",
+                        help="record the min / max of a stage output or intermediate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    try:
+        stages = [parse_stage(text) for text in args.chain]
+    except (ValueError, TypeError) as error:
+        parser.error(str(error))
+    names = [stage.name for stage in stages]
+    for i, name in enumerate(names):
+        if names.count(name) > 1:
+            stages[i].name = f"{name}{names[:i].count(name) + 1}"
+    pipeline = Pipeline(stages, args.queue_size, threaded=not args.serial, in_bits=args.bits)
+
+    ranges = {}
+    sample = next(random_source(1, args.length, args.bits, seed=args.seed))
+    for spec in args.range_tap:
+        name, _, intermediate = spec.partition(".")
+        if name not in [stage.name for stage in stages]:
+            parser.error(f"--range-tap {spec}: no stage {name!r} in {[stage.name for stage in stages]}")
+        if intermediate:
+            known = pipeline.stage(name).intermediates(sample)
+            if intermediate not in known:
+                parser.error(f"--range-tap {spec}: stage {name!r} has no intermediate {intermediate!r}, "
+                             f"expected one of {known}")
+
+        def record(index, array, spec=spec):
+            lo, hi = int(np.min(array)), int(np.max(array))
+            old = ranges.get(spec, (lo, hi))
+            ranges[spec] = (min(lo, old[0]), max(hi, old[1]))
+        pipeline.tap(name, record, intermediate or None)
+
+    try:
+        report = pipeline.drain(random_source(args.rows, args.length, args.bits, args.chunk_rows, args.seed))
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"{'stage':14s} {'chunks':>8s} {'elements':>12s} {'busy s':>9s} {'elem/s':>12s}")
+    for s in report["stages"]:
+        print(f"{s['stage']:14s} {s['chunks']:8d} {s['elements']:12d} {s['seconds']:9.3f} {s['elements_per_second']:12.4g}")
+    print(f"chain: {report['seconds']:.3f} s wall, {report['elements_per_second']:.4g} elem/s end to end, "
+          f"slowest stage {report['slowest']}")
+    for spec, (lo, hi) in ranges.items():
+        print(f"tap {spec}: [{lo}, {hi}]")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({**report, "taps": {spec: list(r) for spec, r in ranges.items()}}, f, indent=2)
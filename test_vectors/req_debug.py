@@ -1,73 +1,94 @@
 import numpy as np
+import argparse
 
-def requant(qin: np.int32, bias: np.int32, m: np.int32, e: np.int8, out_bits: int = 8, clip: bool = True):
-    '''
-        qin - int32, input
-        bias - int32, bias
-        m - int32, requantization multiplier
-        e - int8, requantization shifter
-        out_bits - int, number of out bits
-        qout - int32, output
-    '''
-    intermediate_results = {}
+import hex_codec
+from compare_results import failing_rows, iter_vector_chunks
+from generate_test_vectors import requant_batch
 
-    n = 2 ** (out_bits - 1) - 1
-    intermediate_results["n"] = n
-
-    qbias = qin + bias                  # int32
-    intermediate_results["qbias"] = qbias
-
-    qm = np.int64(qbias) * m            # int64
-    intermediate_results["qm"] = qm
-
-    qout = np.round(np.float64(qm) / 2.0**e)
-    intermediate_results["qout_raw"] = qout
-
-    if clip:
-        qout = np.clip(qout, -n - 1, n)
-    intermediate_results["qout_clipped"] = qout
+def read_vectors_and_compute_with_logging(input_file, output_file, chunk_rows: int = 1 << 16, out_bits: int = 8):
+    """
+    Reads test vectors from a file, computes `requant_batch`, logs intermediate results,
+    and saves them to an output file. Chunks of rows are computed and written whole.
+    """
+    with open(output_file, "w") as outfile:
+        for _, vectors in iter_vector_chunks("req", input_file, chunk_rows):
+            results = {}
+            requant_batch(vectors["qin"], vectors["bias"], vectors["m"], vectors["e"], out_bits=out_bits,
+                          intermediate_results=results)
+            outfile.write(_format_trace({**vectors, **results}, out_bits))
 
-    qout = np.int32(qout)
-    intermediate_results["qout"] = qout
+def trace_failures(input_file, output_file, results_file=None, chunk_rows: int = 1 << 16, out_bits: int = 8) -> int:
+    """
+    Run the batched model over a vector file (or .npy store) and keep the intermediates of the failing rows only:
+    rows reported as failing in `results_file`, or without one, rows whose model output differs from the
+    expected qout column. The trace is saved as one array per input and intermediate (plus the row indices
+    and out_bits) in an .npz file; `render_trace` turns it into the req_debug.txt layout.
+    Returns the number of traced rows.
+    """
+    selected = failing_rows("req", input_file, results_file, chunk_rows) if results_file else None
+    columns = {}
+    for start, vectors in iter_vector_chunks("req", input_file, chunk_rows):
+        results = {}
+        qout = requant_batch(vectors["qin"], vectors["bias"], vectors["m"], vectors["e"], out_bits=out_bits,
+                             intermediate_results=results)
+        if selected is None:
+            rows = np.nonzero(qout != vectors["qout"])[0]
+        else:
+            rows = selected[(selected >= start) & (selected < start + len(vectors["qin"]))] - start
+        chunk = {"row": rows + start, **{name: vectors[name][rows] for name in ("qin", "bias", "m", "e")},
+                 **{name: value[rows] for name, value in results.items()}}
+        for name, value in chunk.items():
+            columns.setdefault(name, []).append(value)
+    np.savez(output_file, out_bits=out_bits, **{name: np.concatenate(values) for name, values in columns.items()})
+    return sum(len(rows) for rows in columns.get("row", []))
 
-    return qout, intermediate_results
 
-def format_as_twos_complement(value, bits=32):
+def _format_trace(trace: dict, out_bits: int) -> str:
     """
-    Format an integer value as a two's complement hexadecimal string with the specified number of bits.
+    Inputs and intermediates of `requant_batch`, one array per name, in the req_debug.txt text layout.
     """
-    return f"{int(value) & (2**bits - 1):0{bits // 4}X}"
+    # n and the clipped value are not kept by requant_batch, derive them as the log shows them
+    n = 2 ** (out_bits - 1) - 1
+    trace = {**trace, "n": np.full(len(trace["qout"]), n), "qout_clipped": np.clip(trace["qout_raw"], -n - 1, n)}
+    names = ["n", "qbias", "qm", "qout_raw", "qout_clipped", "qout"]
+    columns = ["Input: qin=", (trace["qin"], 32), ", bias=", (trace["bias"], 32), ", m=", (trace["m"], 32),
+               ", e=", (trace["e"], 8)]
+    for name in names:
+        columns += [f"\n{name}: ", (trace[name], 64 if name == "qm" else 32)]
+    columns += ["\nOutput: qout=", (trace["qout"], 32), "\n"]
+    return hex_codec.format_rows(columns, sep="")
+
 
-def read_vectors_and_compute_with_logging(input_file, output_file):
+def render_trace(trace_file, output_file):
     """
-    Reads test vectors from a file, computes the `requant` function, logs intermediate results,
-    and saves them to an output file.
+    Write a trace saved by `trace_failures` in the text layout of `read_vectors_and_compute_with_logging`.
     """
-    with open(input_file, "r") as infile, open(output_file, "w") as outfile:
-        for line in infile:
-            # Parse inputs
-            qin_hex, bias_hex, m_hex, e_hex, _ = line.strip().split(" ")
-            qin = np.int32(int(qin_hex, 16))
-            bias = np.int32(int(bias_hex, 16))
-            m = np.int32(int(m_hex, 16))
-            e = np.int8(int(e_hex, 16))
+    trace = dict(np.load(trace_file))
+    out_bits = int(trace.pop("out_bits", 8))
+    with open(output_file, "w") as outfile:
+        outfile.write(_format_trace(trace, out_bits))
 
-            # Compute output and get intermediate results
-            qout, intermediate_results = requant(qin, bias, m, e)
-
-            # Write results to the output file
-            outfile.write(f"Input: qin={qin_hex}, bias={bias_hex}, m={m_hex}, e={e_hex}\n")
-            for name, value in intermediate_results.items():
-                bits = 64 if isinstance(value, np.int64) else 32
-                value_hex = format_as_twos_complement(value, bits)
-                outfile.write(f"{name}: {value_hex}\n")
-            outfile.write(f"Output: qout={format_as_twos_complement(qout)}\n\n")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="requant golden model debug")
+    parser.add_argument("--trace", default=None, help="save the intermediates of failing rows only to this .npz file")
+    parser.add_argument("--results", default=None, help="testbench results file selecting the failing rows for --trace")
+    parser.add_argument("--render", default=None, help="render a saved .npz trace to the text layout")
+    args = parser.parse_args()
+
     # Define input and output files
     input_file = "req_test_vectors.txt"
     output_file = "req_debug.txt"
-    
-    # Run the computation with logging
-    read_vectors_and_compute_with_logging(input_file, output_file)
-    print(f"Intermediate results written to {output_file}")
+
+    if args.trace:
+        # np.savez appends the extension when it is missing
+        trace_file = args.trace if args.trace.endswith(".npz") else f"{args.trace}.npz"
+        num_rows = trace_failures(input_file, trace_file, args.results)
+        print(f"{num_rows} failing rows traced to {trace_file}")
+    elif args.render:
+        render_trace(args.render, output_file)
+        print(f"Intermediate results written to {output_file}")
+    else:
+        # Run the computation with logging
+        read_vectors_and_compute_with_logging(input_file, output_file)
+        print(f"Intermediate results written to {output_file}")
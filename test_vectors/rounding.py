@@ -0,0 +1,74 @@
+import numpy as np
+
+ROUNDING_MODES = ("half_even", "half_up", "floor")
+
+INT64_MAX = np.iinfo(np.int64).max
+INT64_MIN = np.iinfo(np.int64).min
+
+
+def _round_shift_const(x: np.ndarray, s: int, mode: str) -> np.ndarray:
+    """
+    round_shift for one shift 0 < s < 64 shared by the whole array, with in-place integer ops only.
+    The rounding offset is added to x, so this needs max(x) <= INT64_MAX - 2**(s - 1) to not wrap.
+    """
+    if mode == "half_up":
+        q = x >> (s - 1)                                            # floor(x / 2**(s - 1))
+        q += 1
+        q >>= 1
+        return q
+    q = x >> s
+    q &= 1                                                          # ties go up when the floor is odd
+    q += x
+    q += (1 << (s - 1)) - 1
+    q >>= s
+    return q
+
+
+def round_shift(x, shift, mode: str = "half_even", saturate: bool = False) -> np.ndarray:
+    """
+    Integer-only x / 2**shift rounded to an integer, for int64 x and shift >= 0 (scalars or broadcastable arrays).
+    Bit-true over the whole int64 range, unlike np.round(np.float64(x) / 2.0**shift) which rounds x to 53 bits first.
+        half_even - ties to even, what np.round does (the golden models' default)
+        half_up   - ties towards +inf, floor(x / 2**shift + 1/2)
+        floor     - plain arithmetic right shift, varshift without rounding
+    Negative shifts shift left, wrapping like varshift's << or, with `saturate`, clamped to the int64 range
+    (so a later clip sees the sign and magnitude of the exact x * 2**-shift). Shifts of 64 or more give 0
+    (-1 or 0 for floor).
+    """
+    if mode not in ROUNDING_MODES:
+        raise ValueError(f"unknown rounding mode {mode!r}, expected one of {ROUNDING_MODES}")
+    x = np.asarray(x, dtype=np.int64)
+    shift = np.asarray(shift, dtype=np.int64)
+    shape = np.broadcast_shapes(x.shape, shift.shape)
+
+    # common case of one shift for the whole array (fp_bits, a file's e column)
+    if shift.size and shift.min() == shift.max() and 0 <= shift.flat[0] < 64:
+        s = int(shift.flat[0])
+        if mode == "floor" or s == 0:
+            q = x >> s
+        elif x.size == 0 or x.max() <= INT64_MAX - (1 << (s - 1)):
+            q = _round_shift_const(x, s, mode)
+        else:
+            q = None
+        if q is not None:
+            return q if q.shape == shape else np.broadcast_to(q, shape).copy()
+
+    s = np.clip(shift, 0, 63)
+    q = x >> s                                                      # floor
+    if mode != "floor":
+        below = np.where(s > 0, (x >> np.maximum(s - 1, 0)) & 1, 0)  # remainder >= 2**(s - 1)
+        if mode == "half_up":
+            q = q + below
+        else:
+            # round up above the tie, or on a tie with odd q
+            sticky = (x & ((np.int64(1) << np.maximum(s - 1, 0)) - 1)) != 0
+            q = q + (below & (sticky | q))
+    left = np.clip(-shift, 0, 63)
+    shifted = np.where(-shift >= 64, 0, x << left)                  # every bit shifted out from 64 up
+    if saturate:
+        # bits were lost when shifting back does not restore x
+        lost = (shifted >> left) != x
+        shifted = np.where(lost, np.where(x < 0, INT64_MIN, INT64_MAX), shifted)
+    q = np.where(shift < 0, shifted, q)
+    # |x| <= 2**63 so x / 2**64 lies in [-1/2, 1/2) and rounds to 0 in every mode but floor
+    return np.where(shift >= 64, np.where(x < 0, -1, 0) if mode == "floor" else 0, q).astype(np.int64)
@@ -0,0 +1,303 @@
+import argparse
+import heapq
+from collections import defaultdict
+
+import perf_model
+
+# Dataflow of each op, following the unit annotations of the golden models (# mul, # sub, # shift, ...) and the
+# unit each non_lin_ops.sv state drives. Nodes are (name, unit, deps, scope):
+#   elem   - one node per vector element, deps on elem nodes refer to the same element
+#   row    - one node per row, computed from reductions / other row nodes
+#   reduce - accumulates an elem node over the row in the RTL's accumulator order, `unit` is the per-element
+#            step sequence ("add" for sum, "add", "mux" for max: compare, then select)
+# Inputs (qin, coefficients) are not nodes; the element input `qin` arrives through the single input port.
+GRAPHS = {
+    "exp": [
+        ("fp_mul", "mult", ["qin"], "elem"),
+        ("z", "shift", ["fp_mul"], "elem"),
+        ("zq", "mult", ["z"], "elem"),
+        ("qp", "add", ["qin", "zq"], "elem"),
+        ("qpb", "add", ["qp"], "elem"),
+        ("qpp", "mult", ["qpb", "qp"], "elem"),
+        ("ql", "add", ["qpp"], "elem"),
+        ("qout", "shift", ["ql", "z"], "elem"),
+    ],
+    "gelu": [
+        ("neg", "mult", ["qin"], "elem"),
+        ("q_abs", "mux", ["qin", "neg"], "elem"),
+        ("nqb", "mult", [], "elem"),
+        ("cmp", "add", ["nqb", "q_abs"], "elem"),
+        ("q_clip", "mux", ["cmp", "q_abs", "nqb"], "elem"),
+        ("qb2", "mult", [], "elem"),
+        ("qcb", "add", ["q_clip", "qb2"], "elem"),
+        ("qcc", "mult", ["qcb", "q_clip"], "elem"),
+        ("ql", "add", ["qcc"], "elem"),
+        ("q_sgn", "mux", ["qin"], "elem"),
+        ("L", "mult", ["ql", "q_sgn"], "elem"),
+        ("q_erf", "shift", ["L"], "elem"),
+        ("q_erf1", "add", ["q_erf"], "elem"),
+        ("qout", "mult", ["q_erf1", "qin"], "elem"),
+    ],
+    "req": [
+        ("qbias", "add", ["qin"], "elem"),
+        ("e_sh", "add", [], "elem"),
+        ("qm", "mult", ["qbias"], "elem"),
+        ("frac", "shift", ["qm", "e_sh"], "elem"),
+        ("half", "shift", ["frac"], "elem"),
+        ("rest", "shift", ["frac"], "elem"),
+        ("round", "redor", ["half"], "elem"),
+        ("sticky", "redor", ["rest"], "elem"),
+        ("q", "shift", ["qm"], "elem"),
+        ("inc", "mux", ["round"], "elem"),
+        ("qinc", "add", ["q", "inc"], "elem"),
+        ("q_up", "mux", ["sticky", "q", "qinc"], "elem"),
+        ("q_rnd", "mux", ["q", "q_up", "qinc"], "elem"),
+        ("ob1", "add", [], "elem"),
+        ("n1", "shift", ["ob1"], "elem"),
+        ("nmin", "mult", ["n1"], "elem"),
+        ("lo", "add", ["q_rnd", "nmin"], "elem"),
+        ("q_lo", "mux", ["lo", "q_rnd", "nmin"], "elem"),
+        ("nmax1", "mult", ["nmin"], "elem"),
+        ("nmax", "add", ["nmax1"], "elem"),
+        ("hi", "add", ["q_lo", "nmax"], "elem"),
+        ("qout", "mux", ["hi", "q_lo", "nmax"], "elem"),
+    ],
+    "sm": [
+        ("qmax", ("add", "mux"), ["qin"], "reduce"),
+        ("qhat", "add", ["qin", "qmax"], "elem"),
+        ("fp_mul", "mult", ["qhat"], "elem"),
+        ("z", "shift", ["fp_mul"], "elem"),
+        ("zq", "mult", ["z"], "elem"),
+        ("qp", "add", ["qhat", "zq"], "elem"),
+        ("qpb", "add", ["qp"], "elem"),
+        ("qpp", "mult", ["qpb", "qp"], "elem"),
+        ("ql", "add", ["qpp"], "elem"),
+        ("qexp_32", "shift", ["ql", "z"], "elem"),
+        ("qexp_64", "mult", ["qexp_32"], "elem"),
+        ("q", "shift", ["qexp_64"], "elem"),
+        ("frac", "shift", ["qexp_64"], "elem"),
+        ("round", "redor", ["frac"], "elem"),
+        ("inc", "mux", ["round"], "elem"),
+        ("qinc", "add", ["q", "inc"], "elem"),
+        ("qreq", "mux", ["q", "qinc"], "elem"),
+        ("qsum", ("add",), ["qreq"], "reduce"),
+        ("factor", "div", ["qsum"], "row"),
+        ("qout_mul", "mult", ["qreq", "factor"], "elem"),
+        ("qout", "shift", ["qout_mul"], "elem"),
+    ],
+    "ln": [
+        ("qsum", ("add",), ["qin"], "reduce"),
+        ("q_shift", "shift", ["qin"], "elem"),
+        ("q_sq", "mult", ["q_shift"], "elem"),
+        ("qsum_sq", ("add",), ["q_sq"], "reduce"),
+        ("qmul", "mult", ["qsum"], "row"),
+        ("qmean", "shift", ["qmul"], "row"),
+        ("qmean_mul", "mult", ["qmean", "qsum"], "row"),
+        ("qmean_sq", "shift", ["qmean_mul"], "row"),
+        ("var", "add", ["qsum_sq", "qmean_sq"], "row"),
+        ("var_sqrt", "sqrt", ["var"], "row"),
+        ("std", "shift", ["var_sqrt"], "row"),
+        ("factor", "div", ["std"], "row"),
+        ("r", "add", ["qin", "qmean"], "elem"),
+        ("qout_mul", "mult", ["r", "factor"], "elem"),
+        ("qout_shift", "shift", ["qout_mul"], "elem"),
+        ("qout", "add", ["qout_shift"], "elem"),
+    ],
+}
+
+# One instance of each unit, as allocated in non_lin_ops.sv ("port" is the qin input).
+UNITS = {"port": 1, "add": 1, "mult": 1, "shift": 1, "mux": 1, "redor": 1, "div": 1, "sqrt": 1}
+
+
+def unit_timing(latencies: dict = None, pipelined_mult: bool = False) -> dict:
+    """
+    (latency, initiation interval) per unit, in cycles from the issuing state to the first consuming state.
+    Single-state units register their result for the next state. mult / div / sqrt add their wait states
+    (perf_model.LATENCIES); mult.sv's valid logic blocks a new input until the previous one is out.
+    """
+    latencies = {**perf_model.LATENCIES, **(latencies or {})}
+    timing = {unit: (1, 1) for unit in UNITS}
+    for unit in ("mult", "div", "sqrt"):
+        timing[unit] = (1 + latencies[unit], 1 + latencies[unit])
+    if pipelined_mult:
+        timing["mult"] = (timing["mult"][0], 1)
+    return timing
+
+
+def build_graph(op: str, length: int = 1) -> dict:
+    """
+    Instantiate an op's dataflow for one row of `length` elements: {node: (unit, deps)}.
+    Element nodes are named name@i, reduction steps name#i (the row result is the last step).
+    """
+    graph = {}
+    row_value = {}
+    for i in range(length):
+        graph[f"qin@{i}"] = ("port", [])
+
+    def source(dep, i):
+        if dep in row_value:
+            return row_value[dep]
+        return f"{dep}@{i}"
+
+    for name, unit, deps, scope in GRAPHS[op]:
+        if scope == "elem":
+            for i in range(length):
+                graph[f"{name}@{i}"] = (unit, [source(dep, i) for dep in deps])
+        elif scope == "row":
+            graph[name] = (unit, [source(dep, 0) for dep in deps])
+            row_value[name] = name
+        else:
+            prev = None
+            for i in range(length):
+                for k, step in enumerate(unit):
+                    node = f"{name}#{i}" if k == len(unit) - 1 else f"{name}#{i}.{k}"
+                    inputs = [source(deps[0], i)] + ([prev] if prev else [])
+                    if k:
+                        inputs.append(f"{name}#{i}.{k - 1}")
+                    graph[node] = (step, inputs)
+                prev = f"{name}#{i}"
+            row_value[name] = prev
+    return graph
+
+
+def critical_path(graph: dict, timing: dict) -> tuple:
+    """
+    Longest latency-weighted path with unlimited units: (cycles, nodes on it).
+    """
+    finish = {}
+    parent = {}
+    for node in graph:  # nodes are created in dependency order
+        unit, deps = graph[node]
+        start = max((finish[d] for d in deps), default=0)
+        parent[node] = max(deps, key=lambda d: finish[d]) if deps else None
+        finish[node] = start + timing[unit][0]
+    node = max(finish, key=finish.get)
+    cycles = finish[node]
+    path = []
+    while node:
+        path.append(node)
+        node = parent[node]
+    return cycles, path[::-1]
+
+
+def list_schedule(graph: dict, units: dict, timing: dict) -> dict:
+    """
+    Resource-constrained list scheduling: every cycle, each free unit instance starts the ready node with the
+    longest latency-weighted path to the end of the graph. Returns {node: start cycle}.
+    """
+    users = defaultdict(list)
+    for node, (_, deps) in graph.items():
+        for dep in deps:
+            users[dep].append(node)
+    priority = {}
+    for node in reversed(list(graph)):
+        unit = graph[node][0]
+        priority[node] = timing[unit][0] + max((priority[u] for u in users[node]), default=0)
+
+    waiting = {node: len(deps) for node, (_, deps) in graph.items()}
+    ready = defaultdict(list)    # unit -> heap of (-priority, node)
+    for node, count in waiting.items():
+        if count == 0:
+            heapq.heappush(ready[graph[node][0]], (-priority[node], node))
+    free = {unit: [0] * count for unit, count in units.items()}   # cycle each instance is free again
+    start = {}
+    finishing = defaultdict(list)
+    cycle = 0
+    while len(start) < len(graph):
+        for node in finishing.pop(cycle, []):
+            for user in users[node]:
+                waiting[user] -= 1
+                if waiting[user] == 0:
+                    heapq.heappush(ready[graph[user][0]], (-priority[user], user))
+        for unit, heap in ready.items():
+            instances = free[unit]
+            while heap and min(instances) <= cycle:
+                _, node = heapq.heappop(heap)
+                latency, interval = timing[unit]
+                start[node] = cycle
+                instances[instances.index(min(instances))] = cycle + interval
+                finishing[cycle + latency].append(node)
+        cycle += 1
+    return start
+
+
+def schedule(op: str, length: int = 1, units: dict = None, latencies: dict = None, pipelined_mult: bool = False) -> dict:
+    """
+    Minimum cycles of one row of `length` elements of `op` under a unit allocation (for exp/gelu/req,
+    `length` independent elements), next to the unlimited-unit critical path, the per-unit resource bound
+    and the FSM's cycles for the same work (perf_model).
+    """
+    units = {**UNITS, **(units or {})}
+    timing = unit_timing(latencies, pipelined_mult)
+    graph = build_graph(op, length)
+    start = list_schedule(graph, units, timing)
+    cycles = max(start[node] + timing[graph[node][0]][0] for node in graph)
+    path_cycles, path = critical_path(graph, timing)
+    busy = defaultdict(int)
+    for unit, _ in graph.values():
+        busy[unit] += timing[unit][1]
+    if len(perf_model.PASSES[op]) > 1:
+        fsm = perf_model.simulate_row(op, length, latencies)["cycles"] - 1  # without the rst state
+    else:
+        fsm = perf_model.estimate(op, length, latencies=latencies)["total_cycles"] - 1
+    return {
+        "op": op,
+        "length": length,
+        "cycles": cycles,
+        "critical_path_cycles": path_cycles,
+        "resource_bound": max(-(-busy[unit] // units[unit]) for unit in busy),
+        "unit_busy": dict(busy),
+        "fsm_cycles": fsm,
+        "critical_path": path,
+    }
+
+
+def compress_path(path: list) -> list:
+    """
+    Collapse a node path to op names, with element counts for reduction chains (qsum x768).
+    """
+    names = []
+    for node in path:
+        name, _, index = node.partition("#")
+        name = name.split("@")[0]
+        index = index.split(".")[0]
+        if names and names[-1][0] == name:
+            names[-1][1].add(index)
+        else:
+            names.append([name, {index}])
+    return [name if len(indices) == 1 else f"{name} x{len(indices)}" for name, indices in names]
+
+
+ALLOCATIONS = [("baseline", {}), ("+1 mult", {"mult": 2}), ("+1 add", {"add": 2}), ("+1 mult +1 add", {"mult": 2, "add": 2})]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="list-schedule the golden dataflow of each op under unit counts and latencies")
+    parser.add_argument("ops", nargs="*", default=sorted(GRAPHS), help="exp / gelu / ln / req / sm")
+    parser.add_argument("--length", type=int, default=None, help="row length for ln / sm (default 768 / 32)")
+    parser.add_argument("--elements", type=int, default=64, help="independent elements scheduled for exp / gelu / req throughput")
+    parser.add_argument("--div-latency", type=int, default=perf_model.LATENCIES["div"])
+    parser.add_argument("--sqrt-latency", type=int, default=perf_model.LATENCIES["sqrt"])
+    parser.add_argument("--mult-latency", type=int, default=perf_model.LATENCIES["mult"])
+    parser.add_argument("--pipelined-mult", action="store_true", help="mult accepts a new input every cycle")
+    args = parser.parse_args()
+
+    latencies = {"mult": args.mult_latency, "div": args.div_latency, "sqrt": args.sqrt_latency}
+    for op in args.ops:
+        rows = len(perf_model.PASSES[op]) > 1
+        length = (args.length or {"ln": 768, "sm": 32}[op]) if rows else args.elements
+        print(f"{op} (L={length})" if rows else f"{op} (1 element latency, {length} elements throughput)")
+        for label, units in ALLOCATIONS:
+            result = schedule(op, length, units, latencies, args.pipelined_mult)
+            if rows:
+                path_result = result
+                line = f"{result['cycles']:8d} cycles per row (FSM {result['fsm_cycles']}, resource bound {result['resource_bound']})"
+            else:
+                path_result = schedule(op, 1, units, latencies, args.pipelined_mult)
+                line = (f"{path_result['cycles']:4d} cycles latency (FSM {path_result['fsm_cycles']}), "
+                        f"{result['cycles'] / length:6.2f} cycles per element (FSM {result['fsm_cycles'] / length:.2f}, "
+                        f"resource bound {result['resource_bound'] / length:.2f})")
+            if label == "baseline":
+                print(f"  critical path {path_result['critical_path_cycles']} cycles: "
+                      f"{' -> '.join(compress_path(path_result['critical_path']))}")
+                print(f"  unit busy cycles: {path_result['unit_busy']}")
+            print(f"  {label:15s} {line}")
@@ -1,6 +1,13 @@
 import numpy as np
+import argparse
+import os
 from typing import Tuple
 
+import hex_codec
+import perf_model
+import vector_store
+from rounding import round_shift
+
 def exp(expcount, qin: np.int32, qb: np.int32, qc: np.int32, qln2: np.int32, qln2_inv: np.int32, fp_bits: int = 30) -> Tuple[np.int32, dict]:
     """
     Compute the exponential approximation and record intermediate results.
@@ -86,15 +93,197 @@ def softmax(qin: np.int32, qb: np.int32, qc: np.int32, qln2: np.int32, qln2_inv:
     return intermediate_results
 
 
+def softmax_batch(qin: np.ndarray, qb, qc, qln2, qln2_inv, Sreq,
+                  fp_bits: int = 30, max_bits: int = 30, out_bits: int = 6, rounding: str = "half_even") -> dict:
+    """
+    Perform softmax on every row of an (N, L) int32 matrix in one vectorized pass.
+    Coefficients are scalars or length-N arrays (one per row). Bit-exact with `softmax` applied row by row.
+    qreq is rounded with the integer-only rounding.round_shift in the given mode (half_even is np.round).
+    Returns a dictionary of all intermediate results, each with a leading row axis.
+    """
+    intermediate_results = {}
+    divident = 1 << max_bits  # uint32, constant
+    shift = max_bits - out_bits
+
+    qin = np.atleast_2d(np.asarray(qin, dtype=np.int32))
+    qb, qc, qln2, qln2_inv, Sreq = (np.asarray(x, dtype=np.int64).reshape(-1, 1) for x in (qb, qc, qln2, qln2_inv, Sreq))
+
+    qmax = np.max(qin, axis=-1, keepdims=True)  # max, int32, reduction operation
+    intermediate_results['qmax'] = qmax
+
+    qhat = qin - qmax  # sub, int32
+    intermediate_results['qhat'] = qhat
+
+    # exp() over the whole matrix
+    fp_mul = np.int64(qhat) * qln2_inv  # mul
+    intermediate_results['fp_mul'] = fp_mul
+
+    z = fp_mul >> fp_bits  # shift
+    intermediate_results['z'] = z
+
+    qp = qhat - z * qln2  # mul, sub
+    intermediate_results['qp'] = qp
+
+    ql = (qp + qb) * qp + qc  # poly
+    intermediate_results['ql'] = ql
+
+    qexp_32 = np.int32(ql >> z)  # shift
+    intermediate_results['qexp_32'] = qexp_32
+
+    qexp_64 = np.int64(qexp_32) * Sreq  # mul, int64
+    intermediate_results['qexp_64'] = qexp_64
+
+    qreq = round_shift(qexp_64, fp_bits, rounding)  # shift and round, int16
+    qreq = qreq.astype(np.int16)
+    intermediate_results['qreq'] = qreq
+
+    qsum = np.sum(qreq, axis=-1, keepdims=True, dtype=np.int32)  # acc, int32
+    intermediate_results['qsum'] = qsum
+
+    factor = np.floor(divident / qsum)  # div, constant / scalar
+    factor = np.int32(factor)
+    intermediate_results['factor'] = factor
+
+    qout = qreq * factor  # mul
+    qout = np.int8(qout >> shift)  # shift
+    intermediate_results['qout'] = qout
+
+    return intermediate_results
+
+
+def exp_qreq(qhat: np.ndarray, qb, qc, qln2, qln2_inv, Sreq, fp_bits: int = 30, rounding: str = "half_even") -> np.ndarray:
+    """
+    The exp and requant steps of `softmax_batch` for int32 qhat <= 0: qexp_32 * Sreq rounded to int16 qreq.
+    Coefficients broadcast against qhat.
+    """
+    fp_mul = np.int64(qhat) * qln2_inv  # mul
+    z = fp_mul >> fp_bits  # shift
+    qp = qhat - z * qln2  # mul, sub
+    ql = (qp + qb) * qp + qc  # poly
+    qexp_32 = np.int32(ql >> z)  # shift
+    return round_shift(np.int64(qexp_32) * Sreq, fp_bits, rounding).astype(np.int16)
+
+
+def softmax_online(qin, qb, qc, qln2, qln2_inv, Sreq, tile: int = 32,
+                   fp_bits: int = 30, max_bits: int = 30, out_bits: int = 6, rounding: str = "half_even") -> dict:
+    """
+    Softmax of every row of an (N, L) int32 matrix that only ever reads (N, tile) column tiles, so qin can be
+    a np.memmap or vector store too large to hold. The first pass keeps a running max and a running sum of qreq.
+    When a tile raises the max by d, the sum is rescaled by exp(d) / exp(0) in 2^30 fixed point, both from the
+    same integer exp and requant, so the ratio holds for any Sreq. The second pass re-reads the tiles and emits
+    qout with the final max and sum.
+    qmax and every qreq of the output pass equal the two-pass `softmax_batch` values. Only qsum differs, through
+    the rounding of the rescaled sum and the error of the integer exp(a + b) against exp(a) * exp(b), and the
+    error grows with the number of rescales. Measured, not proven: on sm_test_vectors.txt and on random rows
+    (int16 inputs, the sm_coefficients scales with Sreq down to 1/8 of its default, L up to 1024) qout is within
+    1 LSB of the two-pass result for every tile size. qsum is within 0.5% for random row orders. The worst case
+    is ascending rows with tile = 1, where every element rescales and qsum is off by up to about 2% (1.7%
+    measured at L = 1024). The 6-bit qout absorbed that, but a wider out_bits would not. sm_debug.py --online
+    reports both for a file.
+    Returns qmax, qsum, factor, qout and the number of rescales per row.
+    """
+    divident = 1 << max_bits
+    shift = max_bits - out_bits
+    qb, qc, qln2, qln2_inv, Sreq = (np.asarray(x, dtype=np.int64).reshape(-1, 1) for x in (qb, qc, qln2, qln2_inv, Sreq))
+    num_rows, length = qin.shape
+    tiles = range(0, length, tile)
+
+    # exp(0) of the row's coefficients, so exp(d) is read as a 2^30 fixed point ratio whatever Sreq is
+    q0 = np.maximum(np.int64(exp_qreq(np.zeros((num_rows, 1), dtype=np.int32), qb, qc, qln2, qln2_inv, Sreq,
+                                      fp_bits, rounding)), 1)
+    qmax = qsum = None
+    rescales = np.zeros((num_rows, 1), dtype=np.int64)
+    for start in tiles:
+        q = np.asarray(qin[:, start:start + tile], dtype=np.int32)
+        tile_max = np.max(q, axis=-1, keepdims=True)  # max
+        if qmax is None:
+            qmax, qsum = tile_max, np.zeros((num_rows, 1), dtype=np.int64)
+        else:
+            new_max = np.maximum(qmax, tile_max)
+            raised = new_max > qmax
+            d = np.maximum(np.int64(qmax) - new_max, np.iinfo(np.int32).min).astype(np.int32)
+            qd = np.int64(exp_qreq(d, qb, qc, qln2, qln2_inv, Sreq, fp_bits, rounding))
+            scale = ((qd << fp_bits) + q0 // 2) // q0  # exp(d) / exp(0) * 2^30, div
+            qsum = np.where(raised, round_shift(qsum * scale, fp_bits, rounding), qsum)  # mul, shift and round
+            rescales += raised
+            qmax = new_max
+        qsum += np.sum(exp_qreq(q - qmax, qb, qc, qln2, qln2_inv, Sreq, fp_bits, rounding), axis=-1, keepdims=True, dtype=np.int64)  # acc
+
+    qsum = qsum.astype(np.int32)
+    factor = np.int32(np.floor(divident / qsum))  # div
+    qout = np.empty((num_rows, length), dtype=np.int8)
+    for start in tiles:
+        q = np.asarray(qin[:, start:start + tile], dtype=np.int32)
+        qreq = exp_qreq(q - qmax, qb, qc, qln2, qln2_inv, Sreq, fp_bits, rounding)
+        qout[:, start:start + tile] = np.int8((qreq * factor) >> shift)  # mul, shift
+
+    return {'qmax': qmax, 'qsum': qsum, 'factor': factor, 'qout': qout, 'rescales': rescales[:, 0]}
+
+
+def read_vectors(input_file):
+    """
+    Read a whole softmax vector file into arrays: qin (N, L) int32, qb/qc/qln2/qln2_inv/Sreq (N,) int32
+    and the expected qout (N, L) int8. Coefficients are sign-extended as the testbench does.
+    """
+    with open(input_file, "rb") as infile:
+        raw = hex_codec.parse_rows(infile.read())
+    length = (raw.shape[1] - 5) // 2
+    vectors = {'qin': raw[:, :length].astype(np.uint32).view(np.int32)}
+    for i, key in enumerate(['qb', 'qc', 'qln2', 'qln2_inv', 'Sreq']):
+        vectors[key] = raw[:, length + i].astype(np.uint32).view(np.int32)
+    vectors['qout'] = raw[:, length + 5:].astype(np.uint32).astype(np.int8)
+    return vectors
+
+
+def check_vectors(input_file, chunk_rows: int = 4096):
+    """
+    Recompute every row of a softmax vector file with `softmax_batch` and compare against its qout column.
+    Returns the number of rows and the indices of mismatching rows.
+    """
+    vectors = read_vectors(input_file)
+    num_rows = len(vectors['qin'])
+    mismatches = []
+    for start in range(0, num_rows, chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        results = softmax_batch(vectors['qin'][rows], vectors['qb'][rows], vectors['qc'][rows],
+                                vectors['qln2'][rows], vectors['qln2_inv'][rows], vectors['Sreq'][rows])
+        bad = np.any(results['qout'] != vectors['qout'][rows], axis=-1)
+        mismatches.extend((np.nonzero(bad)[0] + start).tolist())
+    return num_rows, mismatches
+
+
+def compare_online(vector_file, tile: int, chunk_rows: int = 4096) -> dict:
+    """
+    Run `softmax_online` with the given tile over a softmax vector file or .npy store and compare it with
+    `softmax_batch`: exact rows, the largest qout and relative qsum differences and the mean rescales per row.
+    """
+    if os.path.isdir(vector_file):
+        vectors = vector_store.load(vector_file)
+    else:
+        vectors = read_vectors(vector_file)
+    num_rows, length = vectors['qin'].shape
+    exact = max_lsb = 0
+    max_sum_error = rescales = 0.0
+    for start in range(0, num_rows, chunk_rows):
+        rows = slice(start, start + chunk_rows)
+        coeffs = [vectors[key][rows] for key in ('qb', 'qc', 'qln2', 'qln2_inv', 'Sreq')]
+        buffered = softmax_batch(vectors['qin'][rows], *coeffs)
+        online = softmax_online(vectors['qin'][rows], *coeffs, tile=tile)
+        diff = np.abs(np.int32(buffered['qout']) - online['qout'])
+        exact += int(np.sum(np.all(diff == 0, axis=-1)))
+        max_lsb = max(max_lsb, int(diff.max()))
+        max_sum_error = max(max_sum_error, float(np.max(np.abs(np.int64(online['qsum']) - buffered['qsum']) / buffered['qsum'])))
+        rescales += float(online['rescales'].sum())
+    return {'rows': num_rows, 'length': length, 'tile': tile, 'exact_rows': exact, 'max_qout_lsb': max_lsb,
+            'max_qsum_relative_error': max_sum_error, 'rescales_per_row': rescales / num_rows}
+
+
 def format_as_twos_complement(value, bits=32):
     """
     Format an integer as a two's complement hexadecimal string.
     Handles both scalars and numpy arrays.
     """
-    if isinstance(value, np.ndarray):
-        return " ".join(f"0x{(int(x) & (2**bits - 1)):08X}" for x in value)
-    else:
-        return f"0x{(int(value) & (2**bits - 1)):08X}"
+    return hex_codec.format_values(value, bits, width=8, prefix="0x")
     
 
 def read_vectors_and_compute_with_logging(input_file, output_file):
@@ -105,16 +294,11 @@ def read_vectors_and_compute_with_logging(input_file, output_file):
     count = 0
     with open(input_file, "r") as infile, open(output_file, "w") as outfile:
         for idx, line in enumerate(infile):
-            # Split the line into components
-            qin_hex, qb_hex, qc_hex, qln2_hex, qln2_inv_hex, Sreq_hex, _ = line.strip().split(" | ")
-
-            # Convert hexadecimal strings to numpy arrays or scalars of int32
-            qin = np.array([int(x, 16) for x in qin_hex.split()], dtype=np.int32)
-            qb = int(qb_hex, 16)
-            qc = int(qc_hex, 16)
-            qln2 = int(qln2_hex, 16)
-            qln2_inv = int(qln2_inv_hex, 16)
-            Sreq = int(Sreq_hex, 16)
+            # Convert the hexadecimal fields: qin to int32, the coefficients to unsigned ints as written
+            raw = hex_codec.parse_rows(line)[0]
+            length = (len(raw) - 5) // 2
+            qin = raw[:length].astype(np.uint32).view(np.int32)
+            qb, qc, qln2, qln2_inv, Sreq = (int(x) for x in raw[length:length + 5])
 
             # Perform softmax and get intermediate results
             results = softmax(qin=qin, qb=qb, qc=qc, qln2=qln2, qln2_inv=qln2_inv, Sreq=Sreq)
@@ -141,10 +325,31 @@ def read_vectors_and_compute_with_logging(input_file, output_file):
             count = count + 1
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="softmax golden model debug")
+    parser.add_argument("--check", action="store_true", help="check every row of the vector file with the batched model")
+    parser.add_argument("--online", type=int, default=None, metavar="TILE",
+                        help="compare the tiled online softmax with the two-pass model, and their cycles and buffers")
+    parser.add_argument("--vectors", default="sm_test_vectors.txt", help="vector file or .npy store for --check / --online")
+    args = parser.parse_args()
+
     # Define input and output files
-    input_file = "sm_test_vectors.txt"
+    input_file = args.vectors
     output_file = "sm_debug.txt"
-    
-    # Run the computation with logging
-    read_vectors_and_compute_with_logging(input_file, output_file)
-    print(f"Intermediate results written to {output_file}")
+
+    if args.online:
+        report = compare_online(input_file, args.online)
+        print(f"{report['exact_rows']}/{report['rows']} rows exact, max qout difference {report['max_qout_lsb']} LSB, "
+              f"max qsum relative error {report['max_qsum_relative_error']:.3g}, "
+              f"{report['rescales_per_row']:.2f} rescales per row")
+        cost = perf_model.softmax_tiling(report['length'], args.online, report['rescales_per_row'])
+        print(f"L={cost['length']}: buffered {cost['buffered_cycles']} cycles, {cost['buffered_bytes']} B row buffer; "
+              f"online tile {cost['tile']}: {cost['online_cycles']} cycles, {cost['online_bytes']} B")
+    elif args.check:
+        num_rows, mismatches = check_vectors(input_file)
+        print(f"{num_rows - len(mismatches)}/{num_rows} rows match {input_file}")
+        if mismatches:
+            print(f"first mismatching rows: {mismatches[:10]}")
+    else:
+        # Run the computation with logging
+        read_vectors_and_compute_with_logging(input_file, output_file)
+        print(f"Intermediate results written to {output_file}")
@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+
+import compare_results
+import vector_store
+
+
+def test_parse_scalar_results():
+    lines = ["PASS: qin=c7d6672f\n", "\n",
+             "FAIL: qin=0000001f bias=00000001 m=40000000 e=1e expected_qout=0000007f got_qout=ffffff80\n",
+             "PASS: qin=00000000\n"]
+    parsed = compare_results.parse_result_lines("req", lines)
+    np.testing.assert_array_equal(parsed["qin"], [np.uint32(0xc7d6672f).view(np.int32), 0x1f, 0])
+    np.testing.assert_array_equal(parsed["got"], [-1, -128, -1])
+    np.testing.assert_array_equal(parsed["passed"], [True, False, True])
+    np.testing.assert_array_equal(parsed["index"], [0, 0, 0])
+
+
+def test_parse_row_results():
+    lines = ["PASS at index 3: sm_qin=00000001\n",
+             "vector count 7:\n", "PASS at index 0: sm_qin=fffffffe\n",
+             "vector count 12:\n",
+             "FAIL at index 10: sm_qin=00000005, sm_qb=000004c0, sm_qc=00089ae6, sm_qln2=fffffec8, "
+             "sm_qln2_inv=ffcb7bb7, sm_Sreq=03b7f7d1, qout=3f, expected=40\n"]
+    parsed = compare_results.parse_result_lines("sm", lines)
+    np.testing.assert_array_equal(parsed["row"], [-1, 7, 12])
+    np.testing.assert_array_equal(parsed["index"], [3, 0, 10])
+    np.testing.assert_array_equal(parsed["qin"], [1, -2, 5])
+    np.testing.assert_array_equal(parsed["got"], [-1, -1, 0x3f])
+    np.testing.assert_array_equal(parsed["passed"], [True, True, False])
+
+
+def test_parse_no_results():
+    parsed = compare_results.parse_result_lines("ln", [])
+    assert all(len(value) == 0 for value in parsed.values())
+
+
+def test_compare_skips_lines_that_are_not_results(tmp_path):
+    vector_path = tmp_path / "req_test_vectors.txt"
+    with open(os.path.join(os.path.dirname(compare_results.__file__), "req_test_vectors.txt")) as f:
+        rows = [f.readline() for _ in range(6)]
+    vector_path.write_text("".join(rows))
+    vectors = vector_store.parse_lines("req", rows, 1)
+    lines = [f"PASS: qin={int(q) & 0xFFFFFFFF:08x}\n" for q in vectors["qin"]]
+    # a blank line, testbench chatter and a trailing result for the empty line the testbench reads last
+    lines[2:2] = ["\n", "reading next vector\n"]
+    lines.append("PASS: qin=00000000\n")
+    results_path = tmp_path / "req_test_results.txt"
+    results_path.write_text("".join(lines))
+    report = compare_results.compare("req", str(vector_path), str(results_path), chunk_rows=4)
+    assert (report["rows"], report["elements"], report["mismatches"]) == (6, 6, 0)
+    assert (report["misaligned"], report["missing"], report["extra"]) == (0, 0, 1)
@@ -0,0 +1,38 @@
+import numpy as np
+
+import generate_test_vectors as gtv
+
+
+def test_sm_coefficients_keep_exp0_within_int16():
+    S = np.linspace(0.0005, 0.004, 1001)
+    qb, qc, qln2, qln2_inv, Sreq = gtv.sm_coefficients(S)
+    assert np.all(qc * Sreq >> 30 <= 2**15 - 1)
+
+
+def test_single_shard_matches_unsharded_stream(tmp_path):
+    gtv.write_vectors("req", gtv.GENERATORS["req"](500, 7, 128), str(tmp_path / "plain.txt"), "txt")
+    gtv.gen_sharded("req", 500, str(tmp_path / "sharded.txt"), seed=7, workers=1, chunk_size=128)
+    assert (tmp_path / "plain.txt").read_text() == (tmp_path / "sharded.txt").read_text()
+
+
+def test_shards_independent_of_worker_count(tmp_path):
+    outputs = []
+    for workers in (1, 3):
+        output = tmp_path / f"sm{workers}.txt"
+        gtv.gen_sharded("sm", 100, str(output), seed=3, workers=workers, shard_size=32, chunk_size=256)
+        outputs.append(output.read_text())
+    assert outputs[0] == outputs[1]
+    assert len(outputs[0].splitlines()) == 100
+
+
+def test_streaming_writers_match_per_line_format(tmp_path):
+    np.random.seed(11)
+    gtv.gen_req(300, str(tmp_path / "req.txt"), chunk_size=64)
+    np.random.seed(11)
+    expected = []
+    for _ in range(300):
+        qin, bias, m = (np.random.randint(*r, dtype=np.int32) for r in ((-2**30, 2**30 - 1),) * 2 + ((0, 2**31 - 1),))
+        qout = gtv.requant(qin, bias, m, np.int8(30))
+        expected.append(f"{int(qin) & 0xFFFFFFFF:08X} {int(bias) & 0xFFFFFFFF:08X} {int(m):08X} 1E "
+                        f"{int(qout) & 0xFFFFFFFF:08X}\n")
+    assert (tmp_path / "req.txt").read_text() == "".join(expected)
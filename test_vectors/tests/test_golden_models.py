@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pytest
+
+import generate_test_vectors as gtv
+import ln_debug
+import sm_debug
+import vector_store
+
+
+def _int32(rng, n, lo=-2**31, hi=2**31):
+    return rng.integers(lo, hi, size=n, dtype=np.int64)
+
+
+@pytest.mark.parametrize("out_bits", [2, 8, 16])
+def test_requant_batch_matches_scalar_for_every_e(out_bits):
+    rng = np.random.default_rng(out_bits)
+    n = 120
+    for e in range(-128, 128):
+        qin, bias, m = _int32(rng, n), _int32(rng, n), _int32(rng, n)
+        # small operands, so left shifts are exercised without always saturating
+        qin[:40], bias[:40], m[:40] = _int32(rng, 40, -8, 9), 0, _int32(rng, 40, -8, 9)
+        got = gtv.requant_batch(qin, bias, m, np.full(n, e), out_bits=out_bits)
+        with np.errstate(over="ignore"):
+            expected = [gtv.requant(np.int32(a), np.int32(b), np.int32(c), np.int8(e), out_bits)
+                        for a, b, c in zip(qin, bias, m)]
+        np.testing.assert_array_equal(got, expected, err_msg=f"e={e}")
+
+
+def _shipped(op: str) -> dict:
+    path = os.path.join(os.path.dirname(gtv.__file__), f"{op}_test_vectors.txt")
+    with open(path) as f:
+        lines = f.readlines()
+    return vector_store.parse_lines(op, lines, vector_store.row_length(op, lines[0]))
+
+
+@pytest.mark.parametrize("source", ["random", "shipped"])
+def test_exp_batch_matches_scalar(source):
+    chunk = next(gtv.exp_vectors(2000, seed=1)) if source == "random" else _shipped("exp")
+    cols = [chunk[name] for name in ("qin", "qb", "qc", "qln2", "qln2_inv")]
+    got = gtv.exp_batch(*cols)
+    with np.errstate(over="ignore"):
+        expected = [gtv.exp(*(np.int32(c[i]) for c in cols)) for i in range(len(got))]
+    np.testing.assert_array_equal(got, expected)
+    np.testing.assert_array_equal(got, chunk["qout"])
+
+
+def test_requant_batch_matches_shipped_vectors():
+    vectors = _shipped("req")
+    got = gtv.requant_batch(vectors["qin"], vectors["bias"], vectors["m"], vectors["e"])
+    np.testing.assert_array_equal(got, vectors["qout"])
+
+
+@pytest.mark.parametrize("source", ["random", "shipped"])
+def test_softmax_batch_matches_scalar(source):
+    if source == "random":
+        vectors = next(gtv.sm_vectors(64, seed=2, length=32))
+    else:
+        vectors = sm_debug.read_vectors(os.path.join(os.path.dirname(sm_debug.__file__), "sm_test_vectors.txt"))
+    coeffs = [np.asarray(vectors[name], dtype=np.int32) for name in ("qb", "qc", "qln2", "qln2_inv", "Sreq")]
+    qin = np.asarray(vectors["qin"], dtype=np.int32)
+    batch = sm_debug.softmax_batch(qin, *coeffs)
+    # the scalar model loops over elements in Python, a sample of the shipped rows is enough
+    for i in range(0, len(qin), 1 if source == "random" else 23):
+        with np.errstate(over="ignore"):
+            row = sm_debug.softmax(qin[i], *(c[i] for c in coeffs))
+        for name in ("qmax", "qreq", "qsum", "factor", "qout"):
+            np.testing.assert_array_equal(batch[name][i], np.reshape(row[name], batch[name][i].shape), err_msg=name)
+    np.testing.assert_array_equal(batch["qout"], np.asarray(vectors["qout"], dtype=np.int8))
+
+
+@pytest.mark.parametrize("sreq_div", [1, 2, 4, 8])
+def test_softmax_online_matches_batch_for_any_sreq(sreq_div):
+    rng = np.random.default_rng(sreq_div)
+    qb, qc, qln2, qln2_inv, Sreq = gtv.sm_coefficients(0.0016)
+    coeffs = (qb, qc, qln2, qln2_inv, Sreq // sreq_div)
+    # ascending rows with tile = 1 rescale the sum at every element, the worst case
+    qin = np.sort(rng.integers(-2**15, 2**15, size=(100, 256)), axis=1).astype(np.int32)
+    batch = sm_debug.softmax_batch(qin, *coeffs)
+    online = sm_debug.softmax_online(qin, *coeffs, tile=1)
+    np.testing.assert_array_equal(online["qmax"], batch["qmax"])
+    assert np.max(np.abs(np.int32(online["qout"]) - batch["qout"])) <= 1
+    assert np.max(np.abs(np.int64(online["qsum"]) - batch["qsum"]) / batch["qsum"]) < 0.01
+
+
+@pytest.mark.parametrize("length", [32, 768])
+def test_layer_norm_batch_matches_scalar(length):
+    vectors = next(gtv.ln_vectors(16, seed=3, length=length))
+    shift, n_inv = ln_debug.ln_parameters(length)
+    batch = ln_debug.layer_norm_batch(vectors["qin"], vectors["bias"], shift=shift, n_inv=n_inv)
+    for i in range(len(vectors["qin"])):
+        row = ln_debug.layer_norm(vectors["qin"][i], vectors["bias"][i], shift=shift, n_inv=n_inv)
+        for name, value in row.items():
+            np.testing.assert_array_equal(batch[name][i], np.reshape(value, batch[name][i].shape), err_msg=name)
+    np.testing.assert_array_equal(batch["qout"], vectors["qout"])
+
+
+@pytest.mark.parametrize("source", ["random", "full_range", "shipped"])
+def test_gelu_batch_matches_scalar(source):
+    if source == "shipped":
+        vectors = _shipped("gelu")
+    else:
+        vectors = next(gtv.gelu_vectors(2000, seed=4, qin_bits=32 if source == "full_range" else 16))
+    cols = [vectors[name] for name in ("qin", "qb", "qc", "q1")]
+    got = gtv.gelu_batch(*cols)
+    with np.errstate(over="ignore"):
+        expected = [gtv.gelu(*(np.int32(c[i]) for c in cols)) for i in range(len(got))]
+    np.testing.assert_array_equal(got, expected)
+    np.testing.assert_array_equal(got, vectors["qout"])
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+import hex_codec
+
+
+def reference_rows(text: str) -> list:
+    return [[int(token, 16) for token in line.replace("|", " ").split()] for line in text.splitlines() if line.strip()]
+
+
+def _signed(rng, bits, shape):
+    return rng.integers(-2**(bits - 1), 2**(bits - 1), size=shape, dtype=np.int64)
+
+
+@pytest.mark.parametrize("bits", [8, 16, 32, 64])
+def test_fixed_width_round_trip(bits):
+    rng = np.random.default_rng(bits)
+    values = _signed(rng, bits, (300, 5))
+    text = hex_codec.format_rows([(values, bits)])
+    assert text.splitlines()[0] == " ".join(f"{int(v) & (2**bits - 1):0{bits // 4}X}" for v in values[0])
+    raw = hex_codec.parse_rows(text)
+    assert raw.tolist() == reference_rows(text)
+    assert np.array_equal(hex_codec.to_signed(raw, bits), values)
+
+
+@pytest.mark.parametrize("bits", [8, 32, 64])
+def test_variable_width_round_trip(bits):
+    rng = np.random.default_rng(bits + 1)
+    values = _signed(rng, bits, (300, 4)) >> rng.integers(0, bits, size=(300, 4))
+    text = hex_codec.format_rows([(values, bits, 1)])
+    assert text.splitlines()[0] == " ".join(f"{int(v) & (2**bits - 1):X}" for v in values[0])
+    raw = hex_codec.parse_rows(text)
+    assert raw.tolist() == reference_rows(text)
+    assert np.array_equal(hex_codec.to_signed(raw, bits), values)
+    # small blocks, cut at line ends
+    assert np.array_equal(hex_codec._parse_variable(text.encode(), block=100), raw)
+
+
+def test_variable_format_with_text_and_mixed_fields():
+    rng = np.random.default_rng(3)
+    qin = _signed(rng, 32, (40, 3)) >> rng.integers(0, 32, size=(40, 3))
+    e = _signed(rng, 8, 40)
+    qm = _signed(rng, 64, 40) >> rng.integers(0, 64, size=40)
+    text = hex_codec.format_rows(["Input: qin=", (qin, 32, 2), ", e=", (e, 8, 1), "\nqm: ", (qm, 64, 20), "\n"],
+                                 sep="", prefix="0x", end="")
+    expected = "".join(f"Input: qin={' '.join(f'0x{int(v) & 0xFFFFFFFF:02X}' for v in row)}, e=0x{int(x) & 0xFF:X}\n"
+                       f"qm: 0x{int(y) & 2**64 - 1:020X}\n" for row, x, y in zip(qin, e, qm))
+    assert text == expected
+
+
+def test_prefix_and_separators():
+    rng = np.random.default_rng(2)
+    qin, coeff, qout = _signed(rng, 32, (50, 6)), _signed(rng, 32, 50), _signed(rng, 8, (50, 6))
+    text = hex_codec.format_rows([(qin, 32), (coeff, 32), (qout, 32)], sep=" | ", prefix="0x")
+    raw = hex_codec.parse_rows(text)
+    assert raw.shape == (50, 13)
+    assert np.array_equal(hex_codec.to_signed(raw[:, :6], 32), qin)
+    assert np.array_equal(hex_codec.to_signed(raw[:, 6], 32), coeff)
+    assert np.array_equal(hex_codec.to_signed(raw[:, 7:], 32), qout)
+    # the same tokens with ragged widths and lower case take the variable path
+    ragged = "0x1f | 2 0xABC\n\n0X0 | ffffffffffffffff 3\n"
+    assert hex_codec.parse_rows(ragged).tolist() == [[0x1F, 2, 0xABC], [0, 2**64 - 1, 3]]
+
+
+def test_parse_errors():
+    with pytest.raises(ValueError):
+        hex_codec.parse_rows("1 2\n3\n")
+    with pytest.raises(ValueError):
+        hex_codec.parse_rows("1" * 17 + "\n")
+    assert hex_codec.parse_rows("").shape == (0, 0)
+
+
+def test_to_signed():
+    raw = np.array([0, 0x7F, 0x80, 0xFF, 0x1FF], dtype=np.uint64)
+    assert hex_codec.to_signed(raw, 8).tolist() == [0, 127, -128, -1, -1]
+    assert hex_codec.to_signed(np.array([2**64 - 1, 2**63], dtype=np.uint64), 64).tolist() == [-1, -2**63]
@@ -0,0 +1,73 @@
+import os
+import re
+
+import numpy as np
+import pytest
+
+import parse_test_vectors
+
+# the whole-file regexes parse_test_vectors.py used before it streamed, as the reference output
+REFERENCE = {
+    "gelu": re.compile(r"\{\s*" + r",\s*".join([r"\(int32_t\)0x([A-Fa-f0-9]+)"] * 5) + r"\s*\}"),
+    "ln": re.compile(r"\{\s*\{([^}]*)\},\s*\{([^}]*)\},\s*\{([^}]*)\}\s*\},"),
+    "sm": re.compile(r"\{\s*\{(.*?)\},\s*" + r"".join([r"\(int32_t\)0x([0-9A-Fa-f]+),\s*"] * 5) + r"\{(.*?)\}\s*\}"),
+}
+
+
+def reference_lines(op: str, content: str) -> str:
+    lines = []
+    for match in REFERENCE[op].findall(content):
+        if op == "gelu":
+            lines.append(" ".join(match))
+            continue
+        groups = [[re.sub(r"\{*\(int(32|8)_t\)0x", "", x.strip()) for x in g.split(",")] if i in (0, len(match) - 1)
+                  or op == "ln" else [g] for i, g in enumerate(match)]
+        lines.append(" | ".join(" ".join(g) for g in groups))
+    return "".join(line + "\n" for line in lines)
+
+
+def _literal(value: int, bits: int = 32) -> str:
+    return f"(int{bits}_t)0x{value & ((1 << bits) - 1):0{bits // 4}X}"
+
+
+def _array(values, bits: int = 32) -> str:
+    return "{" + ", ".join(_literal(v, bits) for v in values) + "}"
+
+
+def synthetic_header(op: str, rows: int, length: int = 6, seed: int = 0) -> str:
+    rng = np.random.default_rng(seed)
+    records = []
+    for _ in range(rows):
+        values = rng.integers(-2**31, 2**31, size=3 * length + 5)
+        if op == "gelu":
+            body = ",\n        ".join(_literal(v) for v in values[:5])
+        elif op == "ln":
+            body = ", ".join(_array(values[k * length:(k + 1) * length]) for k in range(3))
+        else:
+            body = ", ".join([_array(values[:length])] + [_literal(v) for v in values[length:length + 5]]
+                             + [_array(values[-length:] % 256, 8)])
+        records.append("    {\n        " + body + "\n    }")
+    # trailing comma after the last record too: the old ln regex only matched records followed by one
+    return (f"#include <stdint.h>\n\nconst struct {op}_test_vector {op}_vectors[] = {{\n"
+            + "".join(record + ",\n" for record in records) + "};\n")
+
+
+@pytest.mark.parametrize("op", ["gelu", "ln", "sm"])
+@pytest.mark.parametrize("chunk_size,workers", [(1 << 20, 1), (37, 1), (64, 3)])
+def test_header_conversion_matches_regex(op, chunk_size, workers, tmp_path):
+    content = synthetic_header(op, 40)
+    header = tmp_path / f"{op}.h"
+    header.write_text(content)
+    output = tmp_path / f"{op}.txt"
+    count = parse_test_vectors.convert_header(op, str(header), str(output), workers=workers, chunk_size=chunk_size)
+    assert count == 40
+    assert output.read_text() == reference_lines(op, content)
+
+
+def test_shipped_gelu_header_matches_regex(tmp_path):
+    header = os.path.join(os.path.dirname(parse_test_vectors.__file__), "gelu_test_vectors.h")
+    with open(header) as f:
+        content = f.read()
+    output = tmp_path / "gelu.txt"
+    parse_test_vectors.convert_header("gelu", header, str(output), chunk_size=4096)
+    assert output.read_text() == reference_lines("gelu", content)
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+import ln_debug
+import pipeline
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_layer_norm_takes_its_input_width_from_requant(threaded):
+    chain = [pipeline.requant_stage(e=12, out_bits=8), pipeline.layer_norm_stage()]
+    source = list(pipeline.random_source(64, 768, bits=24, chunk_rows=16, seed=1))
+    out = np.concatenate(list(pipeline.Pipeline(chain, threaded=threaded, in_bits=24).run(source)))
+    qin = np.concatenate([pipeline.requant_stage(e=12, out_bits=8).fn(chunk)[0] for chunk in source])
+    shift, n_inv = ln_debug.ln_parameters(768, 8)
+    assert chain[1].in_bits == 8 and shift == 0
+    expected = ln_debug.layer_norm_batch(qin, np.zeros_like(qin), shift=shift, n_inv=n_inv)["qout"]
+    np.testing.assert_array_equal(out, expected)
+
+
+def test_layer_norm_width_from_source_or_argument():
+    assert pipeline.Pipeline([pipeline.layer_norm_stage()], in_bits=24).stages[0].in_bits == 24
+    chain = [pipeline.gelu_stage(), pipeline.layer_norm_stage(qin_bits=16)]
+    assert pipeline.Pipeline(chain, in_bits=24).stages[1].in_bits == 16
+    # gelu has no fixed output width, so the layer_norm behind it needs qin_bits
+    chain = [pipeline.gelu_stage(), pipeline.layer_norm_stage()]
+    with pytest.raises(ValueError, match="qin_bits"):
+        list(pipeline.Pipeline(chain, threaded=False, in_bits=16).run(pipeline.random_source(4, 32)))
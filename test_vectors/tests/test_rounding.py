@@ -0,0 +1,52 @@
+from fractions import Fraction
+import math
+
+import numpy as np
+import pytest
+
+from rounding import ROUNDING_MODES, round_shift
+
+
+def reference(x: int, shift: int, mode: str) -> int:
+    if shift < 0:
+        return x << -shift
+    q = Fraction(x, 1 << shift)
+    if mode == "floor":
+        return math.floor(q)
+    if mode == "half_up":
+        return math.floor(q + Fraction(1, 2))
+    return round(q)                                 # Fraction rounds ties to even
+
+
+def _edge_values(rng, n):
+    info = np.iinfo(np.int64)
+    x = rng.integers(info.min, info.max, size=n, endpoint=True, dtype=np.int64)
+    ties = (rng.integers(-2**20, 2**20, size=n) * 2 + 1) << rng.integers(0, 40, size=n)
+    return np.concatenate([x, ties, [0, 1, -1, 2, -2, 3, -3, info.max, info.min, info.max - 1, info.min + 1]])
+
+
+@pytest.mark.parametrize("mode", ROUNDING_MODES)
+def test_round_shift_matches_fraction(mode):
+    rng = np.random.default_rng(1)
+    x = _edge_values(rng, 300)
+    for shift in range(0, 70):
+        got = round_shift(x, shift, mode)
+        expected = [reference(int(v), shift, mode) for v in x]
+        assert got.tolist() == expected, shift
+    # per-element shifts take the general path
+    shifts = rng.integers(0, 70, size=len(x))
+    got = round_shift(x, shifts, mode)
+    assert got.tolist() == [reference(int(v), int(s), mode) for v, s in zip(x, shifts)]
+
+
+def test_left_shift_wraps_or_saturates():
+    rng = np.random.default_rng(2)
+    x = _edge_values(rng, 100)
+    info = np.iinfo(np.int64)
+    for left in (1, 5, 31, 63, 64, 100):
+        wrapped = round_shift(x, -left)
+        saturated = round_shift(x, -left, saturate=True)
+        for v, w, s in zip(x.tolist(), wrapped.tolist(), saturated.tolist()):
+            exact = v << left
+            assert w == ((exact + 2**63) % 2**64) - 2**63
+            assert s == min(max(exact, info.min), info.max)
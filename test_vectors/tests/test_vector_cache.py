@@ -0,0 +1,56 @@
+import os
+
+import numpy as np
+
+import vector_cache
+import vector_store
+
+
+def test_hit_reuses_the_entry(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path)
+    path = vector_cache.get_store("req", 100, seed=1, cache_dir=cache_dir)
+    expected = vector_store.load(path, mmap=False)
+
+    def regenerate(*args, **kwargs):
+        raise AssertionError("a hit must not regenerate")
+    monkeypatch.setattr(vector_cache, "write_vectors", regenerate)
+    assert vector_cache.get_store("req", 100, seed=1, cache_dir=cache_dir) == path
+    np.testing.assert_array_equal(vector_store.load(path)["qout"], expected["qout"])
+
+
+def test_lru_eviction_keeps_the_budget(tmp_path):
+    cache_dir = str(tmp_path)
+    first = vector_cache.get_store("req", 1000, seed=1, cache_dir=cache_dir)
+    size = vector_cache.entry_size(first)
+    second = vector_cache.get_store("req", 1000, seed=2, cache_dir=cache_dir)
+    # touch the first entry, so the second is the least recently used
+    os.utime(os.path.join(second, vector_cache.ENTRY_FILE), (0, 0))
+    vector_cache.get_store("req", 1000, seed=1, cache_dir=cache_dir)
+    third = vector_cache.get_store("req", 1000, seed=3, cache_dir=cache_dir, budget=2 * size + size // 2)
+    assert os.path.isdir(first) and os.path.isdir(third)
+    assert not os.path.exists(second)
+    assert sorted(key for key, _, _, _ in vector_cache.entries(cache_dir)) == sorted(
+        os.path.basename(p) for p in (first, third))
+
+
+def test_invalidate_by_op(tmp_path):
+    cache_dir = str(tmp_path)
+    req = vector_cache.get_store("req", 100, cache_dir=cache_dir)
+    exp = vector_cache.get_store("exp", 100, cache_dir=cache_dir)
+    assert vector_cache.invalidate(cache_dir, "req") == [os.path.basename(req)]
+    assert not os.path.exists(req) and os.path.isdir(exp)
+    assert vector_cache.invalidate(cache_dir) == [os.path.basename(exp)]
+    assert os.listdir(cache_dir) == []
+
+
+def test_stale_directory_without_entry_is_replaced(tmp_path):
+    cache_dir = str(tmp_path)
+    key = vector_cache.cache_key("req", 100, 0)
+    stale = tmp_path / key
+    stale.mkdir()
+    (stale / "junk").write_text("left by an interrupted removal")
+    path = vector_cache.get_store("req", 100, cache_dir=cache_dir)
+    assert path == str(stale)
+    assert os.path.isfile(os.path.join(path, vector_cache.ENTRY_FILE))
+    assert not os.path.exists(os.path.join(path, "junk"))
+    assert len(vector_store.load(path)["qout"]) == 100
@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pytest
+
+import vector_store
+
+
+def _random_arrays(op, rows, length, seed=0):
+    rng = np.random.default_rng(seed)
+    arrays = {}
+    for name, dtype, per_row, _ in vector_store.FIELDS[op]:
+        info = np.iinfo(dtype)
+        shape = (rows, length) if per_row else (rows,)
+        arrays[name] = rng.integers(info.min, info.max, size=shape, endpoint=True, dtype=np.int64).astype(dtype)
+    return arrays
+
+
+@pytest.mark.parametrize("op", sorted(vector_store.FIELDS))
+def test_txt_npy_round_trip(op, tmp_path):
+    arrays = _random_arrays(op, 50, 7)
+    text = vector_store.format_lines(op, arrays)
+    txt = tmp_path / "vectors.txt"
+    txt.write_text(text)
+
+    vector_store.txt_to_npy(op, str(txt), str(tmp_path / "store"), chunk_rows=16)
+    store = vector_store.load(str(tmp_path / "store"))
+    assert store.pop("op") == op
+    for name, array in arrays.items():
+        np.testing.assert_array_equal(store[name], array)
+
+    vector_store.npy_to_txt(str(tmp_path / "store"), str(tmp_path / "back.txt"), chunk_rows=16)
+    assert (tmp_path / "back.txt").read_text() == text
+
+
+def test_writer_and_concat(tmp_path):
+    parts = [_random_arrays("sm", rows, 5, seed) for seed, rows in enumerate((3, 0, 11))]
+    dirs = []
+    for i, arrays in enumerate(parts):
+        vector_store.save("sm", arrays, str(tmp_path / f"part{i}"))
+        dirs.append(str(tmp_path / f"part{i}"))
+    vector_store.concat_stores(dirs, str(tmp_path / "all"), chunk_rows=4)
+
+    store = vector_store.load(str(tmp_path / "all"))
+    for name, _, _, _ in vector_store.FIELDS["sm"]:
+        np.testing.assert_array_equal(store[name], np.concatenate([arrays[name] for arrays in parts]))
+
+
+def test_writer_discards_partial_store_on_error(tmp_path):
+    with pytest.raises(RuntimeError):
+        with vector_store.StoreWriter("req", str(tmp_path / "store")) as writer:
+            writer.append(_random_arrays("req", 4, 1))
+            raise RuntimeError("generator failed")
+    assert os.listdir(tmp_path) == []
+
+
+def test_writer_replaces_an_existing_store_only_on_close(tmp_path):
+    output = str(tmp_path / "store")
+    old, new = _random_arrays("req", 4, 1, seed=1), _random_arrays("req", 6, 1, seed=2)
+    vector_store.save("req", old, output)
+    with pytest.raises(RuntimeError):
+        with vector_store.StoreWriter("req", output) as writer:
+            writer.append(new)
+            raise RuntimeError("generator failed")
+    np.testing.assert_array_equal(vector_store.load(output)["qin"], old["qin"])
+    with vector_store.StoreWriter("req", output) as writer:
+        writer.append(new)
+    np.testing.assert_array_equal(vector_store.load(output)["qin"], new["qin"])
+    assert os.listdir(tmp_path) == ["store"]
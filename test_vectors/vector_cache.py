@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import vector_store
+from generate_test_vectors import GENERATORS, gen_sharded, write_vectors
+
+# Sources whose code decides the generated vectors and golden outputs, hashed into every key.
+MODEL_SOURCES = ["generate_test_vectors.py", "sm_debug.py", "ln_debug.py", "rounding.py", "vector_store.py"]
+
+CACHE_DIR = os.environ.get("VECTOR_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".vector_cache"))
+CACHE_BUDGET = int(os.environ.get("VECTOR_CACHE_BUDGET", 8 << 30))  # bytes
+
+ENTRY_FILE = "entry.json"
+
+
+def source_hash() -> str:
+    """
+    Hash of the golden-model sources, so editing a model invalidates everything generated with it.
+    """
+    digest = hashlib.sha256()
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in MODEL_SOURCES:
+        with open(os.path.join(here, name), "rb") as f:
+            digest.update(name.encode() + b"\0" + f.read())
+    return digest.hexdigest()
+
+
+def cache_key(op: str, num_samples: int, seed: int = 0, chunk_size: int = 1 << 16, options: dict = None,
+              shard_size: int = None) -> str:
+    """
+    Content address of a generated suite: (op, generator parameters, seed, golden-model source).
+    shard_size is part of the key since sharded generation draws from per-shard seeds.
+    """
+    params = {"op": op, "num_samples": num_samples, "seed": seed, "chunk_size": chunk_size,
+              "options": options or {}, "shard_size": shard_size, "source": source_hash()}
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def entry_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def entries(cache_dir: str = CACHE_DIR) -> list:
+    """
+    Cached entries as (key, params, size in bytes, last use), least recently used first.
+    """
+    result = []
+    if not os.path.isdir(cache_dir):
+        return result
+    for key in os.listdir(cache_dir):
+        if key.startswith("."):
+            # an entry being generated or removed
+            continue
+        entry = os.path.join(cache_dir, key, ENTRY_FILE)
+        if not os.path.isfile(entry):
+            continue
+        with open(entry, "r") as f:
+            params = json.load(f)
+        result.append((key, params, entry_size(os.path.join(cache_dir, key)), os.path.getmtime(entry)))
+    return sorted(result, key=lambda e: e[3])
+
+
+def remove(cache_dir: str, key: str):
+    """
+    Remove an entry: it is first renamed out of its key path, so an interrupted removal never leaves a
+    partial entry behind under the key.
+    """
+    path = os.path.join(cache_dir, key)
+    trash = tempfile.mkdtemp(prefix=f".{key}.", dir=cache_dir)
+    try:
+        os.rename(path, os.path.join(trash, "store"))
+    except FileNotFoundError:
+        pass
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+def evict(cache_dir: str = CACHE_DIR, budget: int = CACHE_BUDGET, keep: str = None) -> list:
+    """
+    Remove least recently used entries until the cache fits in `budget` bytes. `keep` is never removed.
+    Returns the removed keys.
+    """
+    cached = entries(cache_dir)
+    total = sum(size for _, _, size, _ in cached)
+    removed = []
+    for key, _, size, _ in cached:
+        if total <= budget:
+            break
+        if key == keep:
+            continue
+        remove(cache_dir, key)
+        total -= size
+        removed.append(key)
+    return removed
+
+
+def invalidate(cache_dir: str = CACHE_DIR, op: str = None) -> list:
+    """
+    Remove every cached entry, or only those of `op`. Returns the removed keys.
+    """
+    removed = []
+    for key, params, _, _ in entries(cache_dir):
+        if op is None or params["op"] == op:
+            remove(cache_dir, key)
+            removed.append(key)
+    return removed
+
+
+def get_store(op: str, num_samples: int, seed: int = 0, chunk_size: int = 1 << 16, options: dict = None,
+              workers: int = None, shard_size: int = 1 << 20, cache_dir: str = CACHE_DIR,
+              budget: int = CACHE_BUDGET) -> str:
+    """
+    Path of the .npy vector store for these generator parameters, generating it on a miss.
+    A hit only marks the entry as recently used. New entries are generated into a temporary directory
+    and renamed into place, so concurrent runs never see a partial entry.
+    """
+    options = options or {}
+    key = cache_key(op, num_samples, seed, chunk_size, options, shard_size if workers else None)
+    path = os.path.join(cache_dir, key)
+    entry = os.path.join(path, ENTRY_FILE)
+    if os.path.isfile(entry):
+        os.utime(entry)
+        return path
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=f".{key}.", dir=cache_dir)
+    store = os.path.join(tmp, "store")
+    if workers:
+        gen_sharded(op, num_samples, store, seed, workers, shard_size, chunk_size, "npy", options)
+    else:
+        write_vectors(op, GENERATORS[op](num_samples, seed, chunk_size, **options), store, "npy")
+    with open(os.path.join(store, ENTRY_FILE), "w") as f:
+        json.dump({"op": op, "num_samples": num_samples, "seed": seed, "chunk_size": chunk_size,
+                   "options": options, "shard_size": shard_size if workers else None, "created": time.time()}, f)
+    try:
+        os.rename(store, path)
+    except OSError:
+        # another run stored the same key first, or a directory without an entry (e.g. left by a crash) is in
+        # the way: remove it and retry once
+        if not os.path.isfile(entry):
+            remove(cache_dir, key)
+            try:
+                os.rename(store, path)
+            except OSError:
+                if not os.path.isfile(entry):
+                    shutil.rmtree(tmp, ignore_errors=True)
+                    raise
+    shutil.rmtree(tmp, ignore_errors=True)
+    evict(cache_dir, budget, keep=key)
+    return path
+
+
+def materialize(store_dir: str, output: str, fmt: str = "txt"):
+    """
+    Write a cached store out as a hex text vector file or a standalone .npy store.
+    """
+    if fmt == "txt":
+        vector_store.npy_to_txt(store_dir, output)
+    else:
+        shutil.copytree(store_dir, output, dirs_exist_ok=True, ignore=shutil.ignore_patterns(ENTRY_FILE))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="content-addressed cache of generated test vectors")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--budget", type=int, default=CACHE_BUDGET, help="disk budget in bytes, LRU eviction above it")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    get = subparsers.add_parser("get", help="generate or reuse vectors, optionally writing them out")
+    get.add_argument("function", choices=sorted(GENERATORS), help="exp / gelu / ln / req / sm")
+    get.add_argument("-n", "--num-samples", type=int, default=None, help="vectors (rows for ln / sm)")
+    get.add_argument("-o", "--output", default=None, help="write the vectors here")
+    get.add_argument("--format", choices=["txt", "npy"], default="txt")
+    get.add_argument("--seed", type=int, default=0)
+    get.add_argument("--chunk-size", type=int, default=1 << 16)
+    get.add_argument("--workers", type=int, default=None)
+    get.add_argument("--shard-size", type=int, default=1 << 20)
+    get.add_argument("--qin-bits", type=int, default=16, help="gelu / ln input width")
+    get.add_argument("--length", type=int, default=None, help="row length L for ln / sm")
+    listing = subparsers.add_parser("list", help="show cached entries, least recently used first")
+    drop = subparsers.add_parser("invalidate", help="remove all entries, or those of one op")
+    drop.add_argument("function", nargs="?", default=None)
+    args = parser.parse_args()
+
+    if args.command == "get":
+        options = {"qin_bits": args.qin_bits} if args.function in ("gelu", "ln") else {}
+        if args.length and args.function in ("ln", "sm"):
+            options["length"] = args.length
+        num_samples = args.num_samples or {"ln": 256, "sm": 4608}.get(args.function, 10000)
+        start = time.perf_counter()
+        store_dir = get_store(args.function, num_samples, args.seed, args.chunk_size, options, args.workers,
+                              args.shard_size, args.cache_dir, args.budget)
+        print(f"{store_dir} ({time.perf_counter() - start:.2f} s)")
+        if args.output:
+            materialize(store_dir, args.output, args.format)
+            print(f"Vectors written to {args.output}")
+    elif args.command == "list":
+        for key, params, size, used in entries(args.cache_dir):
+            print(f"{key} {params['op']:5s} n={params['num_samples']} seed={params['seed']} "
+                  f"{size / 2**20:9.1f} MiB last used {time.ctime(used)}")
+    else:
+        removed = invalidate(args.cache_dir, args.function)
+        print(f"Removed {len(removed)} entries from {args.cache_dir}")
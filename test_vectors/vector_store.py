@@ -0,0 +1,250 @@
+import numpy as np
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import hex_codec
+
+# Field layout of each vector file, in line order: (name, dtype, per_row, hex_bits).
+# per_row fields hold one value per vector element (an L-wide array), the others one value per line.
+# hex_bits is the two's complement width written back to text, as read by non_lin_ops_tb.sv.
+FIELDS = {
+    "exp": [("qin", np.int32, False, 32), ("qb", np.int32, False, 32), ("qc", np.int32, False, 32),
+            ("qln2", np.int32, False, 32), ("qln2_inv", np.int32, False, 32), ("qout", np.int32, False, 32)],
+    "gelu": [("qin", np.int32, False, 32), ("qb", np.int32, False, 32), ("qc", np.int32, False, 32),
+             ("q1", np.int32, False, 32), ("qout", np.int32, False, 32)],
+    "req": [("qin", np.int32, False, 32), ("bias", np.int32, False, 32), ("m", np.int32, False, 32),
+            ("e", np.int8, False, 8), ("qout", np.int32, False, 32)],
+    "ln": [("qin", np.int32, True, 32), ("bias", np.int32, True, 32), ("qout", np.int32, True, 32)],
+    "sm": [("qin", np.int32, True, 32), ("qb", np.int32, False, 32), ("qc", np.int32, False, 32),
+           ("qln2", np.int32, False, 32), ("qln2_inv", np.int32, False, 32), ("Sreq", np.int32, False, 32),
+           ("qout", np.int8, True, 32)],
+}
+
+# exp/gelu/req lines are plain space-separated, ln/sm lines separate fields with " | "
+SEPARATORS = {"exp": " ", "gelu": " ", "req": " ", "ln": " | ", "sm": " | "}
+
+META_FILE = "meta.json"
+
+
+def row_length(op: str, line: str) -> int:
+    """
+    Number of elements L in the per-row fields of a vector file line.
+    """
+    fields = FIELDS[op]
+    if not any(per_row for _, _, per_row, _ in fields):
+        return 1
+    groups = line.strip().split(" | ")
+    for (_, _, per_row, _), group in zip(fields, groups):
+        if per_row:
+            return len(group.split())
+
+
+def parse_lines(op: str, lines: list, length: int) -> dict:
+    """
+    Parse vector file lines into one typed array per field.
+    """
+    fields = FIELDS[op]
+    widths = [length if per_row else 1 for _, _, per_row, _ in fields]
+    text = "".join(line if line.endswith("\n") else line + "\n" for line in lines)
+    values = hex_codec.parse_rows(text).astype(np.uint32).view(np.int32).reshape(-1, sum(widths))
+    arrays = {}
+    col = 0
+    for (name, dtype, per_row, _), width in zip(fields, widths):
+        block = values[:, col:col + width]
+        arrays[name] = (block if per_row else block[:, 0]).astype(dtype)
+        col += width
+    return arrays
+
+
+def format_lines(op: str, arrays: dict) -> str:
+    """
+    Format one typed array per field back into vector file lines.
+    """
+    return hex_codec.format_rows([(arrays[name], bits) for name, _, _, bits in FIELDS[op]], SEPARATORS[op])
+
+
+def txt_to_npy(op: str, input_file: str, output_dir: str, chunk_rows: int = 1 << 16):
+    """
+    Convert a hex text vector file into a directory holding one .npy file per field.
+    Rows are streamed in chunks straight into the memory-mapped outputs, so memory stays bounded.
+    """
+    with open(input_file, "r") as infile:
+        first = infile.readline()
+        num_rows = (1 if first.strip() else 0) + sum(1 for line in infile if line.strip())
+    length = row_length(op, first) if first.strip() else 0
+
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = {}
+    for name, dtype, per_row, _ in FIELDS[op]:
+        shape = (num_rows, length) if per_row else (num_rows,)
+        outputs[name] = np.lib.format.open_memmap(os.path.join(output_dir, f"{name}.npy"), mode="w+",
+                                                  dtype=dtype, shape=shape)
+
+    def flush(lines, start):
+        for name, array in parse_lines(op, lines, length).items():
+            outputs[name][start:start + len(lines)] = array
+        return start + len(lines)
+
+    start = 0
+    with open(input_file, "r") as infile:
+        lines = []
+        for line in infile:
+            if not line.strip():
+                continue
+            lines.append(line)
+            if len(lines) == chunk_rows:
+                start = flush(lines, start)
+                lines = []
+        if lines:
+            flush(lines, start)
+
+    for array in outputs.values():
+        array.flush()
+    with open(os.path.join(output_dir, META_FILE), "w") as f:
+        json.dump({"op": op, "rows": num_rows, "length": length}, f)
+
+
+def load(store_dir: str, mmap: bool = True) -> dict:
+    """
+    Open a vector store written by `txt_to_npy`. With `mmap` the arrays are read-only np.memmap views,
+    so opening and slicing a large suite only touches the pages actually used.
+    """
+    with open(os.path.join(store_dir, META_FILE), "r") as f:
+        meta = json.load(f)
+    mode = "r" if mmap else None
+    arrays = {name: np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode=mode)
+              for name, _, _, _ in FIELDS[meta["op"]]}
+    return {"op": meta["op"], **arrays}
+
+
+def save(op: str, arrays: dict, output_dir: str):
+    """
+    Write in-memory field arrays (e.g. from the batched generators) as a vector store.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    num_rows = len(arrays[FIELDS[op][0][0]])
+    length = 1
+    for name, dtype, per_row, _ in FIELDS[op]:
+        array = np.asarray(arrays[name]).astype(dtype)
+        if per_row:
+            length = array.shape[-1]
+        np.save(os.path.join(output_dir, f"{name}.npy"), array)
+    with open(os.path.join(output_dir, META_FILE), "w") as f:
+        json.dump({"op": op, "rows": num_rows, "length": length if num_rows else 0}, f)
+
+
+class StoreWriter:
+    """
+    Build a vector store incrementally: `append` field arrays chunk by chunk, `close` finalizes the .npy files.
+    Data is spooled to raw files first, so the total row count does not need to be known up front.
+    The store is built in a temporary sibling directory and renamed into place by `close`, replacing any
+    store already at `output_dir`. Used as a context manager, an exception discards the partial store and
+    leaves `output_dir` as it was.
+    """
+    def __init__(self, op: str, output_dir: str):
+        self.op = op
+        self.output_dir = output_dir
+        self.rows = 0
+        self.length = 0
+        parent, base = os.path.split(os.path.abspath(output_dir))
+        os.makedirs(parent, exist_ok=True)
+        self.tmp_dir = tempfile.mkdtemp(prefix=f".{base}.", dir=parent)
+        self.files = {name: open(os.path.join(self.tmp_dir, f"{name}.bin"), "wb") for name, _, _, _ in FIELDS[op]}
+
+    def append(self, arrays: dict):
+        for name, dtype, per_row, _ in FIELDS[self.op]:
+            array = np.ascontiguousarray(arrays[name], dtype=dtype)
+            if per_row and len(array):
+                self.length = array.shape[-1]
+            array.tofile(self.files[name])
+        self.rows += len(arrays[FIELDS[self.op][0][0]])
+
+    def close(self):
+        for name, dtype, per_row, _ in FIELDS[self.op]:
+            self.files[name].close()
+            raw = os.path.join(self.tmp_dir, f"{name}.bin")
+            header = {"descr": np.lib.format.dtype_to_descr(np.dtype(dtype)), "fortran_order": False,
+                      "shape": (self.rows, self.length) if per_row else (self.rows,)}
+            with open(os.path.join(self.tmp_dir, f"{name}.npy"), "wb") as f, open(raw, "rb") as src:
+                np.lib.format.write_array_header_1_0(f, header)
+                shutil.copyfileobj(src, f)
+            os.remove(raw)
+        with open(os.path.join(self.tmp_dir, META_FILE), "w") as f:
+            json.dump({"op": self.op, "rows": self.rows, "length": self.length}, f)
+        # move an old store out of the way first, a directory is only replaced by rename when empty
+        old = None
+        if os.path.exists(self.output_dir):
+            old = f"{self.tmp_dir}.old"
+            os.rename(self.output_dir, old)
+        os.rename(self.tmp_dir, self.output_dir)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+
+    def abort(self):
+        """
+        Close the spool files and remove the temporary directory, leaving `output_dir` untouched.
+        """
+        for name in self.files:
+            self.files[name].close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def concat_stores(store_dirs: list, output_dir: str, chunk_rows: int = 1 << 16):
+    """
+    Concatenate vector stores of the same op, in order, into a new store.
+    """
+    op = load(store_dirs[0])["op"]
+    with StoreWriter(op, output_dir) as writer:
+        for store_dir in store_dirs:
+            store = load(store_dir)
+            store.pop("op")
+            num_rows = len(next(iter(store.values())))
+            for start in range(0, num_rows, chunk_rows):
+                writer.append({name: array[start:start + chunk_rows] for name, array in store.items()})
+
+
+def npy_to_txt(store_dir: str, output_file: str, chunk_rows: int = 1 << 16):
+    """
+    Render a vector store back into the hex text layout the SystemVerilog testbench reads with $fscanf.
+    All 32-bit and int8 output fields are written as sign-extended 8-digit hex, req's e as 2 digits.
+    """
+    store = load(store_dir)
+    op = store.pop("op")
+    num_rows = len(next(iter(store.values())))
+    with open(output_file, "w") as outfile:
+        for start in range(0, num_rows, chunk_rows):
+            outfile.write(format_lines(op, {name: array[start:start + chunk_rows] for name, array in store.items()}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="convert test vectors between hex text and .npy stores")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    to_npy = subparsers.add_parser("to-npy", help="hex text -> .npy store")
+    to_npy.add_argument("op", choices=sorted(FIELDS), help="exp / gelu / req / ln / sm")
+    to_npy.add_argument("input_file")
+    to_npy.add_argument("-o", "--output", default=None, help="store directory (default: input file stem)")
+    to_txt = subparsers.add_parser("to-txt", help=".npy store -> hex text")
+    to_txt.add_argument("store_dir")
+    to_txt.add_argument("-o", "--output", default=None, help="text file (default: <store_dir>.txt)")
+    args = parser.parse_args()
+
+    if args.command == "to-npy":
+        output_dir = args.output or os.path.splitext(args.input_file)[0]
+        txt_to_npy(args.op, args.input_file, output_dir)
+        print(f"Converted {args.input_file} to {output_dir}.")
+    if args.command == "to-txt":
+        output_file = args.output or f"{args.store_dir.rstrip('/')}.txt"
+        npy_to_txt(args.store_dir, output_file)
+        print(f"Converted {args.store_dir} to {output_file}.")
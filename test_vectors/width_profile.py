@@ -0,0 +1,118 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from compare_results import iter_vector_chunks
+from generate_test_vectors import GENERATORS, exp_batch, gelu_batch, requant_batch
+from ln_debug import layer_norm_batch, ln_parameters
+from sm_debug import softmax_batch
+
+# non_lin_ops.sv INTERNAL_WIDTH
+INTERNAL_WIDTH = 64
+
+
+def signed_bits(value: int) -> int:
+    """
+    Two's complement width that holds `value`, sign bit included.
+    """
+    return (value if value >= 0 else ~value).bit_length() + 1
+
+
+def run_model(op: str, vectors: dict) -> dict:
+    """
+    Run one chunk of vectors through the op's batched golden model and return its inputs and intermediates.
+    """
+    results = {}
+    if op == "exp":
+        exp_batch(vectors["qin"], vectors["qb"], vectors["qc"], vectors["qln2"], vectors["qln2_inv"],
+                  intermediate_results=results)
+    elif op == "gelu":
+        gelu_batch(vectors["qin"], vectors["qb"], vectors["qc"], vectors["q1"], intermediate_results=results)
+    elif op == "req":
+        requant_batch(vectors["qin"], vectors["bias"], vectors["m"], vectors["e"], intermediate_results=results)
+    elif op == "ln":
+        shift, n_inv = ln_parameters(vectors["qin"].shape[1])
+        results = layer_norm_batch(vectors["qin"], vectors["bias"], shift=shift, n_inv=n_inv)
+    else:
+        results = softmax_batch(vectors["qin"], vectors["qb"], vectors["qc"], vectors["qln2"], vectors["qln2_inv"],
+                                vectors["Sreq"])
+    inputs = {name: array for name, array in vectors.items() if name != "qout"}
+    return {**inputs, **results}
+
+
+class WidthProfile:
+    """
+    Running min / max of every named integer array, merged chunk by chunk.
+    """
+    def __init__(self):
+        self.ranges = {}
+
+    def update(self, arrays: dict):
+        for name, array in arrays.items():
+            array = np.asarray(array)
+            if array.size == 0 or not np.issubdtype(array.dtype, np.integer):
+                continue
+            lo, hi = int(array.min()), int(array.max())
+            if name in self.ranges:
+                lo, hi = min(lo, self.ranges[name][0]), max(hi, self.ranges[name][1])
+            self.ranges[name] = (lo, hi)
+
+    def report(self) -> list:
+        """
+        (name, min, max, signed bits) per array, in the order the model produced them.
+        """
+        return [(name, lo, hi, max(signed_bits(lo), signed_bits(hi))) for name, (lo, hi) in self.ranges.items()]
+
+
+def profile(op: str, vector_path: str = None, num_samples: int = None, seed: int = 0, chunk_rows: int = 4096,
+            options: dict = None) -> list:
+    """
+    Width report of `op` over a vector file / store, or over `num_samples` freshly generated vectors.
+    """
+    widths = WidthProfile()
+    if vector_path:
+        chunks = (vectors for _, vectors in iter_vector_chunks(op, vector_path, chunk_rows))
+    else:
+        chunks = GENERATORS[op](num_samples, seed, 1 << 16, **(options or {}))
+    for vectors in chunks:
+        widths.update(run_model(op, vectors))
+    return widths.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="value range and signed bit-width of every datapath intermediate")
+    parser.add_argument("ops", nargs="+", choices=sorted(GENERATORS), help="exp / gelu / ln / req / sm")
+    parser.add_argument("--vectors", default=None,
+                        help="vector file or .npy store, single op only (default: <op>_test_vectors.txt if present)")
+    parser.add_argument("-n", "--num-samples", type=int, default=None,
+                        help="profile this many generated vectors (rows for ln / sm) instead of a file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=4096)
+    parser.add_argument("--length", type=int, default=None, help="row length L for generated ln / sm vectors")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    reports = {}
+    for op in args.ops:
+        vector_file = args.vectors or f"{op}_test_vectors.txt"
+        if args.num_samples or not os.path.exists(vector_file):
+            vector_file = None
+        num_samples = args.num_samples or {"ln": 256, "sm": 4608}.get(op, 10000)
+        options = {"length": args.length} if args.length and op in ("ln", "sm") else {}
+        reports[op] = profile(op, vector_file, num_samples, args.seed, args.chunk_rows, options)
+
+    if args.json:
+        print(json.dumps({op: [{"name": name, "min": lo, "max": hi, "bits": bits} for name, lo, hi, bits in report]
+                          for op, report in reports.items()}, indent=2))
+    else:
+        for op, report in reports.items():
+            print(f"{op:5s} {'intermediate':12s} {'min':>21s} {'max':>21s} {'bits':>5s} {'spare':>6s}")
+            for name, lo, hi, bits in report:
+                print(f"{'':5s} {name:12s} {lo:21d} {hi:21d} {bits:5d} {INTERNAL_WIDTH - bits:6d}")
+            print(f"{'':5s} widest: {max(bits for *_, bits in report)} of {INTERNAL_WIDTH} bits")
+        if len(reports) > 1:
+            widest = {op: max(bits for *_, bits in report) for op, report in reports.items()}
+            print("shared datapath needs " + ", ".join(f"{op} {bits}" for op, bits in widest.items()) +
+                  f" -> {max(widest.values())} bits")